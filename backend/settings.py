@@ -1,5 +1,6 @@
 from pathlib import Path
 from datetime import timedelta
+import importlib.util
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -28,16 +29,25 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the chain (core.metrics)
+    'core.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Serves the React build's files before the session, CSRF and auth middleware run
+    'core.frontend.FrontendMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Send each request's db/auth/serialize/render timings to the client as a Server-Timing header.
+# The per-endpoint histograms behind /api/metrics/ are kept either way.
+SERVER_TIMING = True
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -63,13 +73,35 @@ TEMPLATES = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.IdCursorPagination',
+    'PAGE_SIZE': 50,
+    # orjson-backed JSON (same output as DRF's JSONRenderer, rendered several
+    # times faster); falls back to the stdlib encoder when orjson is missing
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# MessagePack for clients sending Accept: application/msgpack, when installed
+if importlib.util.find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('core.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('core.renderers.MessagePackParser')
+
+# Authenticate GETs on the API viewsets from token claims alone (no user
+# row). Deactivation, password and staff changes revoke earlier tokens.
+JWT_CLAIMS_ONLY_READS = False
+
 # JWT Settings - ADD THIS
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -86,6 +118,11 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'frontend/dist/fonts')
 ]
 
+# The React build served by core.frontend: its fingerprinted assets/ with year-long immutable
+# caching and precompressed variants (`python manage.py compress_assets`), index.html for every
+# other non-API path
+FRONTEND_DIST_DIR = BASE_DIR / 'frontend' / 'dist'
+
 WSGI_APPLICATION = 'backend.wsgi.application'
 
 # Database
@@ -93,9 +130,91 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN so concurrent submissions wait on the
+            # busy timeout instead of failing to upgrade a read lock mid-transaction
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            # File-backed so multi-threaded tests see real SQLite locking
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# Read replicas: extra DATABASES aliases that API list/retrieve reads are spread over
+DATABASE_REPLICAS = []
+# After a user writes, their reads stay on the primary this long (replication lag)
+DATABASE_REPLICA_PIN_SECONDS = 10
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Serialized questionnaires per user (core.questionnaire_cache), in each
+    # worker's memory: LocMemCache evicts least-recently-used entries once
+    # MAX_ENTRIES is reached. Entries are keyed by the per-user counters in
+    # 'versions', so a write in any worker orphans them in all of them.
+    'questionnaires': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'questionnaires',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Version counters behind the per-process caches (core.cache_versions).
+    # Must be shared by every worker process, or a write would only orphan the
+    # writing worker's entries; a system check warns about per-process
+    # backends. Reads are one small file each; only a bump or a user's first
+    # counter writes, and culls. Files suit one box; use Redis or Memcached
+    # across several. Counters never expire: losing one only costs a miss.
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'versions',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    # Users behind JWTs (core.authentication), in each worker's memory. Keyed by
+    # the per-user counters in 'versions', so saving a user invalidates every
+    # worker's entry; TIMEOUT bounds rows changed with QuerySet.update().
+    # Claims-only revocations are kept in the database (TokenRevocation).
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth',
+        'TIMEOUT': 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
+}
+
+# Finished background jobs (core.jobs) are kept this long, then deleted by the run_jobs workers
+JOB_RETENTION = timedelta(days=7)
+
+# Review notifications are sent by the run_jobs worker; point this at SMTP in production
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'no-reply@localhost'
+
+AUTHENTICATION_BACKENDS = ['core.password_hashing.PooledModelBackend']
+# Worker processes that hash and verify passwords (core.password_hashing); 0 hashes inline.
+# At most PASSWORD_HASHING_MAX_PENDING hashes queue or run at once (default 4 per worker);
+# a request waiting longer than PASSWORD_HASHING_WAIT_SECONDS for a slot gets a 503.
+PASSWORD_HASHING_WORKERS = 0
+PASSWORD_HASHING_MAX_PENDING = None
+PASSWORD_HASHING_WAIT_SECONDS = 5
+
+# PDF health reports (core.reports) are rendered on REPORT_RENDER_WORKERS processes (0 renders
+# inline), bounded like the hashing pool above, and kept per questionnaire version in REPORT_CACHE_DIR.
+REPORT_RENDER_WORKERS = 0
+REPORT_RENDER_MAX_PENDING = None
+REPORT_RENDER_WAIT_SECONDS = 10
+REPORT_CACHE_DIR = BASE_DIR / 'report_cache'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -1,12 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
-from django.views.generic import TemplateView
-from django.conf import settings
-from django.conf.urls.static import static
-import os
+
+from core.views_frontend import FrontendAppView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('core.urls')),
-    re_path(r'^.*$', TemplateView.as_view(template_name='index.html')),
-] + static(settings.STATIC_URL, document_root=os.path.join(settings.BASE_DIR, 'frontend', 'dist'))
\ No newline at end of file
+    # Files of the React build are answered by core.frontend.FrontendMiddleware;
+    # a missing asset is a 404 rather than the app shell
+    re_path(r'^(?!assets/).*$', FrontendAppView.as_view()),
+]
@@ -0,0 +1,137 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import AnalyticsCounter, QuestionnaireSnapshot
+
+RECOMPUTE_CHUNK_SIZE = 2000
+
+# (counter prefix, snapshot section, boolean fields counted when true)
+FLAGS = (
+    ('medical', 'medical_history', ('diabetes', 'hypertension', 'heart_disease')),
+    ('family', 'family_history', ('diabetes', 'heart_disease', 'cancer')),
+    ('symptom', 'symptoms', ('chest_pain', 'breathlessness', 'fatigue')),
+)
+
+
+def contributions(payload):
+    """
+    The counter deltas one questionnaire snapshot payload adds: ``{key: (count, total)}``.
+
+    Counters are sums of these over every snapshot, so a write only has to
+    apply the difference between a questionnaire's old and new payloads.
+    """
+    if not payload:
+        return {}
+    counts = {'questionnaires': (1, 0.0), f"status:{payload['status']}": (1, 0.0)}
+    smoking = (payload.get('lifestyle') or {}).get('smoking_status')
+    if smoking:
+        counts[f'smoking:{smoking}'] = (1, 0.0)
+    bmi = (payload.get('measurements') or {}).get('bmi')
+    if bmi is not None:
+        counts['bmi'] = (1, float(bmi))
+    for prefix, section, fields in FLAGS:
+        values = payload.get(section) or {}
+        for field in fields:
+            if values.get(field):
+                counts[f'{prefix}:{field}'] = (1, 0.0)
+    return counts
+
+
+def _accumulate(deltas, payload, sign=1):
+    for key, (count, total) in contributions(payload).items():
+        previous = deltas.get(key, (0, 0.0))
+        deltas[key] = (previous[0] + sign * count, previous[1] + sign * total)
+
+
+def apply_changes(changes):
+    """
+    Apply ``(old payload or None, new payload or None)`` pairs to the counters.
+
+    Deltas are summed first, so a batch costs one UPDATE per counter that
+    actually moved, whatever its size. Counters are updated in key order so
+    concurrent writers always lock them in the same order.
+    """
+    deltas = {}
+    for old, new in changes:
+        _accumulate(deltas, old, -1)
+        _accumulate(deltas, new)
+    for key in sorted(deltas):
+        count, total = deltas[key]
+        if not count and not total:
+            continue
+        updated = AnalyticsCounter.objects.filter(key=key).update(
+            count=F('count') + count, total=F('total') + total,
+        )
+        if not updated:
+            _, created = AnalyticsCounter.objects.get_or_create(
+                key=key, defaults={'count': count, 'total': total},
+            )
+            if not created:
+                # Another writer created it in between
+                AnalyticsCounter.objects.filter(key=key).update(
+                    count=F('count') + count, total=F('total') + total,
+                )
+
+
+@receiver(post_delete, sender=QuestionnaireSnapshot)
+def _remove_deleted_snapshot(sender, instance, **kwargs):
+    # Fires for cascades too, e.g. when a questionnaire or one of its sections is deleted
+    apply_changes([(instance.payload, None)])
+
+
+def recompute():
+    """
+    Rebuild every counter from the snapshot table. Returns the number of snapshots read.
+
+    The counters are locked first: writers that commit before the lock are
+    included in the scan, and those blocked behind it apply their deltas on
+    top of the rebuilt values once it commits.
+    """
+    with transaction.atomic():
+        list(AnalyticsCounter.objects.select_for_update().values_list('key', flat=True))
+        deltas, scanned = {}, 0
+        payloads = QuestionnaireSnapshot.objects.order_by('pk').values_list('payload', flat=True)
+        for payload in payloads.iterator(chunk_size=RECOMPUTE_CHUNK_SIZE):
+            scanned += 1
+            _accumulate(deltas, payload)
+        AnalyticsCounter.objects.all().delete()
+        AnalyticsCounter.objects.bulk_create(
+            AnalyticsCounter(key=key, count=count, total=total) for key, (count, total) in deltas.items()
+        )
+    return scanned
+
+
+def _rate(count, population):
+    return count / population if population else None
+
+
+def dashboard():
+    """Every dashboard statistic, read from the counters in one query."""
+    counters = {counter.key: counter for counter in AnalyticsCounter.objects.all()}
+
+    def count(key):
+        counter = counters.get(key)
+        return counter.count if counter else 0
+
+    def grouped(prefix):
+        return {
+            key.split(':', 1)[1]: counter.count for key, counter in sorted(counters.items())
+            if key.startswith(f'{prefix}:') and counter.count
+        }
+
+    population = count('questionnaires')
+    bmi = counters.get('bmi')
+    result = {
+        'questionnaires': population,
+        'by_status': grouped('status'),
+        'smoking_status': grouped('smoking'),
+        'average_bmi': round(bmi.total / bmi.count, 2) if bmi and bmi.count else None,
+    }
+    for prefix, _, fields in FLAGS:
+        result[prefix] = {
+            field: {'count': count(f'{prefix}:{field}'), 'rate': _rate(count(f'{prefix}:{field}'), population)}
+            for field in fields
+        }
+    return result
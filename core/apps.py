@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Registers the snapshot post_delete receiver that keeps the counters in step
+        from . import analytics  # noqa: F401
+        # Registers the User receivers that invalidate cached authentication
+        from . import authentication  # noqa: F401
+        # Times the queries of every connection opened from now on
+        from . import metrics  # noqa: F401
+        # Registers the background job handlers
+        from . import tasks  # noqa: F401
+        # Registers the system check that the questionnaire cache is shared between workers
+        from . import checks  # noqa: F401
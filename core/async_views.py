@@ -0,0 +1,232 @@
+"""
+Async (ASGI-native) versions of the hot read endpoints.
+
+Same data and permissions as the viewsets' GETs, but authentication,
+queries and rendering never leave the event loop's task, so under ASGI a
+slow read does not hold a worker thread. Pages are forward-only keyset
+cursors (``next`` only); filters and ``?ordering=`` match the sync list.
+"""
+import base64
+import json
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.http import HttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from . import metrics
+from .renderers import dumps
+from .authentication import aget_user
+from .db_router import ause_replica_for_reads
+from .filters import FieldFilterBackend
+from .models import (
+    PersonalInfo, Lifestyle, MedicalHistory, FamilyHistory, Measurements,
+    Symptoms, PreventiveCare, HealthQuestionnaire
+)
+from .pagination import IdCursorPagination, QuestionnaireCursorPagination
+from .serializers import (
+    PersonalInfoSerializer, LifestyleSerializer, MedicalHistorySerializer, FamilyHistorySerializer,
+    MeasurementsSerializer, SymptomsSerializer, PreventiveCareSerializer, QuestionnaireSnapshotSerializer
+)
+from .views import HealthQuestionnaireViewSet, MeasurementsViewSet
+
+_jwt = JWTAuthentication()
+
+# URL prefix -> (model, serializer, viewset whose filters apply)
+SECTIONS = {
+    'personal-info': (PersonalInfo, PersonalInfoSerializer, None),
+    'lifestyle': (Lifestyle, LifestyleSerializer, None),
+    'medical-history': (MedicalHistory, MedicalHistorySerializer, None),
+    'family-history': (FamilyHistory, FamilyHistorySerializer, None),
+    'measurements': (Measurements, MeasurementsSerializer, MeasurementsViewSet),
+    'symptoms': (Symptoms, SymptomsSerializer, None),
+    'preventive-care': (PreventiveCare, PreventiveCareSerializer, None),
+}
+
+
+def _json(data, status=200):
+    with metrics.timer('render'):
+        content = dumps(data)
+    return HttpResponse(content, status=status, content_type='application/json')
+
+
+def _error(detail, status):
+    return _json({'detail': detail}, status=status)
+
+
+async def authenticate(request):
+    """The active user named by the request's JWT access token, or None."""
+    with metrics.timer('auth'):
+        header = _jwt.get_header(request)
+        raw_token = _jwt.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
+        try:
+            return await aget_user(_jwt.get_validated_token(raw_token))
+        except (InvalidToken, AuthenticationFailed):
+            return None
+
+
+def api_view(staff_only=False):
+    """Authenticate with the JWT, check permissions and opt the request into replica reads."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return _error(f'Method "{request.method}" not allowed.', 405)
+            user = await authenticate(request)
+            if user is None:
+                return _error('Authentication credentials were not provided.', 401)
+            if staff_only and not user.is_staff:
+                return _error('You do not have permission to perform this action.', 403)
+            request.user = user
+            await ause_replica_for_reads(user)
+            try:
+                return await view(request, *args, **kwargs)
+            except ValidationError as exc:
+                return _json(exc.detail, status=400)
+        return wrapper
+    return decorator
+
+
+def _filtered(request, queryset, view_class):
+    if view_class is None:
+        return queryset
+    # FieldFilterBackend only reads query_params; it builds the queryset without querying
+    request.query_params = request.GET
+    return FieldFilterBackend().filter_queryset(request, queryset, view_class)
+
+
+def _encode_cursor(values):
+    # isoformat() keeps the microseconds DjangoJSONEncoder would round away, or the seek would repeat rows
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        values = None
+    # Only ever a list of the ordering fields' values
+    if not isinstance(values, list) or not all(
+        value is None or isinstance(value, (str, int, float)) for value in values
+    ):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+    return values
+
+
+def _page_size(request, pagination):
+    try:
+        size = int(request.GET.get(pagination.page_size_query_param, pagination.page_size))
+    except ValueError:
+        return pagination.page_size
+    return min(max(size, 1), pagination.max_page_size)
+
+
+async def _keyset_page(request, queryset, ordering, pagination):
+    """
+    One page of ``queryset`` in ``ordering``, seeking past the cursor's row.
+
+    Returns ``(rows, next cursor or None)``.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor:
+        values = _decode_cursor(cursor)
+        fields = [field.lstrip('-') for field in ordering]
+        if len(values) != len(fields):
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), direction per field
+        after, equal = Q(), {}
+        for field, ordered, value in zip(fields, ordering, values):
+            lookup = 'lt' if ordered.startswith('-') else 'gt'
+            after |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        queryset = queryset.filter(after)
+    size = _page_size(request, pagination)
+    rows = [row async for row in queryset.order_by(*ordering)[:size + 1]]
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = [getattr(rows[-1], field.lstrip('-')) for field in ordering]
+    return rows, _encode_cursor(last)
+
+
+def _page_response(request, results, next_cursor):
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+    return _json({'next': next_url, 'previous': None, 'results': results})
+
+
+async def _questionnaire_payloads(questionnaires):
+    serializer = QuestionnaireSnapshotSerializer(questionnaires, many=True)
+    if all(hasattr(questionnaire, 'snapshot') for questionnaire in questionnaires):
+        return serializer.data
+    # Some have no snapshot yet: the fallback reads their sections with one query
+    return await sync_to_async(lambda: serializer.data)()
+
+
+def _questionnaires(request):
+    queryset = HealthQuestionnaire.objects.select_related('snapshot')
+    if not request.user.is_staff:
+        queryset = queryset.filter(user=request.user)
+    return _filtered(request, queryset, HealthQuestionnaireViewSet)
+
+
+def _questionnaire_ordering(request):
+    pagination = QuestionnaireCursorPagination
+    value = request.GET.get('ordering')
+    if value is None:
+        return pagination.ordering
+    if value not in pagination.orderings:
+        raise ValidationError({'ordering': f"Choose one of: {', '.join(pagination.orderings)}."})
+    return pagination.orderings[value]
+
+
+async def _questionnaire_list(request, queryset):
+    rows, next_cursor = await _keyset_page(
+        request, queryset, _questionnaire_ordering(request), QuestionnaireCursorPagination,
+    )
+    return _page_response(request, await _questionnaire_payloads(rows), next_cursor)
+
+
+@api_view()
+async def questionnaire_list(request):
+    return await _questionnaire_list(request, _questionnaires(request))
+
+
+@api_view(staff_only=True)
+async def questionnaire_pending(request):
+    return await _questionnaire_list(request, _questionnaires(request).filter(status='pending'))
+
+
+@api_view()
+async def questionnaire_detail(request, pk):
+    questionnaire = await _questionnaires(request).filter(pk=pk).afirst()
+    if questionnaire is None:
+        return _error('No HealthQuestionnaire matches the given query.', 404)
+    return _json((await _questionnaire_payloads([questionnaire]))[0])
+
+
+@api_view()
+async def section_list(request, section):
+    model, serializer_class, view_class = SECTIONS[section]
+    queryset = _filtered(request, model.objects.all(), view_class)
+    rows, next_cursor = await _keyset_page(request, queryset, IdCursorPagination.ordering, IdCursorPagination)
+    return _page_response(request, serializer_class(rows, many=True).data, next_cursor)
+
+
+@api_view()
+async def section_detail(request, section, pk):
+    model, serializer_class, _ = SECTIONS[section]
+    instance = await model.objects.filter(pk=pk).afirst()
+    if instance is None:
+        return _error(f'No {model.__name__} matches the given query.', 404)
+    return _json(serializer_class(instance).data)
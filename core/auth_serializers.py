@@ -2,6 +2,10 @@ from django.contrib.auth.models import User
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 from django.contrib.auth.password_validation import validate_password
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from .authentication import ISSUED_AT_MS_CLAIM, now_ms
+from .password_hashing import hash_password
 
 class RegisterSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(
@@ -21,12 +25,23 @@ class RegisterSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        user = User.objects.create(
+        # Hashed before the INSERT (on the hashing pool when configured), so one query writes the user
+        return User.objects.create(
             username=validated_data['username'],
             email=validated_data['email'],
             first_name=validated_data.get('first_name', ''),
             last_name=validated_data.get('last_name', ''),
+            password=hash_password(validated_data['password']),
         )
-        user.set_password(validated_data['password'])
-        user.save()
-        return user
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair carrying the claims ClaimsJWTAuthentication authorizes from."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.username
+        token['is_staff'] = user.is_staff
+        token[ISSUED_AT_MS_CLAIM] = now_ms()
+        return token
@@ -0,0 +1,199 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import cache_versions, metrics
+from .models import TokenRevocation
+
+CACHE_ALIAS = 'auth'
+# Saves touching these end the validity of claims already issued in tokens
+CLAIM_FIELDS = frozenset({'password', 'is_active', 'is_staff', 'is_superuser'})
+# When the token was issued, in Unix milliseconds: iat only has whole seconds
+ISSUED_AT_MS_CLAIM = 'iat_ms'
+
+
+def now_ms():
+    return time.time_ns() // 1_000_000
+
+
+def _version_key(user_id):
+    return f'auth:user:version:{user_id}'
+
+
+def _entry_key(user_id):
+    return f'auth:user:{user_id}:{cache_versions.current(_version_key(user_id))}'
+
+
+async def _aentry_key(user_id):
+    return f'auth:user:{user_id}:{await cache_versions.acurrent(_version_key(user_id))}'
+
+
+def issued_at_ms(validated_token):
+    """
+    When the token was issued, in Unix milliseconds. Tokens without the
+    millisecond claim count from the start of their iat second, so one
+    issued in the same second as a revocation is rejected.
+    """
+    if ISSUED_AT_MS_CLAIM in validated_token:
+        return validated_token[ISSUED_AT_MS_CLAIM]
+    return validated_token.get('iat', 0) * 1000
+
+
+def _user_id(validated_token):
+    try:
+        return validated_token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken('Token contained no recognizable user identification')
+
+
+def _lookup(user_id):
+    return {jwt_settings.USER_ID_FIELD: user_id}
+
+
+def check_user(user, validated_token):
+    """simplejwt's per-request checks, applied to a user that may come from the cache."""
+    if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed('User is inactive', code='user_inactive')
+    if jwt_settings.CHECK_REVOKE_TOKEN and (
+        validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+    ):
+        raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+    return user
+
+
+def get_user(validated_token):
+    """
+    The token's user from this process's auth cache, loading it on a miss.
+
+    Entries are keyed by the user's shared version counter
+    (core.cache_versions), so saving the user in any worker orphans them
+    everywhere. The version is read before loading, so a row loaded while a change to
+    it commits is cached under the superseded version and never served.
+    """
+    user_id = _user_id(validated_token)
+    cache = caches[CACHE_ALIAS]
+    key = _entry_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.filter(**_lookup(user_id)).first()
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        cache.set(key, user)
+    return check_user(user, validated_token)
+
+
+async def aget_user(validated_token):
+    """``get_user`` for async views; a miss loads the user through the async ORM."""
+    user_id = _user_id(validated_token)
+    cache = caches[CACHE_ALIAS]
+    key = await _aentry_key(user_id)
+    user = await cache.aget(key)
+    if user is None:
+        user = await User.objects.filter(**_lookup(user_id)).afirst()
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        await cache.aset(key, user)
+    return check_user(user, validated_token)
+
+
+def invalidate(user_ids):
+    """Drop the users' cached rows, in every process, by bumping their version counters."""
+    cache_versions.bump(_version_key(user_id) for user_id in set(user_ids))
+
+
+def revoke_claims(user_ids):
+    """
+    Reject claims-only authentication with any token issued to the users before now.
+
+    Recorded in the database, in the caller's transaction, so every process
+    sees it and nothing evicts it.
+    """
+    revoked_at = now_ms()
+    TokenRevocation.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [TokenRevocation(user_id=user_id, revoked_at=revoked_at) for user_id in set(user_ids)],
+        update_conflicts=True, unique_fields=['user_id'], update_fields=['revoked_at'],
+    )
+
+
+def revoked_at(user_id):
+    """When the user's claims were last revoked (Unix milliseconds), or None. Read from the primary."""
+    return TokenRevocation.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).values_list(
+        'revoked_at', flat=True,
+    ).first()
+
+
+@receiver(post_save, sender=User)
+def _user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    user_ids = [instance.pk]
+    transaction.on_commit(lambda: invalidate(user_ids))
+    if update_fields is None or CLAIM_FIELDS & set(update_fields):
+        revoke_claims(user_ids)
+
+
+@receiver(post_delete, sender=User)
+def _user_deleted(sender, instance, **kwargs):
+    user_ids = [instance.pk]
+    revoke_claims(user_ids)
+    transaction.on_commit(lambda: invalidate(user_ids))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that reads the token's user from a bounded in-process cache.
+
+    Saving or deleting a user invalidates their entry in every process; the
+    ``auth`` cache's TIMEOUT bounds how long rows changed with
+    ``QuerySet.update()`` keep being served.
+    """
+
+    def authenticate(self, request):
+        with metrics.timer('auth'):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        return get_user(validated_token)
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticate from the token's claims alone: ``request.user`` is a TokenUser.
+
+    Tokens issued before the user was last deactivated, had their password
+    or staff flags changed, or was deleted are rejected. That costs one
+    primary-key lookup in the revocation table instead of loading the user.
+    """
+
+    def authenticate(self, request):
+        with metrics.timer('auth'):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        revoked = revoked_at(user.id)
+        if revoked is not None and issued_at_ms(validated_token) <= revoked:
+            raise AuthenticationFailed('Token was issued before the account changed.', code='token_revoked')
+        return user
+
+
+class ClaimsAuthenticatedReadsMixin:
+    """
+    View mixin authenticating safe-method requests from token claims when
+    ``JWT_CLAIMS_ONLY_READS`` is on; other requests keep the configured classes.
+    """
+
+    def get_authenticators(self):
+        if getattr(settings, 'JWT_CLAIMS_ONLY_READS', False) and self.request.method in SAFE_METHODS:
+            return [ClaimsJWTAuthentication()]
+        return super().get_authenticators()
@@ -0,0 +1,269 @@
+"""
+Helpers shared by the ``benchmark_*`` management commands: a throwaway
+database, a synthetic population, in-process ASGI and threaded WSGI load
+generators, best-of-N timing and latency summaries.
+"""
+import asyncio
+import contextlib
+import math
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .questionnaire_writer import bulk_write_questionnaires
+
+SEED_BATCH_SIZE = 500
+PASSWORD = 'benchmark-password'
+
+
+@contextlib.contextmanager
+def temporary_database():
+    """
+    Run the body against a freshly migrated test database, destroyed afterwards.
+
+    Benchmarks never touch the configured database, and every run starts
+    from the same empty state.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    for cache in caches.all(initialized_only=True):
+        cache.clear()
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def questionnaire_data(rng):
+    """One complete submission, as ``CompleteQuestionnaireSerializer`` validated data."""
+    height = round(rng.gauss(170, 10), 1)
+    return {
+        'age': rng.randint(18, 90),
+        'gender': rng.choice(['female', 'male', 'other']),
+        'contact': f'555-{rng.randint(0, 9999):04d}',
+        'smoking_status': rng.choice(['never', 'never', 'former', 'current']),
+        'alcohol_consumption': rng.choice(['none', 'occasional', 'weekly']),
+        'physical_activity': rng.choice(['none', 'daily walks', 'gym']),
+        'diet': rng.choice(['balanced', 'vegetarian', 'high fat']),
+        'diabetes_medical': rng.random() < 0.1,
+        'hypertension': rng.random() < 0.2,
+        'heart_disease_medical': rng.random() < 0.05,
+        'diabetes_family': rng.random() < 0.25,
+        'heart_disease_family': rng.random() < 0.2,
+        'cancer_family': rng.random() < 0.15,
+        'height_cm': height,
+        'weight_kg': round(rng.gauss(78, 15), 1),
+        'blood_pressure': f'{round(rng.gauss(128, 15))}/{round(rng.gauss(82, 10))}',
+        'blood_sugar': str(round(rng.gauss(100, 20))),
+        'cholesterol': str(round(rng.gauss(195, 35))),
+        'chest_pain': rng.random() < 0.05,
+        'breathlessness': rng.random() < 0.1,
+        'fatigue': rng.random() < 0.2,
+        'sleep_quality': rng.choice(['good', 'fair', 'poor']),
+        'stress_level': rng.choice(['low', 'medium', 'high']),
+        'vaccinations': 'flu',
+    }
+
+
+def seed_population(patients, seed=0, staff=1):
+    """
+    Create ``patients`` users with a submitted questionnaire each, plus ``staff`` admins.
+
+    Everyone's password is ``PASSWORD``. Returns ``(patient users, staff users)``.
+    """
+    rng = random.Random(seed)
+    # Hashing once keeps seeding fast; the users still log in normally
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        [User(username=f'bench-patient-{i}', password=password) for i in range(patients)]
+        + [User(username=f'bench-staff-{i}', password=password, is_staff=True) for i in range(staff)],
+        batch_size=SEED_BATCH_SIZE,
+    )
+    users = list(User.objects.filter(username__startswith='bench-').order_by('pk'))
+    patient_users = [user for user in users if not user.is_staff]
+    for start in range(0, len(patient_users), SEED_BATCH_SIZE):
+        batch = patient_users[start:start + SEED_BATCH_SIZE]
+        bulk_write_questionnaires([(user.pk, questionnaire_data(rng)) for user in batch])
+    return patient_users, [user for user in users if user.is_staff]
+
+
+def bearer(user):
+    return {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+
+async def asgi_request(app, method, path, params=None, headers=None, body=b''):
+    """
+    Send one request through ``app`` in-process. Returns ``(status, body)``.
+
+    No sockets are involved, so what is measured is the application, not
+    a server or the client's network stack.
+    """
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': urlencode(params or {}).encode(),
+        'root_path': '',
+        'headers': [
+            (name.lower().encode(), value.encode())
+            for name, value in {'Host': 'localhost', **(headers or {})}.items()
+        ],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 0),
+    }
+    done = asyncio.Event()
+    request_sent = False
+    status, chunks = None, []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # The client stays connected until the response is complete
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                done.set()
+
+    await app(scope, receive, send)
+    done.set()
+    return status, b''.join(chunks)
+
+
+async def load(request, total, concurrency):
+    """
+    Issue ``total`` calls of ``request(i)`` from ``concurrency`` concurrent clients.
+
+    Returns ``(latencies in seconds, elapsed seconds, non-2xx count)``.
+    """
+    latencies, errors, issued = [], 0, iter(range(total))
+
+    async def client():
+        nonlocal errors
+        for i in issued:
+            start = time.perf_counter()
+            status, _ = await request(i)
+            latencies.append(time.perf_counter() - start)
+            if not 200 <= status < 300:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start, errors
+
+
+class QueryCounter:
+    """A ``connection.execute_wrapper`` that counts the queries run through it."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def load_threads(request, total, concurrency):
+    """
+    Issue ``total`` calls of ``request(i)`` from ``concurrency`` threads.
+
+    The WSGI counterpart of ``load``: ``request(i)`` makes one synchronous
+    call (e.g. through ``django.test.Client``) and returns its status code.
+    Each thread keeps its database connection for the whole run, so
+    connecting is not measured. Returns ``(latencies in seconds, elapsed
+    seconds, non-2xx count, queries per request)``.
+    """
+    latencies, queries, issued = [], [], iter(range(total))
+    errors = 0
+    lock = threading.Lock()
+
+    def client():
+        nonlocal errors
+        try:
+            while True:
+                with lock:
+                    i = next(issued, None)
+                if i is None:
+                    return
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    start = time.perf_counter()
+                    status = request(i)
+                    latency = time.perf_counter() - start
+                with lock:
+                    latencies.append(latency)
+                    queries.append(counter.count)
+                    if not 200 <= status < 300:
+                        errors += 1
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start, errors, queries
+
+
+def best_of(func, repeat):
+    """``(seconds, result)`` of the fastest of ``repeat`` calls to ``func``."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, elapsed, errors=0, queries=None):
+    """
+    Throughput and latency percentiles (milliseconds) for one measured run,
+    plus the mean and maximum database queries per request when given.
+    """
+    ordered = sorted(latencies)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+
+    summary = {
+        'requests': len(ordered),
+        'errors': errors,
+        'requests_per_second': round(len(ordered) / elapsed, 1) if elapsed else None,
+        'p50_ms': ms(percentile(ordered, 0.50)),
+        'p95_ms': ms(percentile(ordered, 0.95)),
+        'p99_ms': ms(percentile(ordered, 0.99)),
+        'max_ms': ms(ordered[-1] if ordered else None),
+    }
+    if queries:
+        summary['queries_mean'] = round(sum(queries) / len(queries), 2)
+        summary['queries_max'] = max(queries)
+    return summary
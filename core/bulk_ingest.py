@@ -0,0 +1,120 @@
+import json
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError, transaction
+from rest_framework import serializers
+
+from . import jobs
+from .questionnaire_writer import bulk_write_questionnaires
+from .serializers import CompleteQuestionnaireSerializer
+
+BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+
+
+def _error(line, username, errors):
+    return {'line': line, 'username': username, 'status': 'error', 'errors': errors}
+
+
+def parse_ndjson(stream):
+    """Yield ``(line_number, record, errors)`` from an NDJSON byte stream, one line at a time."""
+    for number, raw in enumerate(stream, 1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as exc:
+            yield number, None, {'non_field_errors': [f'Invalid JSON: {exc}']}
+            continue
+        if not isinstance(record, dict):
+            yield number, None, {'non_field_errors': ['Expected a JSON object.']}
+            continue
+        yield number, record, None
+
+
+def _write_batch(batch):
+    """Resolve usernames and bulk-write one batch, yielding a result per record."""
+    user_ids = dict(
+        User.objects.filter(username__in=[username for _, username, _ in batch])
+        .values_list('username', 'pk')
+    )
+    known = []
+    for line, username, validated_data in batch:
+        if username in user_ids:
+            known.append((line, username, validated_data))
+        else:
+            yield _error(line, username, {'username': ['Unknown user.']})
+    if not known:
+        return
+
+    try:
+        # One transaction, so a committed batch always has its scoring queued
+        with transaction.atomic():
+            written, rejected = bulk_write_questionnaires(
+                [(user_ids[username], validated_data) for _, username, validated_data in known]
+            )
+            if written:
+                # Coalesced with every other submission's run, as submit_complete does
+                jobs.enqueue('score_risk', unique_key='incremental')
+    except DatabaseError as exc:
+        for line, username, _ in known:
+            yield _error(line, username, {'non_field_errors': [f'Batch failed: {exc}']})
+        return
+
+    for line, username, _ in known:
+        user_id = user_ids[username]
+        if user_id in rejected:
+            yield _error(line, username, {
+                field: ['This field is required for a first submission.'] for field in rejected[user_id]
+            })
+            continue
+        questionnaire, created = written[user_id]
+        yield {
+            'line': line,
+            'username': username,
+            'status': 'created' if created else 'updated',
+            'id': questionnaire.id,
+        }
+
+
+def ingest_ndjson(stream, batch_size=BATCH_SIZE):
+    """
+    Validate and write questionnaires from an NDJSON stream, yielding one result per record.
+
+    Each line is a ``CompleteQuestionnaireSerializer`` payload plus the patient's
+    ``username``. Records are validated as they are read and written in batches
+    of ``batch_size``, each batch in its own transaction. Invalid records are
+    reported immediately, so results are not strictly in line order; every
+    result carries its ``line`` number.
+    """
+    validator = CompleteQuestionnaireSerializer()
+    batch, usernames = [], set()
+    for line, record, errors in parse_ndjson(stream):
+        if errors:
+            yield _error(line, None, errors)
+            continue
+        username = record.pop('username', None)
+        if not username:
+            yield _error(line, None, {'username': ['This field is required.']})
+            continue
+        if not isinstance(username, str):
+            yield _error(line, None, {'username': ['Must be a string.']})
+            continue
+        try:
+            validated_data = validator.run_validation(record)
+        except serializers.ValidationError as exc:
+            yield _error(line, username, exc.detail)
+            continue
+
+        if username in usernames:
+            # A later record for the same patient supersedes the earlier one
+            yield from _write_batch(batch)
+            batch, usernames = [], set()
+        batch.append((line, username, validated_data))
+        usernames.add(username)
+        if len(batch) >= batch_size:
+            yield from _write_batch(batch)
+            batch, usernames = [], set()
+    if batch:
+        yield from _write_batch(batch)
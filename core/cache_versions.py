@@ -0,0 +1,43 @@
+"""
+Version counters for caches whose entries live in each worker process.
+
+An entry's key carries its owner's counter, read from the ``versions``
+cache that every worker shares. Bumping the counter there orphans the
+entries cached under the old value in every process at once, so the
+entries themselves can sit in a fast per-process LRU cache.
+"""
+import time
+
+from django.core.cache import caches
+
+CACHE_ALIAS = 'versions'
+
+
+def current(key):
+    cache = caches[CACHE_ALIAS]
+    version = cache.get(key)
+    if version is None:
+        # A fresh, never-reused starting point, so entries written under an
+        # evicted counter can never be mistaken for current ones
+        cache.add(key, time.time_ns())
+        version = cache.get(key)
+    return version
+
+
+async def acurrent(key):
+    cache = caches[CACHE_ALIAS]
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns())
+        version = await cache.aget(key)
+    return version
+
+
+def bump(keys):
+    """Advance each counter, orphaning every entry cached under its old value."""
+    cache = caches[CACHE_ALIAS]
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass  # No counter means nothing was cached under it
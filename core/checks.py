@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core import checks
+
+from . import cache_versions
+
+
+@checks.register(checks.Tags.caches)
+def check_cache_versions_are_shared(app_configs, **kwargs):
+    backend = settings.CACHES.get(cache_versions.CACHE_ALIAS, {}).get('BACKEND')
+    if backend != 'django.core.cache.backends.locmem.LocMemCache':
+        return []
+    return [checks.Warning(
+        f"The '{cache_versions.CACHE_ALIAS}' cache is a LocMemCache, which each worker process "
+        "keeps for itself. A write bumps only the writing process's version counter, so other "
+        'workers keep serving the superseded questionnaire or user until TIMEOUT.',
+        hint='Use a backend shared by every worker: FileBasedCache on one machine, Redis or Memcached across several.',
+        id='core.W001',
+    )]
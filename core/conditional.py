@@ -0,0 +1,141 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+CONDITIONAL_HEADERS = (
+    'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE',
+)
+
+
+def page_links_validator(has_next, has_previous):
+    """A row validator for a page's next/previous links, which rows past either end of it change."""
+    return f'next:{has_next}:previous:{has_previous}', None
+
+
+def _links_validator(paginator):
+    return page_links_validator(getattr(paginator, 'has_next', None), getattr(paginator, 'has_previous', None))
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for list and retrieve.
+
+    Validators are computed from ``validator_fields`` only, a few narrow columns
+    per row. A conditional request fetches just those columns and is answered
+    with 304 before any payload is loaded or serialized; other requests take
+    the validators from the rows the response loaded anyway. Every change to
+    a row must change at least one of those columns.
+    """
+    validator_fields = ('id',)
+
+    def row_validators(self, obj):
+        """Return ``(etag token, last-modified datetime or None)`` for one row."""
+        raise NotImplementedError
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Row validators of whatever the response ends up loading
+        self.loaded_validators = None
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            self.loaded_validators = [self.row_validators(obj) for obj in page] + [_links_validator(self.paginator)]
+        return page
+
+    def get_object(self):
+        obj = super().get_object()
+        self.loaded_validators = [self.row_validators(obj)]
+        return obj
+
+    def validator_variant(self):
+        """Tells apart representations of the same rows; part of every ETag."""
+        return self.request.accepted_renderer.format
+
+    def _query_validators(self, queryset, many):
+        # Only the relations the validators read; others the response joins would be loaded for nothing
+        relations = {field.rsplit('__', 1)[0] for field in self.validator_fields if '__' in field}
+        queryset = queryset.select_related(None).select_related(*relations).only(*self.validator_fields)
+        if not many:
+            rows = list(queryset[:1])
+        elif self.paginator is None:
+            rows = list(queryset)
+        else:
+            # A throwaway paginator, so the real response still builds its own links
+            paginator = self.paginator.__class__()
+            rows = paginator.paginate_queryset(queryset, self.request, view=self)
+            return [self.row_validators(obj) for obj in rows] + [_links_validator(paginator)]
+        return [self.row_validators(obj) for obj in rows]
+
+    def _combine(self, row_validators):
+        tokens, last_modified = [self.validator_variant()], None
+        for token, modified in row_validators:
+            tokens.append(token)
+            if modified is not None and (last_modified is None or modified > last_modified):
+                last_modified = modified
+        digest = hashlib.md5('|'.join(map(str, tokens)).encode(), usedforsecurity=False).hexdigest()
+        return quote_etag(digest), int(last_modified.timestamp()) if last_modified else None
+
+    def _with_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Responses are per user: clients may keep them but must revalidate
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization', 'Accept'))
+        return response
+
+    def conditional_response(self, request, queryset, respond, many=True):
+        """Return 304 if the client's copy of ``queryset`` is current, else ``respond()`` with validators."""
+        validators = None
+        if any(header in request.META for header in CONDITIONAL_HEADERS):
+            row_validators = self._query_validators(queryset, many)
+            if many or row_validators:
+                validators = self._combine(row_validators)
+                etag, last_modified = validators
+                not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if not_modified is not None:
+                    return self._with_validators(not_modified, etag, last_modified)
+
+        response = respond()
+        if response.status_code != 200:
+            return response
+        if validators is None:
+            row_validators = self.loaded_validators
+            if row_validators is None:
+                row_validators = self._query_validators(queryset, many)
+            validators = self._combine(row_validators)
+        return self._with_validators(response, *validators)
+
+    def _lookup_queryset(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, self.filter_queryset(self.get_queryset()),
+            lambda: self.list_response(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            queryset = self._lookup_queryset()
+        except (TypeError, ValueError, ValidationError):
+            return self.retrieve_response(request, *args, **kwargs)
+        return self.conditional_response(
+            request, queryset,
+            lambda: self.retrieve_response(request, *args, **kwargs),
+            many=False,
+        )
+
+    def list_response(self, request, *args, **kwargs):
+        """The full list response, built only when the client's copy is stale."""
+        return super().list(request, *args, **kwargs)
+
+    def retrieve_response(self, request, *args, **kwargs):
+        """The full detail response, built only when the client's copy is stale."""
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,164 @@
+import contextvars
+import random
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from .models import PrimaryPin
+
+# Per-request routing decisions; None outside a request (commands, shells, tests without a client)
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = None  # Replica alias this request's reads may use, once a view opts in
+        self.wrote = False
+
+
+def _replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def _pins(user):
+    # Always the primary: every worker sees a pin as soon as it is written
+    return PrimaryPin.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user.pk, until__gt=timezone.now())
+
+
+def pinned_to_primary(user):
+    """True while ``user`` wrote recently enough that a replica may not have their write yet."""
+    return bool(user and user.is_authenticated) and _pins(user).exists()
+
+
+async def apinned_to_primary(user):
+    return bool(user and user.is_authenticated) and await _pins(user).aexists()
+
+
+def _may_use_replica(state):
+    return state is not None and _replicas() and not state.wrote
+
+
+def use_replica_for_reads(user):
+    """
+    Let the rest of this request read from one replica.
+
+    Does nothing outside a request, without replicas, or while ``user`` is
+    pinned to the primary by a recent write.
+    """
+    state = _state.get()
+    if _may_use_replica(state) and not pinned_to_primary(user):
+        state.replica = random.choice(_replicas())
+
+
+async def ause_replica_for_reads(user):
+    """``use_replica_for_reads`` for async views."""
+    state = _state.get()
+    if _may_use_replica(state) and not await apinned_to_primary(user):
+        state.replica = random.choice(_replicas())
+
+
+def read_alias():
+    """The alias this request reads from, for querysets evaluated after the view returns."""
+    state = _state.get()
+    if state is None or state.replica is None or state.wrote:
+        return DEFAULT_DB_ALIAS
+    return state.replica
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads a view opted in for to a replica; everything else to the primary.
+
+    Once anything is written in the request its remaining reads stay on the
+    primary, as do reads inside a primary transaction (they may be about to
+    write, or need locks).
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.replica is None or state.wrote:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *_replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+_UPSERT = {'update_conflicts': True, 'unique_fields': ['user_id'], 'update_fields': ['until']}
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Scope routing state to one request, and pin a user's reads to the primary
+    for ``DATABASE_REPLICA_PIN_SECONDS`` after a request of theirs wrote.
+
+    The pin is a ``PrimaryPin`` row on the primary, so it holds whichever
+    worker process serves the user next. Runs natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _pin(self, request, state):
+        user = getattr(request, 'user', None)
+        if state.wrote and _replicas() and user is not None and user.is_authenticated:
+            until = timezone.now() + timedelta(seconds=getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 10))
+            return [PrimaryPin(user_id=user.pk, until=until)]
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        pin = self._pin(request, state)
+        if pin:
+            PrimaryPin.objects.using(DEFAULT_DB_ALIAS).bulk_create(pin, **_UPSERT)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        pin = self._pin(request, state)
+        if pin:
+            await PrimaryPin.objects.using(DEFAULT_DB_ALIAS).abulk_create(pin, **_UPSERT)
+        return response
+
+
+class ReplicaReadMixin:
+    """Viewset mixin routing the reads of ``replica_actions`` to a replica."""
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            use_replica_for_reads(request.user)
@@ -0,0 +1,151 @@
+import csv
+import io
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import HealthQuestionnaire, QUESTIONNAIRE_SECTIONS
+
+CHUNK_SIZE = 2000
+FORMATS = ('csv', 'ndjson', 'parquet')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+ROOT_COLUMNS = ('id', 'user_id', 'submitted_at', 'status', 'admin_feedback')
+
+
+def _columns():
+    columns = [(name, HealthQuestionnaire._meta.get_field(name)) for name in ROOT_COLUMNS]
+    for section in QUESTIONNAIRE_SECTIONS:
+        model = HealthQuestionnaire._meta.get_field(section).related_model
+        columns.extend(
+            (f'{section}__{field.name}', field) for field in model._meta.concrete_fields
+            if not field.primary_key and field.name != 'user'
+        )
+    return columns
+
+
+# One flat column per questionnaire field and section field, e.g. 'measurements__bmi'
+EXPORT_FIELDS = _columns()
+EXPORT_COLUMNS = tuple(name for name, _ in EXPORT_FIELDS)
+
+
+def iter_rows(queryset=None, chunk_size=CHUNK_SIZE):
+    """Yield flat row tuples in id order, fetched ``chunk_size`` rows at a time."""
+    if queryset is None:
+        queryset = HealthQuestionnaire.objects.all()
+    return queryset.order_by('id').values_list(*EXPORT_COLUMNS).iterator(chunk_size=chunk_size)
+
+
+def _chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_csv(rows, chunk_size=CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in _chunked(rows, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def stream_ndjson(rows, chunk_size=CHUNK_SIZE):
+    encoder = DjangoJSONEncoder()
+    for chunk in _chunked(rows, chunk_size):
+        yield ''.join(encoder.encode(dict(zip(EXPORT_COLUMNS, row))) + '\n' for row in chunk).encode()
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents are handed off after every row group."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(pa):
+    types = {
+        'BigAutoField': pa.int64(),
+        'ForeignKey': pa.int64(),
+        'OneToOneField': pa.int64(),
+        'PositiveIntegerField': pa.int64(),
+        'FloatField': pa.float64(),
+        'BooleanField': pa.bool_(),
+        'DateField': pa.date32(),
+        'DateTimeField': pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([
+        (name, types.get(field.get_internal_type(), pa.string())) for name, field in EXPORT_FIELDS
+    ])
+
+
+def stream_parquet(rows, chunk_size=CHUNK_SIZE):
+    """Write one Parquet row group per chunk, yielding the bytes as each group completes."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa)
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for chunk in _chunked(rows, chunk_size):
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=schema.field(i).type) for i, column in enumerate(zip(*chunk))],
+            schema=schema,
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+    'parquet': stream_parquet,
+}
+
+
+def format_error(file_format):
+    """Return why ``file_format`` cannot be exported here, or None if it can."""
+    if file_format not in FORMATS:
+        return f"Unknown format '{file_format}'. Choose one of: {', '.join(FORMATS)}."
+    if file_format == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            return 'Parquet export requires the optional pyarrow package.'
+    return None
+
+
+def export(file_format, queryset=None, chunk_size=CHUNK_SIZE):
+    """Stream every questionnaire, joined with its sections, as encoded ``file_format`` chunks."""
+    return STREAMERS[file_format](iter_rows(queryset, chunk_size), chunk_size)
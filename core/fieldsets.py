@@ -0,0 +1,99 @@
+"""
+Sparse fieldsets for questionnaire reads: ``?fields=`` and ``?sections=``.
+
+``?sections=symptoms,measurements`` keeps every questionnaire field but
+only the named sections. ``?fields=status,submitted_at,personal_info.age,symptoms``
+keeps only the named fields: a bare section name keeps the whole section,
+``section.field`` one field of it. Given both, the response has the union.
+``id`` is always included.
+
+A selection is compiled into a ``FlatSerializer`` over just those fields,
+so only the requested sections are joined, only the requested columns are
+loaded, and serializing a row touches nothing else.
+"""
+import functools
+
+from rest_framework.exceptions import ValidationError
+
+from .flat_serializer import FlatSerializer
+from .serializers import HealthQuestionnaireSerializer
+
+
+@functools.cache
+def _schema():
+    """``(questionnaire fields, {section: section fields})`` of the full payload."""
+    root, sections = [], {}
+    for name, field in HealthQuestionnaireSerializer().fields.items():
+        if hasattr(field, 'fields'):
+            sections[name] = tuple(field.fields)
+        else:
+            root.append(name)
+    return tuple(root), sections
+
+
+def _names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def parse(query_params):
+    """
+    The selection requested by ``query_params``, normalized and hashable, or
+    None for the full payload. Unknown names are a ValidationError (400).
+    """
+    if 'fields' not in query_params and 'sections' not in query_params:
+        return None
+    root_fields, section_fields = _schema()
+    root, sections, errors = None, {}, {}
+
+    unknown = []
+    for name in _names(query_params.get('sections', '')):
+        if name in section_fields:
+            sections[name] = None  # The whole section
+        else:
+            unknown.append(name)
+    if unknown:
+        errors['sections'] = f"Unknown section(s): {', '.join(unknown)}. Choose from: {', '.join(section_fields)}."
+
+    if 'fields' in query_params:
+        root, unknown = {'id'}, []
+        for name in _names(query_params['fields']):
+            section, _, field = name.partition('.')
+            if not field and section in section_fields:
+                sections[section] = None
+            elif not field and section in root_fields:
+                root.add(section)
+            elif field in section_fields.get(section, ()):
+                if sections.get(section, ()) is not None:
+                    sections.setdefault(section, set()).add(field)
+            else:
+                unknown.append(name)
+        if unknown:
+            errors['fields'] = (
+                f"Unknown field(s): {', '.join(unknown)}. Name questionnaire fields, "
+                "sections, or section fields as section.field."
+            )
+    if errors:
+        raise ValidationError(errors)
+    return (
+        tuple(sorted(root)) if root is not None else None,
+        tuple(sorted((name, tuple(sorted(fields)) if fields is not None else None) for name, fields in sections.items())),
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def compiled(selection):
+    """A ``FlatSerializer`` producing just ``selection``'s fields, in the full payload's order."""
+    root, sections = selection
+    sections = dict(sections)
+    serializer = HealthQuestionnaireSerializer()
+    for name, field in list(serializer.fields.items()):
+        if hasattr(field, 'fields'):
+            if name not in sections:
+                serializer.fields.pop(name)
+            elif sections[name] is not None:
+                for section_field in list(field.fields):
+                    if section_field not in sections[name]:
+                        field.fields.pop(section_field)
+        elif root is not None and name not in root:
+            serializer.fields.pop(name)
+    return FlatSerializer(serializer)
@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+RANGE_LOOKUPS = ('gt', 'gte', 'lt', 'lte')
+# Spellings BooleanField.to_python does not accept itself
+BOOLEANS = {'true': True, 'false': False}
+
+
+def _declared(view, attr):
+    """``{query param: lookup path}`` from a view attribute holding a tuple or a dict."""
+    fields = getattr(view, attr, ())
+    return fields if isinstance(fields, dict) else {name: name for name in fields}
+
+
+def _model_field(model, path):
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def _convert(field, raw):
+    field_type = field.get_internal_type()
+    if field_type == 'BooleanField':
+        raw = BOOLEANS.get(raw.lower(), raw)
+    value = field.to_python(raw)
+    if settings.USE_TZ and field_type == 'DateTimeField' and timezone.is_naive(value):
+        # ?submitted_at__gte=2025-01-01 means midnight in the server's time zone
+        value = timezone.make_aware(value)
+    return value
+
+
+class FieldFilterBackend(BaseFilterBackend):
+    """
+    Exact filters over ``view.exact_filter_fields`` and ``?systolic__gte=140``-style
+    range filters over ``view.range_filter_fields``.
+
+    Either attribute is a tuple of field names or a dict mapping query params
+    to lookup paths, e.g. ``{'chest_pain': 'symptoms__chest_pain'}``. Values
+    are converted by the model field, so a malformed value is a 400 rather
+    than a database error. Declare only indexed fields, so every filter runs
+    as an index lookup or range scan.
+
+    Filters through a relation become one ``relation__in`` subquery per
+    relation. The related table's index then picks its rows; joined, the
+    planner may instead walk the whole outer table in its ordering index and
+    look up each row's section.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        # (query param, lookup path, lookup to filter with)
+        requested = [(param, path, path) for param, path in _declared(view, 'exact_filter_fields').items()]
+        for param, path in _declared(view, 'range_filter_fields').items():
+            requested.extend((f'{param}__{lookup}', path, f'{path}__{lookup}') for lookup in RANGE_LOOKUPS)
+
+        filters, errors = {}, {}
+        for param, path, lookup in requested:
+            if param not in request.query_params:
+                continue
+            field = _model_field(queryset.model, path)
+            try:
+                value = _convert(field, request.query_params[param])
+            except DjangoValidationError as exc:
+                errors[param] = exc.messages
+                continue
+            if field.get_internal_type() == 'BooleanField' and lookup == path:
+                # flag=True compiles to a bare WHERE flag (flag=False to NOT flag),
+                # which SQLite cannot search an index with; flag IN (1) it can
+                filters[f'{lookup}__in'] = [value]
+            else:
+                filters[lookup] = value
+        if errors:
+            raise ValidationError(errors)
+        local, related = {}, {}
+        for lookup, value in filters.items():
+            relation, _, rest = lookup.partition('__')
+            field = queryset.model._meta.get_field(relation)
+            if field.is_relation and rest:
+                related.setdefault(field, {})[rest] = value
+            else:
+                local[lookup] = value
+        for field, conditions in related.items():
+            local[f'{field.name}__in'] = field.related_model._default_manager.filter(**conditions)
+        return queryset.filter(**local) if local else queryset
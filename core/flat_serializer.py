@@ -0,0 +1,136 @@
+"""
+Read-only questionnaire payloads built straight from ``values_list`` rows.
+
+``HealthQuestionnaireSerializer`` instantiates seven nested serializers and
+walks DRF's field machinery for every row, which dominates CPU once a
+response carries thousands of them. ``FlatSerializer`` walks a serializer's
+fields once, up front, and compiles them into the columns to select and,
+per nested level, an itemgetter plus the few fields whose representation
+is not the database value itself (dates and datetimes). Serializing a row
+is then one dict per level. The output is the same JSON shape the
+serializer produces.
+"""
+import functools
+from operator import attrgetter, itemgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import fields, relations, serializers
+
+# Fields whose representation of a loaded database value is the value itself
+_IDENTITY_FIELDS = {
+    fields.IntegerField, fields.BigIntegerField, fields.FloatField, fields.BooleanField,
+    fields.CharField, fields.ChoiceField, relations.PrimaryKeyRelatedField,
+}
+
+
+def _getter(indices):
+    if len(indices) == 1:
+        index = indices[0]
+        return lambda row: (row[index],)
+    return itemgetter(*indices)
+
+
+class _Level:
+    """How to build one dict (the questionnaire or a nested section) from a row tuple."""
+    __slots__ = ('keys', 'getter', 'converters', 'nested')
+
+    def __init__(self, keys, indices, converters, nested):
+        self.keys = tuple(keys)
+        self.getter = _getter(indices)
+        self.converters = tuple(converters)
+        self.nested = tuple(nested)
+
+    def build(self, row):
+        data = dict(zip(self.keys, self.getter(row)))
+        for key, convert in self.converters:
+            value = data[key]
+            if value is not None:
+                data[key] = convert(value)
+        for key, level in self.nested:
+            # The nested key holds the related row's id; None stays None, as with the serializer
+            if data[key] is not None:
+                data[key] = level.build(row)
+        return data
+
+
+class FlatSerializer:
+    """
+    A compiled, read-only equivalent of ``serializer``'s output.
+
+    Supports model fields, primary-key relations and nested single-object
+    serializers, to any depth. ``columns`` are the ``values_list`` lookups
+    to fetch; ``to_representation(row)`` turns one such tuple into the
+    serializer's dict. ``from_instance()`` does the same for a model
+    instance loaded with ``select_related(*relations).only(*columns)``.
+    """
+
+    def __init__(self, serializer):
+        self.columns, self.relations, attributes = [], [], []
+        self._root = self._compile(serializer, '', '', attributes)
+        self.columns = tuple(self.columns)
+        self.relations = tuple(self.relations)
+        self._attributes = _getter_by_name(attributes)
+
+    def _column(self, lookup, attribute, attributes):
+        self.columns.append(lookup)
+        attributes.append(attribute)
+        return len(self.columns) - 1
+
+    def _compile(self, serializer, prefix, attribute_prefix, attributes):
+        model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+        keys, indices, converters, nested = [], [], [], []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or getattr(field, 'many', False):
+                raise TypeError(f'{type(serializer).__name__}.{name} cannot be read from a values row.')
+            lookup = prefix + field.source.replace('.', '__')
+            attribute = attribute_prefix + _attname(model, field.source)
+            keys.append(name)
+            if isinstance(field, serializers.BaseSerializer):
+                # The foreign key column: None when there is no related row
+                indices.append(self._column(lookup, attribute, attributes))
+                self.relations.append(lookup)
+                nested.append((name, self._compile(
+                    field, f'{lookup}__', f'{attribute_prefix}{field.source}.', attributes,
+                )))
+                continue
+            indices.append(self._column(lookup, attribute, attributes))
+            if type(field) not in _IDENTITY_FIELDS:
+                converters.append((name, field.to_representation))
+        return _Level(keys, indices, converters, nested)
+
+    def to_representation(self, row):
+        return self._root.build(row)
+
+    def from_instance(self, instance):
+        return self._root.build(self._attributes(instance))
+
+    def payloads(self, queryset):
+        """Fetch and serialize every row of ``queryset`` with one query."""
+        return [self._root.build(row) for row in queryset.values_list(*self.columns)]
+
+
+def _attname(model, source):
+    """The attribute holding ``source``'s loaded value: the id column for a relation."""
+    if model is None or '.' in source:
+        return source
+    try:
+        field = model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return source
+    return field.attname if field.is_relation and field.concrete else source
+
+
+def _getter_by_name(attributes):
+    getter = attrgetter(*attributes)
+    if len(attributes) == 1:
+        return lambda instance: (getter(instance),)
+    return getter
+
+
+@functools.cache
+def questionnaire_serializer():
+    """The compiled ``HealthQuestionnaireSerializer``, built on first use."""
+    from .serializers import HealthQuestionnaireSerializer
+    return FlatSerializer(HealthQuestionnaireSerializer())
@@ -0,0 +1,278 @@
+"""
+Serving the React build (``FRONTEND_DIST_DIR``) with as little work per
+request as possible.
+
+Vite fingerprints every file under ``assets/`` (``index-D8odpAwn.js``), so
+a name never changes content: those files go out with a year-long
+``immutable`` Cache-Control and browsers do not ask for them again.
+``compress_assets`` writes ``.br`` and ``.gz`` variants next to each file
+at deploy time; ``FrontendMiddleware`` picks the best one the client
+accepts and hands the open file to the server (``wsgi.file_wrapper``, i.e.
+sendfile, where available). Which files and variants exist is read from
+disk once per process, so a request is a dict lookup and an ``open()``.
+
+The SPA shell (``index.html``) is read and compressed once and kept in
+memory. It is served for every client-side route with an ETag and
+``no-cache``: browsers revalidate it (a 304) and so pick up a new build's
+asset names as soon as it is deployed.
+
+Without ``brotli`` installed only gzip variants are made; builds that were
+never compressed are served as they are. Restart the server after a deploy
+so the new build is picked up.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SHELL = 'index.html'
+# Preferred first; each is a ``Content-Encoding`` and the suffix its variant files carry
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# Vite's ``[name]-[hash].[ext]``: eight URL-safe base64 characters
+FINGERPRINTED = re.compile(r'-[A-Za-z0-9_-]{8}\.\w+$')
+IMMUTABLE = f'public, max-age={365 * 24 * 60 * 60}, immutable'
+REVALIDATE = 'no-cache'
+# Below this, compressing saves less than the extra response headers cost
+MIN_COMPRESS_SIZE = 256
+
+
+class Asset:
+    """One servable file: its type, cache policy and ``{encoding or None: (path or bytes, etag)}``."""
+    __slots__ = ('content_type', 'cache_control', 'variants')
+
+    def __init__(self, content_type, cache_control, variants):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.variants = variants
+
+
+def dist_dir():
+    return Path(settings.FRONTEND_DIST_DIR)
+
+
+def _content_type(name):
+    content_type, _ = mimetypes.guess_type(name)
+    content_type = content_type or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/javascript', 'image/svg+xml'):
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+def _file_etag(stat, encoding):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+
+
+def compressible(name):
+    content_type, _ = mimetypes.guess_type(name)
+    return bool(content_type) and (
+        content_type.startswith('text/')
+        or content_type in ('application/javascript', 'application/json', 'image/svg+xml')
+    )
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=11)
+    # mtime=0: the same input always gives the same bytes
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def available_encodings():
+    return [(encoding, suffix) for encoding, suffix in ENCODINGS if encoding != 'br' or brotli is not None]
+
+
+def source_files(root):
+    """Paths under ``root`` that are served, leaving out compressed variants and the shell."""
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = Path(directory, name)
+            if not name.endswith(suffixes) and path != root / SHELL:
+                yield path
+
+
+def _scan(root):
+    assets = {}
+    for path in source_files(root):
+        stat = path.stat()
+        variants = {None: (str(path), _file_etag(stat, None))}
+        for encoding, suffix in ENCODINGS:
+            variant = path.with_name(path.name + suffix)
+            try:
+                variant_stat = variant.stat()
+            except FileNotFoundError:
+                continue
+            # A variant left over from an earlier build of an unfingerprinted file is stale
+            if variant_stat.st_mtime_ns >= stat.st_mtime_ns:
+                variants[encoding] = (str(variant), _file_etag(stat, encoding))
+        fingerprinted = path.parent == root / 'assets' and FINGERPRINTED.search(path.name)
+        url = '/' + path.relative_to(root).as_posix()
+        assets[url] = Asset(_content_type(path.name), IMMUTABLE if fingerprinted else REVALIDATE, variants)
+    return assets
+
+
+def _load_shell(root):
+    content = (root / SHELL).read_bytes()
+    digest = hashlib.md5(content, usedforsecurity=False).hexdigest()[:16]
+    variants = {None: (content, f'"{digest}"')}
+    if len(content) >= MIN_COMPRESS_SIZE:
+        for encoding, _ in available_encodings():
+            compressed = compress(content, encoding)
+            if len(compressed) < len(content):
+                variants[encoding] = (compressed, f'"{digest}-{encoding}"')
+    return Asset(_content_type(SHELL), REVALIDATE, variants)
+
+
+def compress_build(root=None):
+    """
+    Write a ``.br`` (with brotli installed) and ``.gz`` variant next to every
+    compressible file of the build that lacks an up-to-date one. Variants
+    not smaller than their file are not kept. Returns ``(written, unchanged)``.
+    """
+    root = Path(root) if root is not None else dist_dir()
+    written = unchanged = 0
+    paths = list(source_files(root))
+    if (root / SHELL).is_file():
+        paths.append(root / SHELL)
+    for path in paths:
+        if not compressible(path.name):
+            continue
+        stat = path.stat()
+        content = None
+        for encoding, suffix in available_encodings():
+            variant = path.with_name(path.name + suffix)
+            if variant.exists() and variant.stat().st_mtime_ns >= stat.st_mtime_ns:
+                unchanged += 1
+                continue
+            if content is None:
+                content = path.read_bytes()
+            compressed = compress(content, encoding)
+            if len(content) < MIN_COMPRESS_SIZE or len(compressed) >= len(content):
+                variant.unlink(missing_ok=True)
+                continue
+            temporary = variant.with_name(f'.{variant.name}.tmp')
+            temporary.write_bytes(compressed)
+            os.replace(temporary, variant)
+            written += 1
+    reset()
+    return written, unchanged
+
+
+_assets = _shell = None
+
+
+def assets():
+    """``{url path: Asset}`` for every file of the build but the shell."""
+    global _assets
+    if _assets is None:
+        root = dist_dir()
+        _assets = _scan(root) if root.is_dir() else {}
+    return _assets
+
+
+def shell():
+    global _shell
+    if _shell is None:
+        _shell = _load_shell(dist_dir())
+    return _shell
+
+
+def reset():
+    """Forget the scanned build, e.g. after compressing it."""
+    global _assets, _shell
+    _assets = _shell = None
+
+
+@receiver(setting_changed)
+def _dist_changed(setting, **kwargs):
+    if setting == 'FRONTEND_DIST_DIR':
+        reset()
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for coding in header.split(','):
+        coding, _, params = coding.partition(';')
+        # Refused with q=0 (or 0.0, 0.000)
+        if params and not params.strip().removeprefix('q=').strip('0.'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def serve(request, asset):
+    """``asset`` in the best encoding the request accepts, or a 304 if it is current."""
+    encoding = None
+    if len(asset.variants) > 1:
+        accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        encoding = next((
+            name for name, _ in ENCODINGS
+            if name in asset.variants and (name in accepted or '*' in accepted)
+        ), None)
+    body, etag = asset.variants[encoding]
+
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in if_none_match or f'W/{etag}' in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        if isinstance(body, bytes):
+            response = HttpResponse(body, content_type=asset.content_type)
+        else:
+            response = FileResponse(open(body, 'rb'), content_type=asset.content_type)
+            response.headers.pop('Content-Disposition', None)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Cache-Control'] = asset.cache_control
+    if len(asset.variants) > 1:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+class FrontendMiddleware:
+    """
+    Answer GET and HEAD requests for files of the React build before the
+    rest of the middleware runs. Goes right after SecurityMiddleware.
+    Other paths pass through untouched.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _asset(self, request):
+        if request.method in ('GET', 'HEAD'):
+            return assets().get(request.path_info)
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        asset = self._asset(request)
+        if asset is not None:
+            return serve(request, asset)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        asset = self._asset(request)
+        if asset is not None:
+            return serve(request, asset)
+        return await self.get_response(request)
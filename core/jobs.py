@@ -0,0 +1,168 @@
+"""
+A database-backed job queue: no broker, so it runs on one box with SQLite.
+
+Work is enqueued as ``Job`` rows, usually in the transaction that made it
+necessary, and run by one or more ``manage.py run_jobs`` workers. A
+worker claims a batch with a single conditional UPDATE, so concurrent
+workers never run the same job. Failed jobs are retried with exponential
+backoff until ``max_attempts``. A worker that dies mid-job holds it only
+until its lease expires, then another worker claims it again. Finished
+jobs are deleted once they are ``JOB_RETENTION`` old (``prune``).
+"""
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+LEASE = timedelta(minutes=5)
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 3600
+PRUNE_BATCH_SIZE = 1000
+
+# Job name -> function called with the job's payload as keyword arguments
+registry = {}
+
+
+def task(name):
+    """Register the decorated function as the handler for jobs called ``name``."""
+    def decorator(func):
+        registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, unique_key=None, run_at=None, max_attempts=5):
+    """
+    Queue one job with a single INSERT, in the caller's transaction.
+
+    Returns the job. With a ``unique_key`` nothing is inserted while a job
+    with that name and key is still queued (it will do the same work), and
+    None is returned.
+    """
+    job = Job(
+        name=name, payload=payload or {}, unique_key=unique_key,
+        run_at=run_at or timezone.now(), max_attempts=max_attempts,
+    )
+    if unique_key is None:
+        job.save()
+        return job
+    Job.objects.bulk_create([job], ignore_conflicts=True)
+    return None
+
+
+def enqueue_many(name, payloads, unique_key=None, max_attempts=5):
+    """
+    Queue one job per payload with a single INSERT.
+
+    ``unique_key``, a function of the payload, gives each job a key as
+    ``enqueue`` does: payloads whose job is still queued are skipped, and
+    the jobs are not returned.
+    """
+    now = timezone.now()
+    jobs = [
+        Job(
+            name=name, payload=payload, unique_key=unique_key(payload) if unique_key else None,
+            run_at=now, max_attempts=max_attempts,
+        )
+        for payload in payloads
+    ]
+    if unique_key is None:
+        return Job.objects.bulk_create(jobs)
+    Job.objects.bulk_create(jobs, ignore_conflicts=True)
+    return None
+
+
+def _claimable(now):
+    return Q(status='queued', run_at__lte=now) | Q(status='running', locked_at__lt=now - LEASE)
+
+
+def claim(batch_size=10):
+    """
+    Claim up to ``batch_size`` due jobs for this worker and return them.
+
+    The UPDATE re-checks the claimable condition row by row, so when two
+    workers race for the same jobs each job goes to exactly one of them.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = Job.objects.filter(_claimable(now)).order_by('run_at', 'id').values_list('id', flat=True)[:batch_size]
+    claimed = Job.objects.filter(_claimable(now), id__in=list(due)).update(
+        status='running', claim=token, locked_at=now, attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return []
+    return list(Job.objects.filter(claim=token, status='running').order_by('run_at', 'id'))
+
+
+def backoff(attempts):
+    """Seconds before retry number ``attempts``: doubling from the base, capped, with jitter."""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _finish(job, **fields):
+    # Guarded by the claim, so a worker whose lease expired cannot overwrite the new owner's result
+    return Job.objects.filter(pk=job.pk, claim=job.claim, status='running').update(**fields)
+
+
+def run(job):
+    """Run one claimed job and record its outcome. Returns True if it succeeded."""
+    handler = registry.get(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f'No task registered as {job.name!r}.')
+        handler(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if handler is not None and job.attempts < job.max_attempts:
+            delay = backoff(job.attempts)
+            logger.warning('Job %s (%s) failed, retrying in %.0fs', job.pk, job.name, delay)
+            try:
+                _finish(job, status='queued', run_at=timezone.now() + timedelta(seconds=delay), last_error=error)
+                return False
+            except IntegrityError:
+                # The same unique job was enqueued again meanwhile; that one will do the work
+                pass
+        logger.error('Job %s (%s) failed permanently', job.pk, job.name)
+        _finish(job, status='failed', finished_at=timezone.now(), last_error=error)
+        return False
+    _finish(job, status='done', finished_at=timezone.now())
+    return True
+
+
+def run_due(batch_size=10):
+    """Claim and run one batch. Returns ``(succeeded, failed)``."""
+    succeeded = failed = 0
+    for job in claim(batch_size):
+        if run(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+def prune(older_than=None, batch_size=PRUNE_BATCH_SIZE):
+    """
+    Delete done and failed jobs that finished more than ``older_than``
+    (default ``JOB_RETENTION``) ago, one short DELETE per batch so workers
+    are not kept waiting. Returns the number deleted.
+    """
+    if older_than is None:
+        older_than = settings.JOB_RETENTION
+    finished = Job.objects.filter(status__in=('done', 'failed'), finished_at__lt=timezone.now() - older_than)
+    deleted = 0
+    while True:
+        ids = list(finished.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Job.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,144 @@
+import json
+import random
+import subprocess
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from core.benchmarking import (
+    PASSWORD, bearer, load_threads, questionnaire_data, seed_population, summarize, temporary_database,
+)
+
+# Compared by --compare: higher is better for throughput, lower for the rest
+COMPARED = ('requests_per_second', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_mean')
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the main API flows (register, login, submit, list, retrieve, pending, review) '
+        'through the full WSGI stack on a seeded throwaway database, and print throughput, '
+        'latency percentiles and queries per request for each as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=1000, help='Seeded patients with a questionnaire.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument(
+            '--auth-requests', type=int, default=20,
+            help='Requests for register and login, which each hash a password.',
+        )
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent request threads.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--compare', metavar='PATH',
+            help='A previous run\'s output; adds each endpoint\'s change against it.',
+        )
+
+    def handle(self, *args, patients, requests, auth_requests, concurrency, seed, compare, **options):
+        baseline = None
+        if compare:
+            try:
+                with open(compare) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read {compare}: {exc}')
+        if patients < 1:
+            raise CommandError('--patients must be at least 1.')
+
+        with temporary_database():
+            results = self._run(patients, requests, auth_requests, concurrency, seed)
+        output = {
+            'commit': _commit(),
+            'patients': patients,
+            'requests_per_endpoint': requests,
+            'auth_requests': auth_requests,
+            'concurrency': concurrency,
+            'seed': seed,
+            'endpoints': results,
+        }
+        if baseline is not None:
+            output['compared_to'] = baseline.get('commit')
+            output['changes'] = self._changes(baseline.get('endpoints', {}), results)
+        self.stdout.write(json.dumps(output, indent=2))
+
+    def _run(self, patients, requests, auth_requests, concurrency, seed):
+        patient_users, (admin,) = seed_population(patients, seed)
+        rng = random.Random(seed)
+        # Accounts that have not submitted yet, for submit_complete
+        User.objects.bulk_create([User(username=f'bench-new-{i}') for i in range(requests)])
+        newcomers = list(User.objects.filter(username__startswith='bench-new-').order_by('pk'))
+        submissions = [questionnaire_data(rng) for _ in range(requests)]
+        # Tokens are minted up front so signing them is not part of the measurement
+        patient_headers = [(bearer(user), user.healthquestionnaire.pk) for user in patient_users]
+        newcomer_headers = [bearer(user) for user in newcomers]
+        admin_headers = bearer(admin)
+        pending_ids = [pk for _, pk in patient_headers]
+        rng.shuffle(pending_ids)
+
+        def patient(i):
+            return patient_headers[i % len(patient_headers)]
+
+        def call(method, path, headers=None, data=None):
+            client = Client(SERVER_NAME='localhost', headers=headers or {})
+            if method == 'GET':
+                return client.get(path, data).status_code
+            return client.post(path, data, content_type='application/json').status_code
+
+        # name -> (request(i), number of requests, warm up first)
+        endpoints = {
+            'register': (lambda i: call('POST', '/api/auth/register/', data={
+                'username': f'bench-register-{i}', 'email': f'bench-register-{i}@example.com',
+                'password': PASSWORD, 'password2': PASSWORD,
+            }), auth_requests, False),
+            'login': (lambda i: call('POST', '/api/auth/login/', data={
+                'username': patient_users[i % len(patient_users)].username, 'password': PASSWORD,
+            }), auth_requests, False),
+            'submit_complete': (lambda i: call(
+                'POST', '/api/questionnaire/submit_complete/', newcomer_headers[i], submissions[i],
+            ), requests, False),
+            'questionnaire list': (lambda i: call('GET', '/api/questionnaire/', patient(i)[0]), requests, True),
+            'questionnaire retrieve': (lambda i: call(
+                'GET', f'/api/questionnaire/{patient(i)[1]}/', patient(i)[0],
+            ), requests, True),
+            'pending': (lambda i: call(
+                'GET', '/api/questionnaire/pending/', admin_headers, {'page_size': 20},
+            ), requests, True),
+            'review': (lambda i: call(
+                'POST', f'/api/questionnaire/{pending_ids[i % len(pending_ids)]}/review/', admin_headers,
+                {'status': 'approved', 'admin_feedback': 'Benchmark review.'},
+            ), requests, False),
+        }
+        results = {}
+        for name, (request, total, warm_up) in endpoints.items():
+            if warm_up:
+                # Connections, URL resolver and per-user caches
+                load_threads(request, min(total, 50), concurrency)
+            latencies, elapsed, errors, queries = load_threads(request, total, concurrency)
+            results[name] = summarize(latencies, elapsed, errors, queries)
+        return results
+
+    def _changes(self, before, after):
+        """Per endpoint and metric, this run's value as a ratio of the baseline's."""
+        changes = {}
+        for name, metrics in after.items():
+            old = before.get(name)
+            if not old:
+                continue
+            changes[name] = {
+                metric: round(metrics[metric] / old[metric], 3)
+                for metric in COMPARED
+                if metrics.get(metric) is not None and old.get(metric)
+            }
+        return changes
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import random
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+
+from core.benchmarking import asgi_request, bearer, load, seed_population, summarize, temporary_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync API GETs with their core.async_views versions under concurrent load, '
+        'through the ASGI application on a throwaway database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint and path.')
+        parser.add_argument('--concurrency', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, patients, requests, concurrency, seed, **options):
+        with temporary_database():
+            patient_users, (admin,) = seed_population(patients, seed)
+            rng = random.Random(seed)
+            sample = rng.sample(patient_users, min(len(patient_users), 200))
+            # Tokens are minted up front so signing them is not part of the measurement
+            clients = [(bearer(user), user.healthquestionnaire.pk, user.measurements.pk) for user in sample]
+            admin_headers = bearer(admin)
+            results = asyncio.run(self._run(clients, admin_headers, requests, concurrency))
+        self.stdout.write(json.dumps({
+            'patients': patients,
+            'requests_per_endpoint': requests,
+            'concurrency': concurrency,
+            'endpoints': results,
+        }, indent=2))
+
+    async def _run(self, clients, admin_headers, requests, concurrency):
+        app = get_asgi_application()
+
+        def patient(i):
+            return clients[i % len(clients)]
+
+        # name -> request(prefix, i), where prefix is '/api/' or '/api/async/'
+        endpoints = {
+            'questionnaire list': lambda prefix, i: asgi_request(
+                app, 'GET', f'{prefix}questionnaire/', headers=patient(i)[0],
+            ),
+            'questionnaire retrieve': lambda prefix, i: asgi_request(
+                app, 'GET', f'{prefix}questionnaire/{patient(i)[1]}/', headers=patient(i)[0],
+            ),
+            'pending': lambda prefix, i: asgi_request(
+                app, 'GET', f'{prefix}questionnaire/pending/', {'page_size': 20}, headers=admin_headers,
+            ),
+            'measurements list': lambda prefix, i: asgi_request(
+                app, 'GET', f'{prefix}measurements/', {'systolic__gte': 140}, headers=admin_headers,
+            ),
+            'measurements retrieve': lambda prefix, i: asgi_request(
+                app, 'GET', f'{prefix}measurements/{patient(i)[2]}/', headers=patient(i)[0],
+            ),
+        }
+        results = {}
+        for name, request in endpoints.items():
+            results[name] = {}
+            for path, prefix in (('sync', '/api/'), ('async', '/api/async/')):
+                # Warm up: connection, URL resolver and per-user caches
+                await load(lambda i: request(prefix, i), len(clients), min(concurrency, len(clients)))
+                latencies, elapsed, errors = await load(lambda i: request(prefix, i), requests, concurrency)
+                results[name][path] = summarize(latencies, elapsed, errors)
+            sync, async_ = results[name]['sync'], results[name]['async']
+            results[name]['async_speedup'] = round(
+                async_['requests_per_second'] / sync['requests_per_second'], 2
+            )
+        return results
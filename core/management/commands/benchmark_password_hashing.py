@@ -0,0 +1,64 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from core.benchmarking import load_threads, summarize, temporary_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure register and login throughput with password hashing inline and on '
+        'process pools of increasing size, on a throwaway database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', default=None,
+            help='Comma-separated pool sizes to compare; 0 hashes inline. Default: 0 up to the core count.',
+        )
+        parser.add_argument('--requests', type=int, default=40, help='Registrations (then logins) per pool size.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent request threads.')
+
+    def handle(self, *args, workers, requests, concurrency, **options):
+        cores = os.cpu_count() or 1
+        try:
+            sizes = [int(size) for size in workers.split(',')] if workers else sorted({0, 1, 2, cores})
+        except ValueError:
+            raise CommandError('--workers must be comma-separated integers.')
+        results = {}
+        with temporary_database():
+            for size in sizes:
+                with override_settings(PASSWORD_HASHING_WORKERS=size):
+                    results[str(size)] = {
+                        'register': self._measure(size, 'register', requests, concurrency),
+                        'login': self._measure(size, 'login', requests, concurrency),
+                    }
+        self.stdout.write(json.dumps({
+            'cores': cores,
+            'requests': requests,
+            'concurrency': concurrency,
+            'pool_workers': results,
+        }, indent=2))
+
+    def _measure(self, size, flow, requests, concurrency):
+        def call(i):
+            username = f'bench-{size}-{i}'
+            password = f'correct horse battery {i}'
+            client = Client(SERVER_NAME='localhost')
+            if flow == 'register':
+                response = client.post('/api/auth/register/', {
+                    'username': username, 'email': f'{username}@example.com',
+                    'password': password, 'password2': password,
+                }, content_type='application/json')
+            else:
+                response = client.post(
+                    '/api/auth/login/', {'username': username, 'password': password},
+                    content_type='application/json',
+                )
+            return response.status_code
+
+        latencies, elapsed, errors, _ = load_threads(call, requests, concurrency)
+        return summarize(latencies, elapsed, errors)
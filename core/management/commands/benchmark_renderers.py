@@ -0,0 +1,84 @@
+import io
+import json
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.benchmarking import best_of, seed_population, temporary_database
+from core.models import HealthQuestionnaire
+from core.serializers import QuestionnaireSnapshotSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSONRenderer/JSONParser with the orjson and MessagePack classes "
+        'on a questionnaire list page built from a seeded throwaway database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50, help='Questionnaires per page.')
+        parser.add_argument('--pages', type=int, default=200, help='Pages rendered per timing run.')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def _measure(self, renderer, parser, payload, pages, repeat):
+        def render():
+            for _ in range(pages):
+                content = renderer.render(payload)
+            return content
+
+        render_seconds, content = best_of(render, repeat)
+
+        def parse():
+            for _ in range(pages):
+                data = parser.parse(io.BytesIO(content), parser.media_type, {'encoding': 'utf-8'})
+            return data
+
+        parse_seconds, parsed = best_of(parse, repeat)
+        return {
+            'render_ms_per_page': round(render_seconds * 1000 / pages, 4),
+            'parse_ms_per_page': round(parse_seconds * 1000 / pages, 4),
+            'bytes': len(content),
+        }, content, parsed
+
+    def handle(self, *args, rows, pages, repeat, seed, **options):
+        with temporary_database():
+            seed_population(rows, seed, staff=0)
+            queryset = HealthQuestionnaire.objects.order_by('-id')[:rows]
+            # The list endpoint's page, as the paginator hands it to the renderer
+            payload = {
+                'next': 'http://localhost/api/questionnaires/?cursor=cD0xMjM0',
+                'previous': None,
+                'results': QuestionnaireSnapshotSerializer(queryset, many=True).data,
+            }
+
+        candidates = {
+            'json': (JSONRenderer(), JSONParser()),
+            'orjson': (renderers.ORJSONRenderer(), renderers.ORJSONParser()),
+        }
+        if renderers.orjson is None:
+            candidates.pop('orjson')
+        if renderers.msgpack is not None:
+            candidates['msgpack'] = (renderers.MessagePackRenderer(), renderers.MessagePackParser())
+
+        results, baseline = {}, None
+        for name, (renderer, parser) in candidates.items():
+            results[name], content, parsed = self._measure(renderer, parser, payload, pages, repeat)
+            if baseline is None:
+                baseline, expected = results[name], parsed
+                continue
+            results[name]['render_speedup'] = round(baseline['render_ms_per_page'] / results[name]['render_ms_per_page'], 1)
+            results[name]['parse_speedup'] = round(baseline['parse_ms_per_page'] / results[name]['parse_ms_per_page'], 1)
+            results[name]['identical_data'] = parsed == expected
+            if renderer.media_type == JSONRenderer.media_type:
+                results[name]['identical_bytes'] = content == JSONRenderer().render(payload)
+
+        self.stdout.write(json.dumps({
+            'rows_per_page': rows,
+            'orjson_installed': renderers.orjson is not None,
+            'msgpack_installed': renderers.msgpack is not None,
+            'formats': results,
+        }, indent=2))
+
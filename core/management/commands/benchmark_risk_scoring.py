@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core.benchmarking import best_of
+from core.risk_scoring import COLUMN_NAMES, score_columns, score_row, score_rows
+
+
+def synthetic_rows(count, seed=0):
+    """Rows shaped like ``values_list(*LOOKUPS)`` output, with realistic spread and gaps."""
+    rng = np.random.default_rng(seed)
+    height = rng.normal(170, 10, count)
+    weight = rng.normal(78, 15, count)
+    bmi = (weight / (height / 100) ** 2).round(1)
+    systolic = rng.normal(128, 15, count).round()
+    diastolic = rng.normal(82, 10, count).round()
+    glucose = rng.normal(100, 20, count).round()
+    cholesterol = rng.normal(195, 35, count).round()
+    # About one reading in ten is missing
+    missing = rng.random((4, count)) < 0.1
+    flags = rng.random((8, count)) < 0.15
+    smoking = rng.choice(np.array(['never', 'former', 'current']), count, p=[0.6, 0.25, 0.15])
+
+    def reading(values, gaps, i):
+        return None if gaps[i] else float(values[i])
+
+    return [
+        (
+            i + 1, float(bmi[i]),
+            reading(systolic, missing[0], i), reading(diastolic, missing[0], i),
+            reading(glucose, missing[1], i), reading(cholesterol, missing[2], i),
+            *(bool(flags[j, i]) for j in range(8)),
+            None if missing[3, i] else str(smoking[i]),
+        )
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Compare vectorized risk scoring against row-by-row scoring on synthetic data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, rows, repeat, seed, **options):
+        data = synthetic_rows(rows, seed)
+        row_by_row, _ = best_of(lambda: [score_row(row) for row in data], repeat)
+        vectorized, _ = best_of(lambda: score_rows(data), repeat)
+        # The vectorized pass alone, without turning row tuples into columns
+        columns = {name: np.array(column) for name, column in zip(COLUMN_NAMES, zip(*data))}
+        scoring_only, _ = best_of(lambda: score_columns(columns), repeat)
+
+        _, cardiovascular, diabetes = score_rows(data)
+        reference = np.array([score_row(row)[1:] for row in data])
+        self.stdout.write(json.dumps({
+            'rows': rows,
+            'row_by_row_seconds': round(row_by_row, 4),
+            'vectorized_seconds': round(vectorized, 4),
+            'row_by_row_rows_per_second': round(rows / row_by_row),
+            'vectorized_rows_per_second': round(rows / vectorized),
+            'speedup': round(row_by_row / vectorized, 1),
+            'vectorized_scoring_only_seconds': round(scoring_only, 4),
+            'max_abs_difference': float(np.max(np.abs(reference - np.column_stack([cardiovascular, diabetes])))),
+        }, indent=2))
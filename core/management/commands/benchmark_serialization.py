@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarking import best_of, seed_population, temporary_database
+from core.flat_serializer import questionnaire_serializer
+from core.models import HealthQuestionnaire
+from core.serializers import HealthQuestionnaireSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare HealthQuestionnaireSerializer with the flat values-row serializer on a '
+        'seeded throwaway database, as seconds per 10k questionnaires.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, rows, repeat, seed, **options):
+        with temporary_database():
+            seed_population(rows, seed, staff=0)
+            queryset = HealthQuestionnaire.objects.order_by('id')
+            flat = questionnaire_serializer()
+
+            fetch_instances, instances = best_of(lambda: list(queryset.with_sections()), repeat)
+            fetch_rows, values = best_of(lambda: list(queryset.values_list(*flat.columns)), repeat)
+            nested, expected = best_of(lambda: HealthQuestionnaireSerializer(instances, many=True).data, repeat)
+            flattened, actual = best_of(lambda: [flat.to_representation(row) for row in values], repeat)
+
+        def per_10k(seconds):
+            return round(seconds * 10000 / rows, 4)
+
+        self.stdout.write(json.dumps({
+            'rows': rows,
+            'serializer': {
+                'fetch_seconds_per_10k': per_10k(fetch_instances),
+                'serialize_seconds_per_10k': per_10k(nested),
+            },
+            'flat': {
+                'fetch_seconds_per_10k': per_10k(fetch_rows),
+                'serialize_seconds_per_10k': per_10k(flattened),
+            },
+            'serialize_speedup': round(nested / flattened, 1),
+            'end_to_end_speedup': round((fetch_instances + nested) / (fetch_rows + flattened), 1),
+            'identical_output': json.dumps(expected) == json.dumps(actual),
+        }, indent=2))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.snapshots import REBUILD_BATCH_SIZE, find_drift
+
+
+class Command(BaseCommand):
+    help = 'Report questionnaire snapshots that are missing or disagree with the section tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, batch_size, **options):
+        drift = list(find_drift(batch_size=batch_size))
+        for pk, reason in drift:
+            self.stdout.write(f'questionnaire {pk}: {reason}')
+        if drift:
+            raise CommandError(
+                f'{len(drift)} snapshot(s) drifted; run "manage.py rebuild_snapshots --drifted-only".'
+            )
+        self.stdout.write(self.style.SUCCESS('All snapshots are consistent.'))
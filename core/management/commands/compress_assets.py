@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import frontend
+
+
+class Command(BaseCommand):
+    help = (
+        'Write brotli (when installed) and gzip variants of the React build in '
+        'FRONTEND_DIST_DIR for FrontendMiddleware to serve. Run after every build.'
+    )
+
+    def handle(self, *args, **options):
+        if not frontend.dist_dir().is_dir():
+            raise CommandError(f'No build at {frontend.dist_dir()}; run `npm run build` in frontend/ first.')
+        if frontend.brotli is None:
+            self.stderr.write('brotli is not installed; writing gzip variants only.')
+        written, unchanged = frontend.compress_build()
+        self.stdout.write(self.style.SUCCESS(f'Compressed {written} file(s); {unchanged} already up to date.'))
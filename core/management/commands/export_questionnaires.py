@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import export
+
+
+class Command(BaseCommand):
+    help = 'Stream every questionnaire, joined with its sections, as flat CSV, NDJSON or Parquet rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='file_format', choices=export.FORMATS, default='csv')
+        parser.add_argument('--output', '-o', help='File to write to (default: stdout).')
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE)
+
+    def handle(self, *args, file_format, output, chunk_size, **options):
+        error = export.format_error(file_format)
+        if error:
+            raise CommandError(error)
+        if output is None and file_format == 'parquet':
+            raise CommandError('Parquet output is binary; pass --output.')
+
+        out = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in export.export(file_format, chunk_size=chunk_size):
+                out.write(chunk)
+        finally:
+            if output:
+                out.close()
+            else:
+                out.flush()
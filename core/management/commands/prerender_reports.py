@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.models import HealthQuestionnaire
+from core.reports import prerender
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the PDF report of every approved questionnaire that has none for its '
+        'current version, on the REPORT_RENDER pool.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--include-pending', action='store_true',
+            help='Also render questionnaires still pending review.',
+        )
+
+    def handle(self, *args, batch_size, include_pending, **options):
+        queryset = HealthQuestionnaire.objects.all()
+        if not include_pending:
+            queryset = queryset.filter(status='approved')
+        count = prerender(queryset, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Rendered {count} report(s).'))
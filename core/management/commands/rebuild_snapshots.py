@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.models import HealthQuestionnaire
+from core.snapshots import REBUILD_BATCH_SIZE, find_drift, rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuild questionnaire snapshots from the section tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE)
+        parser.add_argument(
+            '--drifted-only', action='store_true',
+            help='Only rebuild snapshots that are missing or disagree with the section tables.',
+        )
+
+    def handle(self, *args, batch_size, drifted_only, **options):
+        queryset = HealthQuestionnaire.objects.all()
+        if drifted_only:
+            ids = [pk for pk, _ in find_drift(batch_size=batch_size)]
+            queryset = queryset.filter(pk__in=ids)
+        count = rebuild_snapshots(queryset, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} snapshot(s).'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.analytics import recompute
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the analytics counters from the questionnaire snapshots.'
+
+    def handle(self, *args, **options):
+        count = recompute()
+        self.stdout.write(self.style.SUCCESS(f'Recomputed analytics from {count} snapshot(s).'))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import prune, run_due
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs. Start several to run jobs concurrently; '
+        'each job is claimed by exactly one worker. Jobs finished more than '
+        'JOB_RETENTION ago are deleted along the way.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per round trip.')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when idle.')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due instead of polling.')
+        parser.add_argument(
+            '--prune-interval', type=float, default=3600,
+            help='Seconds between deletions of old finished jobs, done while idle.',
+        )
+
+    def handle(self, *args, batch_size, poll_interval, once, prune_interval, **options):
+        succeeded = failed = 0
+        pruned = prune()
+        last_prune = time.monotonic()
+        try:
+            while True:
+                done, errors = run_due(batch_size)
+                succeeded, failed = succeeded + done, failed + errors
+                if not done and not errors:
+                    if once:
+                        break
+                    if time.monotonic() - last_prune >= prune_interval:
+                        pruned += prune()
+                        last_prune = time.monotonic()
+                    # Idle: drop a connection that broke or outlived CONN_MAX_AGE, as a request would
+                    close_old_connections()
+                    time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {succeeded + failed} job(s): {succeeded} succeeded, {failed} failed. '
+            f'Deleted {pruned} old finished job(s).'
+        ))
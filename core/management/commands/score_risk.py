@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.risk_scoring import CHUNK_SIZE, score_population
+
+
+class Command(BaseCommand):
+    help = 'Compute cardiovascular and diabetes risk scores for users whose inputs changed since the last run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rescore every user, changed or not.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, full, chunk_size, **options):
+        run = score_population(full=full, chunk_size=chunk_size)
+        elapsed = (run.finished_at - run.started_at).total_seconds()
+        kind = 'full' if run.full else 'incremental'
+        self.stdout.write(self.style.SUCCESS(f'Scored {run.scored} user(s) ({kind} run, {elapsed:.2f}s).'))
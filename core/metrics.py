@@ -0,0 +1,224 @@
+"""
+Per-request timings, reported as Server-Timing headers and aggregated into
+per-endpoint histograms.
+
+``RequestMetricsMiddleware`` measures each request's wall time; code on the
+request path adds to named phases with ``timer()``:
+
+- ``db``: every query, on any connection (counted as well as timed)
+- ``auth``: JWT authentication and password hashing
+- ``serialize``: building response data with the serializers
+- ``render``: encoding the response body
+
+Phases may overlap (queries a serializer triggers count towards both
+``db`` and ``serialize``). Histograms are per process, like the cache
+counters: with several worker processes each exposes its own, and the
+scraper adds them up.
+"""
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PHASES = ('db', 'auth', 'serialize', 'render')
+# Upper bounds of the histogram buckets; each also has +Inf
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class Timings:
+    __slots__ = ('phases', 'queries', '_active')
+
+    def __init__(self):
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+        self._active = set()
+
+
+@contextlib.contextmanager
+def timer(phase):
+    """Add the time spent in the block to the current request's ``phase``."""
+    timings = _current.get()
+    # Outside a request, or nested in the same phase (a serializer inside a serializer)
+    if timings is None or phase in timings._active:
+        yield
+        return
+    timings._active.add(phase)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[phase] += time.perf_counter() - start
+        timings._active.discard(phase)
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    timings.queries += 1
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.phases['db'] += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    # Installed for the connection's lifetime: it follows the request through
+    # the contextvar, so views running in sync_to_async threads are covered too
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _time_query)
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Request counters and histograms keyed by ``(endpoint, method)``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.histograms = {}
+
+    def _histogram(self, name, labels, bounds):
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(bounds)
+        return histogram
+
+    def record(self, endpoint, method, status_code, duration, timings):
+        labels = (endpoint, method)
+        with self._lock:
+            key = labels + (status_code,)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self._histogram('http_request_duration_seconds', labels, SECONDS_BUCKETS).observe(duration)
+            for phase, seconds in timings.phases.items():
+                self._histogram(f'http_request_{phase}_seconds', labels, SECONDS_BUCKETS).observe(seconds)
+            self._histogram('http_request_db_queries', labels, QUERY_BUCKETS).observe(timings.queries)
+
+    def exposition(self):
+        """The counters and histograms in the Prometheus text format."""
+        with self._lock:
+            requests = sorted(self.requests.items())
+            histograms = sorted(
+                (name, labels, list(h.counts), h.sum, h.count) for (name, labels), h in self.histograms.items()
+            )
+        lines = ['# TYPE http_requests_total counter']
+        for (endpoint, method, status_code), count in requests:
+            lines.append(
+                f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status_code}"}} {count}'
+            )
+        declared = set()
+        for name, (endpoint, method), counts, total, count in histograms:
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            labels = f'endpoint="{endpoint}",method="{method}"'
+            bounds = QUERY_BUCKETS if name == 'http_request_db_queries' else SECONDS_BUCKETS
+            cumulative = 0
+            for bound, bucket in zip(list(bounds) + ['+Inf'], counts):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {total:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _endpoint(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unmatched'
+
+
+class RequestMetricsMiddleware:
+    """
+    Time each request, record it in ``registry`` and, with ``SERVER_TIMING``
+    on, report the phases in a Server-Timing header. Goes first in
+    MIDDLEWARE, so the total includes the other middleware. Streamed bodies
+    are produced after it returns and are not included.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django would otherwise run the sync hook in a thread on every request
+            self.process_template_response = self._aprocess_template_response
+
+    def process_template_response(self, request, response):
+        # Called just before the response (e.g. a DRF Response) is rendered
+        timings = _current.get()
+        if timings is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                timings.phases['render'] += time.perf_counter() - start
+            response.add_post_render_callback(rendered)
+        return response
+
+    async def _aprocess_template_response(self, request, response):
+        return RequestMetricsMiddleware.process_template_response(self, request, response)
+
+    def _finish(self, request, response, timings, start):
+        duration = time.perf_counter() - start
+        registry.record(_endpoint(request), request.method, response.status_code, duration, timings)
+        if getattr(settings, 'SERVER_TIMING', True):
+            entries = [f'db;dur={timings.phases["db"] * 1000:.2f};desc="{timings.queries} queries"']
+            entries += [f'{phase};dur={timings.phases[phase] * 1000:.2f}' for phase in PHASES[1:]]
+            entries.append(f'total;dur={duration * 1000:.2f}')
+            response['Server-Timing'] = ', '.join(entries)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = Timings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings = Timings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, start)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_userprofile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='healthquestionnaire',
+            index=models.Index(fields=['submitted_at', 'id'], name='questionnaire_submitted_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_healthquestionnaire_submitted_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionnaireSnapshot',
+            fields=[
+                ('questionnaire', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='core.healthquestionnaire')),
+                ('payload', models.JSONField()),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
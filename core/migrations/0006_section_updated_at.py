@@ -0,0 +1,25 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+SECTION_MODELS = (
+    'personalinfo', 'lifestyle', 'medicalhistory', 'familyhistory',
+    'measurements', 'symptoms', 'preventivecare',
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_questionnairesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name=model_name,
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        )
+        for model_name in SECTION_MODELS
+    ]
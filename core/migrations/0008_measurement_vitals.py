@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_risk_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurements',
+            name='diastolic',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='measurements',
+            name='glucose',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='measurements',
+            name='systolic',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='measurements',
+            name='total_cholesterol',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='measurements',
+            name='bmi',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, transaction
+
+from core.vitals import derived_measurements
+
+BATCH_SIZE = 2000
+DERIVED_FIELDS = ('bmi', 'systolic', 'diastolic', 'glucose', 'total_cholesterol')
+
+
+def backfill(apps, schema_editor):
+    """Fill the derived columns in id order, committing one batch at a time."""
+    Measurements = apps.get_model('core', 'Measurements')
+    db_alias = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        with transaction.atomic(using=db_alias):
+            batch = list(
+                Measurements.objects.using(db_alias).filter(id__gt=last_id).order_by('id')[:BATCH_SIZE]
+            )
+            if not batch:
+                return
+            for row in batch:
+                values = derived_measurements(
+                    row.height_cm, row.weight_kg, row.blood_pressure, row.blood_sugar, row.cholesterol
+                )
+                for field, value in values.items():
+                    setattr(row, field, value)
+            # updated_at is left alone: nothing the patient submitted changed
+            Measurements.objects.using(db_alias).bulk_update(batch, DERIVED_FIELDS, batch_size=500)
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own so a large table is never locked for the whole backfill
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_measurement_vitals'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_backfill_measurement_vitals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsCounter',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('count', models.BigIntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_analytics_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lifestyle',
+            name='smoking_status',
+            field=models.CharField(choices=[('never', 'Never'), ('former', 'Former'), ('current', 'Current')], db_index=True, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='healthquestionnaire',
+            index=models.Index(fields=['status', 'submitted_at', 'id'], name='questionnaire_status_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalhistory',
+            index=models.Index(condition=models.Q(('diabetes', True)), fields=['id'], name='history_diabetes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalhistory',
+            index=models.Index(condition=models.Q(('hypertension', True)), fields=['id'], name='history_hypertension_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalhistory',
+            index=models.Index(condition=models.Q(('heart_disease', True)), fields=['id'], name='history_heart_disease_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptoms',
+            index=models.Index(condition=models.Q(('chest_pain', True)), fields=['id'], name='symptoms_chest_pain_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptoms',
+            index=models.Index(condition=models.Q(('breathlessness', True)), fields=['id'], name='symptoms_breathlessness_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptoms',
+            index=models.Index(condition=models.Q(('fatigue', True)), fields=['id'], name='symptoms_fatigue_idx'),
+        ),
+    ]
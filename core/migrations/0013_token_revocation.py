@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRevocation',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('revoked_at', models.BigIntegerField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_token_revocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrimaryPin',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('until', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_primary_pin'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='medicalhistory',
+            name='history_diabetes_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='medicalhistory',
+            name='history_hypertension_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='medicalhistory',
+            name='history_heart_disease_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='symptoms',
+            name='symptoms_chest_pain_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='symptoms',
+            name='symptoms_breathlessness_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='symptoms',
+            name='symptoms_fatigue_idx',
+        ),
+        migrations.AddIndex(
+            model_name='medicalhistory',
+            index=models.Index(fields=['diabetes'], name='history_diabetes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalhistory',
+            index=models.Index(fields=['hypertension'], name='history_hypertension_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalhistory',
+            index=models.Index(fields=['heart_disease'], name='history_heart_disease_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptoms',
+            index=models.Index(fields=['chest_pain'], name='symptoms_chest_pain_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptoms',
+            index=models.Index(fields=['breathlessness'], name='symptoms_breathlessness_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptoms',
+            index=models.Index(fields=['fatigue'], name='symptoms_fatigue_idx'),
+        ),
+    ]
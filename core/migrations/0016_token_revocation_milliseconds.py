@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import F
+
+
+def to_milliseconds(apps, schema_editor):
+    """revoked_at was in Unix seconds; tokens now carry milliseconds to compare it with."""
+    TokenRevocation = apps.get_model('core', 'TokenRevocation')
+    TokenRevocation.objects.using(schema_editor.connection.alias).update(revoked_at=F('revoked_at') * 1000)
+
+
+def to_seconds(apps, schema_editor):
+    TokenRevocation = apps.get_model('core', 'TokenRevocation')
+    TokenRevocation.objects.using(schema_editor.connection.alias).update(revoked_at=F('revoked_at') / 1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_reindex_section_flags'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_milliseconds, to_seconds),
+    ]
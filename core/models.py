@@ -2,20 +2,25 @@
 from .user_profile import UserProfile
 
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .vitals import derived_measurements
+
 class PersonalInfo(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     age = models.PositiveIntegerField()
     gender = models.CharField(max_length=10)
     contact = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
 
 class Lifestyle(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    smoking_status = models.CharField(max_length=20, choices=[('never','Never'),('former','Former'),('current','Current')])
+    smoking_status = models.CharField(max_length=20, choices=[('never','Never'),('former','Former'),('current','Current')], db_index=True)
     alcohol_consumption = models.CharField(max_length=50)
     physical_activity = models.CharField(max_length=100)
     diet = models.CharField(max_length=200)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
 class MedicalHistory(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -25,6 +30,14 @@ class MedicalHistory(models.Model):
     other_conditions = models.TextField(blank=True)
     medications = models.TextField(blank=True)
     allergies = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # Admin queue filters, true or false; the rowid rides along, so selecting ids is covered
+        indexes = [
+            models.Index(fields=[flag], name=f'history_{flag}_idx')
+            for flag in ('diabetes', 'hypertension', 'heart_disease')
+        ]
 
 class FamilyHistory(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -32,15 +45,41 @@ class FamilyHistory(models.Model):
     heart_disease = models.BooleanField(default=False)
     cancer = models.BooleanField(default=False)
     other = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
 class Measurements(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     height_cm = models.FloatField()
     weight_kg = models.FloatField()
-    bmi = models.FloatField(blank=True, null=True)
+    # Computed from height and weight on save; a submitted value is ignored
+    bmi = models.FloatField(blank=True, null=True, db_index=True)
     blood_pressure = models.CharField(max_length=20, blank=True)
     blood_sugar = models.CharField(max_length=20, blank=True)
     cholesterol = models.CharField(max_length=20, blank=True)
+    # Parsed from the readings above on save, so clinical range queries run as indexed SQL
+    systolic = models.FloatField(blank=True, null=True, db_index=True)
+    diastolic = models.FloatField(blank=True, null=True, db_index=True)
+    glucose = models.FloatField(blank=True, null=True, db_index=True)
+    total_cholesterol = models.FloatField(blank=True, null=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    DERIVED_FIELDS = ('bmi', 'systolic', 'diastolic', 'glucose', 'total_cholesterol')
+
+    def derive(self):
+        """Recompute the derived columns and return the names of those that changed."""
+        values = derived_measurements(
+            self.height_cm, self.weight_kg, self.blood_pressure, self.blood_sugar, self.cholesterol
+        )
+        changed = [field for field, value in values.items() if getattr(self, field) != value]
+        for field in changed:
+            setattr(self, field, values[field])
+        return changed
+
+    def save(self, *args, update_fields=None, **kwargs):
+        changed = self.derive()
+        if update_fields is not None:
+            update_fields = list(update_fields) + [field for field in changed if field not in update_fields]
+        super().save(*args, update_fields=update_fields, **kwargs)
 
 class Symptoms(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -49,11 +88,31 @@ class Symptoms(models.Model):
     fatigue = models.BooleanField(default=False)
     sleep_quality = models.CharField(max_length=50, blank=True)
     stress_level = models.CharField(max_length=50, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # Admin queue filters, true or false; the rowid rides along, so selecting ids is covered
+        indexes = [
+            models.Index(fields=[flag], name=f'symptoms_{flag}_idx')
+            for flag in ('chest_pain', 'breathlessness', 'fatigue')
+        ]
 
 class PreventiveCare(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     last_checkup = models.DateField(blank=True, null=True)
     vaccinations = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+# Nested sections serialized alongside every questionnaire
+QUESTIONNAIRE_SECTIONS = (
+    'personal_info', 'lifestyle', 'medical_history', 'family_history',
+    'measurements', 'symptoms', 'preventive_care',
+)
+
+class HealthQuestionnaireQuerySet(models.QuerySet):
+    def with_sections(self):
+        # Join all seven OneToOne sections so serializing a page costs one query
+        return self.select_related(*QUESTIONNAIRE_SECTIONS)
 
 class HealthQuestionnaire(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -67,3 +126,89 @@ class HealthQuestionnaire(models.Model):
     submitted_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=[('pending','Pending Review'),('approved','Approved')], default='pending')
     admin_feedback = models.TextField(blank=True)
+
+    objects = HealthQuestionnaireQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order for list and pending
+            models.Index(fields=['submitted_at', 'id'], name='questionnaire_submitted_idx'),
+            # The admin queue: one status, in submission order
+            models.Index(fields=['status', 'submitted_at', 'id'], name='questionnaire_status_queue_idx'),
+        ]
+
+class QuestionnaireSnapshot(models.Model):
+    # Serialized HealthQuestionnaireSerializer output, rewritten whenever the questionnaire changes
+    questionnaire = models.OneToOneField(
+        HealthQuestionnaire, on_delete=models.CASCADE, primary_key=True, related_name='snapshot'
+    )
+    payload = models.JSONField()
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+class RiskScore(models.Model):
+    # Latest population-scoring result per user (core.risk_scoring)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='risk_score')
+    cardiovascular = models.FloatField()
+    diabetes = models.FloatField()
+    scored_at = models.DateTimeField()
+
+class RiskScoreRun(models.Model):
+    # Incremental runs rescore users whose inputs changed after the last run started
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    full = models.BooleanField(default=False)
+    scored = models.PositiveIntegerField(default=0)
+
+class AnalyticsCounter(models.Model):
+    # One running count (and sum, for averages) per dashboard statistic, e.g. 'status:pending'
+    key = models.CharField(max_length=100, primary_key=True)
+    count = models.BigIntegerField(default=0)
+    total = models.FloatField(default=0)
+
+class TokenRevocation(models.Model):
+    # Claims-only reads (core.authentication) reject a user's tokens issued before revoked_at.
+    # A plain id rather than a foreign key, so it outlives a deleted user's tokens
+    user_id = models.BigIntegerField(primary_key=True)
+    # Unix milliseconds, like the tokens' iat_ms claim
+    revoked_at = models.BigIntegerField()
+
+class PrimaryPin(models.Model):
+    # After a user writes, their reads stay on the primary until this passes (core.db_router)
+    user_id = models.BigIntegerField(primary_key=True)
+    until = models.DateTimeField()
+
+class Job(models.Model):
+    # Background work run by `manage.py run_jobs` (core.jobs)
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    # Queued jobs sharing a name and key are one job; enqueueing it again is a no-op
+    unique_key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # Set by the claiming worker; a running job whose lease ran out is claimed again
+    claim = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claiming: due jobs of one status in run order
+            models.Index(fields=['status', 'run_at', 'id'], name='job_claim_idx'),
+            models.Index(fields=['claim'], name='job_claim_token_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'unique_key'], condition=models.Q(status='queued'), name='job_unique_queued',
+            ),
+        ]
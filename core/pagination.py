@@ -0,0 +1,33 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the primary key.
+
+    Cursors seek straight to the last row seen instead of counting an OFFSET,
+    so every page costs the same however deep the client pages.
+    """
+    ordering = ('id',)
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class QuestionnaireCursorPagination(IdCursorPagination):
+    # Backed by the (submitted_at, id) and (status, submitted_at, id) indexes on HealthQuestionnaire
+    ordering = ('submitted_at', 'id')
+    # ?ordering= values; both directions walk the same indexes
+    orderings = {
+        'submitted_at': ('submitted_at', 'id'),
+        '-submitted_at': ('-submitted_at', '-id'),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        value = request.query_params.get('ordering')
+        if value is None:
+            return self.ordering
+        if value not in self.orderings:
+            raise ValidationError({'ordering': f"Choose one of: {', '.join(self.orderings)}."})
+        return self.orderings[value]
@@ -0,0 +1,81 @@
+"""
+Password hashing and verification on a bounded process pool.
+
+PBKDF2 is deliberately slow and holds the GIL, so inline hashing turns a
+signup or login burst into workers pinned on hashing. With
+``PASSWORD_HASHING_WORKERS`` set, hashes are computed in that many worker
+processes instead. At most ``PASSWORD_HASHING_MAX_PENDING`` hashes are
+queued or running at once; a request that cannot get a slot within
+``PASSWORD_HASHING_WAIT_SECONDS`` is answered 503 with Retry-After rather
+than adding to an unbounded backlog.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import metrics
+from .process_pool import BoundedProcessPool
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins in progress. Please retry shortly.'
+    default_code = 'hashing_busy'
+
+
+pool = BoundedProcessPool('PASSWORD_HASHING', HashingBusy)
+
+
+@receiver(setting_changed)
+def _hashers_changed(setting, **kwargs):
+    # Workers load the hashers once; restart them with the new list
+    if setting == 'PASSWORD_HASHERS':
+        pool.shutdown()
+
+
+def _check(raw_password, encoded):
+    """``(valid, needs rehash)``; the rehash is left to the caller, which owns the row."""
+    needs_update = []
+    valid = check_password(raw_password, encoded, setter=lambda raw: needs_update.append(True))
+    return valid, bool(needs_update)
+
+
+def hash_password(raw_password):
+    """``make_password(raw_password)``, on the pool when one is configured."""
+    with metrics.timer('auth'):
+        return pool.run(make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    """``(valid, needs rehash)`` for ``raw_password`` against the stored ``encoded`` hash."""
+    with metrics.timer('auth'):
+        return pool.run(_check, raw_password, encoded)
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend whose password check runs through ``verify_password``."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway, so a missing user takes as long as a wrong password
+            hash_password(password)
+            return None
+        valid, needs_update = verify_password(password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if needs_update:
+            # Stored under an outdated hasher or iteration count: upgrade it now
+            user.password = hash_password(password)
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,136 @@
+"""
+A minimal PDF writer for text documents: headings and wrapped paragraphs
+over as many US Letter pages as needed.
+
+It uses the standard Helvetica fonts every PDF viewer provides, so no
+fonts are embedded and no third-party library is needed. Text outside
+Windows-1252 is replaced.
+"""
+import zlib
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+MARGIN = 54
+FONTS = {'regular': ('F1', 'Helvetica'), 'bold': ('F2', 'Helvetica-Bold')}
+
+# Helvetica advance widths (1/1000 em) for ' ' through '~', from the Adobe AFM
+_HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+# Helvetica-Bold runs about 6% wider; wrapping with the larger estimate never overflows
+_BOLD_FACTOR = 1.07
+
+
+def text_width(text, size, style='regular'):
+    units = sum(
+        _HELVETICA_WIDTHS[ord(char) - 32] if 32 <= ord(char) <= 126 else 556 for char in text
+    )
+    return units * size / 1000 * (_BOLD_FACTOR if style == 'bold' else 1)
+
+
+def wrap(text, size, width, style='regular'):
+    """Split ``text`` into lines no wider than ``width`` points, breaking at spaces."""
+    lines = []
+    for paragraph in str(text).splitlines() or ['']:
+        line = ''
+        for word in paragraph.split(' '):
+            candidate = f'{line} {word}' if line else word
+            if line and text_width(candidate, size, style) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def _escape(text):
+    encoded = text.encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+class Document:
+    """Lay out text top to bottom, starting a new page whenever the current one is full."""
+
+    def __init__(self, title=''):
+        self.title = title
+        self.pages = []
+        self._new_page()
+
+    def _new_page(self):
+        self.pages.append([])
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def text(self, text, size=10, style='regular', indent=0, space_before=0, space_after=2):
+        """Add ``text`` wrapped to the page width, in one of ``FONTS``."""
+        leading = size * 1.3
+        self.y -= space_before
+        for line in wrap(text, size, PAGE_WIDTH - 2 * MARGIN - indent, style):
+            if self.y - leading < MARGIN:
+                self._new_page()
+            self.y -= leading
+            self.pages[-1].append((FONTS[style][0], size, MARGIN + indent, self.y + size * 0.25, line))
+        self.y -= space_after
+
+    def rule(self, space=6):
+        """A thin horizontal line across the text width."""
+        if self.y - 2 * space < MARGIN:
+            self._new_page()
+            return
+        self.y -= space
+        self.pages[-1].append(('rule', 0, MARGIN, self.y, None))
+        self.y -= space
+
+    def _content(self, items):
+        ops = []
+        for font, size, x, y, line in items:
+            if font == 'rule':
+                ops.append(b'0.6 G 0.5 w %.2f %.2f m %.2f %.2f l S' % (x, y, PAGE_WIDTH - MARGIN, y))
+            else:
+                ops.append(b'BT /%s %.1f Tf %.2f %.2f Td (%s) Tj ET' % (font.encode(), size, x, y, _escape(line)))
+        return zlib.compress(b'\n'.join(ops))
+
+    def render(self):
+        """The document as PDF bytes."""
+        font_ids = {name: 3 + i for i, name in enumerate(FONTS)}
+        first_page = 3 + len(FONTS) + 1  # After the catalog, page tree, fonts and info
+        page_ids = [first_page + 2 * i for i in range(len(self.pages))]
+        objects = {
+            1: b'<< /Type /Catalog /Pages 2 0 R >>',
+            2: b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+                b' '.join(b'%d 0 R' % page_id for page_id in page_ids), len(page_ids),
+            ),
+            first_page - 1: b'<< /Title (%s) /Producer (Health Compass) >>' % _escape(self.title),
+        }
+        for name, (_, base_font) in FONTS.items():
+            objects[font_ids[name]] = (
+                b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % base_font.encode()
+            )
+        resources = b'<< /Font << %s >> >>' % b' '.join(
+            b'/%s %d 0 R' % (FONTS[name][0].encode(), font_ids[name]) for name in FONTS
+        )
+        for page_id, items in zip(page_ids, self.pages):
+            content = self._content(items)
+            objects[page_id] = b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>' % (
+                PAGE_WIDTH, PAGE_HEIGHT, resources, page_id + 1,
+            )
+            objects[page_id + 1] = b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (
+                len(content), content,
+            )
+
+        out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = {}
+        for number in sorted(objects):
+            offsets[number] = len(out)
+            out += b'%d 0 obj\n%s\nendobj\n' % (number, objects[number])
+        xref = len(out)
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        out += b''.join(b'%010d 00000 n \n' % offsets[number] for number in sorted(objects))
+        out += b'trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            len(objects) + 1, first_page - 1, xref,
+        )
+        return bytes(out)
@@ -0,0 +1,92 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+
+def _init_worker(settings_module):
+    # Spawned workers (non-fork platforms) start without Django configured
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+class BoundedProcessPool:
+    """
+    A lazily started process pool for CPU-bound work, configured by settings.
+
+    ``<PREFIX>_WORKERS`` sets the pool size; 0 runs calls inline. At most
+    ``<PREFIX>_MAX_PENDING`` calls (default 4 per worker) are queued or
+    running at once; a caller that cannot get a slot within
+    ``<PREFIX>_WAIT_SECONDS`` gets ``busy_exception`` instead of adding to
+    an unbounded backlog. Changing any of those settings (or in tests,
+    overriding them) restarts the pool.
+    """
+
+    def __init__(self, prefix, busy_exception, default_wait_seconds=5):
+        self.prefix = prefix
+        self.busy_exception = busy_exception
+        self.default_wait_seconds = default_wait_seconds
+        self._lock = threading.Lock()
+        self._executor = None
+        self.slots = None
+        setting_changed.connect(self._settings_changed, weak=False)
+
+    def _setting(self, name, default):
+        return getattr(settings, f'{self.prefix}_{name}', default)
+
+    @property
+    def workers(self):
+        return self._setting('WORKERS', 0)
+
+    @property
+    def started(self):
+        return self._executor is not None
+
+    def start(self):
+        """Start the pool if needed; returns ``(executor, slots)``."""
+        with self._lock:
+            if self._executor is None:
+                workers = self.workers
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings'),),
+                )
+                self.slots = threading.BoundedSemaphore(self._setting('MAX_PENDING', None) or workers * 4)
+            return self._executor, self.slots
+
+    def shutdown(self):
+        """Stop the worker processes; the next call starts a new pool from current settings."""
+        with self._lock:
+            executor, self._executor, self.slots = self._executor, None, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _settings_changed(self, setting, **kwargs):
+        if setting.startswith(f'{self.prefix}_'):
+            self.shutdown()
+
+    def run(self, func, *args):
+        """``func(*args)`` on a worker process, or inline when the pool is disabled."""
+        if not self.workers:
+            return func(*args)
+        executor, slots = self.start()
+        wait = self._setting('WAIT_SECONDS', self.default_wait_seconds)
+        if not slots.acquire(timeout=wait):
+            exc = self.busy_exception()
+            exc.wait = max(wait, 1)  # Sent as Retry-After by DRF's exception handler
+            raise exc
+        try:
+            return executor.submit(func, *args).result()
+        finally:
+            slots.release()
+
+    def map(self, func, items):
+        """``func`` over ``items`` on every worker at once, for batch jobs outside requests."""
+        if not self.workers:
+            return [func(item) for item in items]
+        executor, _ = self.start()
+        return list(executor.map(func, items))
@@ -0,0 +1,78 @@
+import threading
+
+from django.core.cache import caches
+from django.db import transaction
+
+from . import cache_versions
+
+CACHE_ALIAS = 'questionnaires'
+
+
+class CacheStats:
+    """Per-process hit/miss/invalidation counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = self.invalidations = 0
+
+    def record(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
+
+
+stats = CacheStats()
+
+
+def _version_key(user_id):
+    return f'questionnaire:version:{user_id}'
+
+
+def get_payload(user_id, loader):
+    """
+    Return the user's cached serialized questionnaire entry, loading it on a miss.
+
+    Entries are keyed by user and the user's shared version counter
+    (core.cache_versions), so a write in any worker orphans them; on a miss
+    ``loader()`` is called and its result, None included, is cached. The
+    version is read before loading, so a result loaded while a write commits
+    is stored under the superseded version and never served.
+    """
+    cache = caches[CACHE_ALIAS]
+    key = f'questionnaire:{user_id}:{cache_versions.current(_version_key(user_id))}'
+    cached = cache.get(key)
+    if cached is not None:
+        stats.record('hits')
+        return cached[0]
+    stats.record('misses')
+    payload = loader()
+    # Wrapped so a user without a questionnaire is cached too
+    cache.set(key, (payload,))
+    return payload
+
+
+def invalidate(user_ids):
+    """Bump each user's version counter, orphaning every entry cached under the old one."""
+    user_ids = set(user_ids)
+    cache_versions.bump(_version_key(user_id) for user_id in user_ids)
+    for _ in user_ids:
+        stats.record('invalidations')
+
+
+def invalidate_on_commit(user_ids):
+    """Invalidate once the current transaction commits (immediately outside one)."""
+    user_ids = set(user_ids)
+    transaction.on_commit(lambda: invalidate(user_ids))
@@ -0,0 +1,302 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    PersonalInfo, Lifestyle, MedicalHistory, FamilyHistory, Measurements,
+    Symptoms, PreventiveCare, HealthQuestionnaire
+)
+from .snapshots import refresh_snapshots
+
+# (questionnaire field, section model, ((model field, submitted field, default), ...))
+SECTIONS = (
+    ('personal_info', PersonalInfo, (
+        ('age', 'age', None),
+        ('gender', 'gender', ''),
+        ('contact', 'contact', ''),
+    )),
+    ('lifestyle', Lifestyle, (
+        ('smoking_status', 'smoking_status', ''),
+        ('alcohol_consumption', 'alcohol_consumption', ''),
+        ('physical_activity', 'physical_activity', ''),
+        ('diet', 'diet', ''),
+    )),
+    ('medical_history', MedicalHistory, (
+        ('diabetes', 'diabetes_medical', False),
+        ('hypertension', 'hypertension', False),
+        ('heart_disease', 'heart_disease_medical', False),
+        ('other_conditions', 'other_conditions', ''),
+        ('medications', 'medications', ''),
+        ('allergies', 'allergies', ''),
+    )),
+    ('family_history', FamilyHistory, (
+        ('diabetes', 'diabetes_family', False),
+        ('heart_disease', 'heart_disease_family', False),
+        ('cancer', 'cancer_family', False),
+        ('other', 'other_family', ''),
+    )),
+    ('measurements', Measurements, (
+        ('height_cm', 'height_cm', None),
+        ('weight_kg', 'weight_kg', None),
+        ('blood_pressure', 'blood_pressure', ''),
+        ('blood_sugar', 'blood_sugar', ''),
+        ('cholesterol', 'cholesterol', ''),
+    )),
+    ('symptoms', Symptoms, (
+        ('chest_pain', 'chest_pain', False),
+        ('breathlessness', 'breathlessness', False),
+        ('fatigue', 'fatigue', False),
+        ('sleep_quality', 'sleep_quality', ''),
+        ('stress_level', 'stress_level', ''),
+    )),
+    ('preventive_care', PreventiveCare, (
+        ('last_checkup', 'last_checkup', None),
+        ('vaccinations', 'vaccinations', ''),
+    )),
+)
+
+
+def _user_accessor(model):
+    return model._meta.get_field('user').remote_field.get_accessor_name()
+
+
+# Reverse OneToOne accessors on User, e.g. 'personalinfo', 'healthquestionnaire'
+SECTION_ACCESSORS = tuple(_user_accessor(model) for _, model, _ in SECTIONS)
+QUESTIONNAIRE_ACCESSOR = _user_accessor(HealthQuestionnaire)
+
+
+def section_values(fields, validated_data):
+    """Map submitted data onto one section's model fields, dropping missing values."""
+    values = {}
+    for field, source, default in fields:
+        value = validated_data.get(source, default)
+        if value is not None:
+            values[field] = value
+    return values
+
+
+def _related_or_none(instance, accessor):
+    try:
+        return getattr(instance, accessor)
+    except ObjectDoesNotExist:
+        return None
+
+
+def _locked_users():
+    """Users with every section and the questionnaire joined, locked for update."""
+    queryset = User.objects.select_related(*SECTION_ACCESSORS, QUESTIONNAIRE_ACCESSOR)
+    if connection.features.has_select_for_update_of:
+        # Only the user row is locked; the joined sections may be missing (outer join)
+        return queryset.select_for_update(of=('self',))
+    return queryset.select_for_update()
+
+
+def _lock_user(user):
+    """Lock the user row and load every section plus the questionnaire in one query."""
+    return _locked_users().get(pk=user.pk)
+
+
+def _assign(instance, values):
+    """Assign values and return the names of the fields that actually changed."""
+    changed = [field for field, value in values.items() if getattr(instance, field) != value]
+    for field in changed:
+        setattr(instance, field, values[field])
+    return changed
+
+
+def _derive(instance):
+    """Recompute server-side columns (e.g. Measurements.bmi) that bulk writes skip save() for."""
+    derive = getattr(instance, 'derive', None)
+    return derive() if derive else []
+
+
+def _apply(instance, values):
+    """Assign values and UPDATE only the columns that actually changed."""
+    changed = _assign(instance, values)
+    if changed:
+        # auto_now only applies to fields named in update_fields
+        instance.save(update_fields=changed + ['updated_at'])
+    return changed
+
+
+def _required_fields(model):
+    return tuple(
+        field.name for field in model._meta.concrete_fields
+        if field.editable and field.name != 'user'
+        and not (field.primary_key or field.null or field.has_default() or field.empty_strings_allowed)
+    )
+
+
+# Columns a section cannot be created without, e.g. PersonalInfo.age
+REQUIRED_FIELDS = {name: _required_fields(model) for name, model, _ in SECTIONS}
+
+
+def write_questionnaire(user, validated_data):
+    """
+    Create or update the user's questionnaire and its seven sections atomically.
+
+    The user's row is locked once (serializing concurrent resubmits), all existing
+    rows come back from that same query, and only rows and columns that changed
+    are written: one SELECT plus at most eight INSERT/UPDATE statements, and the
+    snapshot refresh when anything changed.
+    """
+    with transaction.atomic():
+        locked_user = _lock_user(user)
+
+        sections, dirty = {}, False
+        for (name, model, fields), accessor in zip(SECTIONS, SECTION_ACCESSORS):
+            values = section_values(fields, validated_data)
+            instance = _related_or_none(locked_user, accessor)
+            if instance is None:
+                instance = model.objects.create(user=locked_user, **values)
+                dirty = True
+            elif _apply(instance, values):
+                dirty = True
+            sections[name] = instance
+
+        questionnaire = _related_or_none(locked_user, QUESTIONNAIRE_ACCESSOR)
+        if questionnaire is None:
+            questionnaire = HealthQuestionnaire.objects.create(user=locked_user, status='pending', **sections)
+            refresh_snapshots([questionnaire])
+            return questionnaire
+
+        changed = [
+            name for name, section in sections.items()
+            if getattr(questionnaire, f'{name}_id') != section.pk
+        ]
+        for name, section in sections.items():
+            setattr(questionnaire, name, section)
+        if questionnaire.status != 'pending':
+            questionnaire.status = 'pending'
+            changed.append('status')
+        if changed:
+            questionnaire.save(update_fields=changed)
+        if changed or dirty:
+            refresh_snapshots([questionnaire])
+        return questionnaire
+
+
+def _missing_required(user, validated_data):
+    """Submitted field names needed to create the sections ``user`` does not have yet."""
+    missing = []
+    for (name, _, fields), accessor in zip(SECTIONS, SECTION_ACCESSORS):
+        if _related_or_none(user, accessor) is not None:
+            continue
+        values = section_values(fields, validated_data)
+        sources = {field: source for field, source, _ in fields}
+        missing.extend(sources[field] for field in REQUIRED_FIELDS[name] if field not in values)
+    return missing
+
+
+def _bulk_create(model, instances, batch_size):
+    model.objects.bulk_create(instances, batch_size=batch_size)
+    if instances and instances[0].pk is None:
+        # Backends that cannot return ids from a multi-row INSERT
+        pks = dict(
+            model.objects.filter(user_id__in=[obj.user_id for obj in instances])
+            .values_list('user_id', 'pk')
+        )
+        for obj in instances:
+            obj.pk = pks[obj.user_id]
+            obj._state.adding = False
+
+
+def bulk_write_questionnaires(records, batch_size=500):
+    """
+    Create or update many users' questionnaires in one transaction.
+
+    ``records`` is a sequence of ``(user_id, validated_data)`` pairs with distinct
+    user ids. Every row is written with one bulk INSERT and one bulk UPDATE per
+    table, so the statement count depends on the number of tables, not records.
+
+    Returns ``(written, rejected)``: ``{user_id: (questionnaire, created)}`` and
+    ``{user_id: [missing field, ...]}`` for records that would create a section
+    without its required columns.
+    """
+    with transaction.atomic():
+        users = _locked_users().in_bulk([user_id for user_id, _ in records])
+        rejected = {}
+        for user_id, validated_data in records:
+            if user_id not in users:
+                rejected[user_id] = ['user']
+                continue
+            missing = _missing_required(users[user_id], validated_data)
+            if missing:
+                rejected[user_id] = missing
+        records = [(user_id, data) for user_id, data in records if user_id not in rejected]
+
+        sections, dirty = {user_id: {} for user_id, _ in records}, set()
+        now = timezone.now()
+        for (name, model, fields), accessor in zip(SECTIONS, SECTION_ACCESSORS):
+            to_create, to_update, changed_fields = [], [], set()
+            for user_id, validated_data in records:
+                values = section_values(fields, validated_data)
+                instance = _related_or_none(users[user_id], accessor)
+                if instance is None:
+                    instance = model(user_id=user_id, **values)
+                    _derive(instance)
+                    to_create.append(instance)
+                    dirty.add(user_id)
+                else:
+                    changed = _assign(instance, values) + _derive(instance)
+                    if changed:
+                        instance.updated_at = now
+                        to_update.append(instance)
+                        changed_fields.update(changed + ['updated_at'])
+                        dirty.add(user_id)
+                sections[user_id][name] = instance
+            _bulk_create(model, to_create, batch_size)
+            if to_update:
+                model.objects.bulk_update(to_update, sorted(changed_fields), batch_size=batch_size)
+
+        written = {}
+        to_create, to_update, changed_fields = [], [], set()
+        for user_id, _ in records:
+            questionnaire = _related_or_none(users[user_id], QUESTIONNAIRE_ACCESSOR)
+            if questionnaire is None:
+                questionnaire = HealthQuestionnaire(user_id=user_id, status='pending', **sections[user_id])
+                to_create.append(questionnaire)
+                dirty.add(user_id)
+            else:
+                changed = [
+                    name for name, section in sections[user_id].items()
+                    if getattr(questionnaire, f'{name}_id') != section.pk
+                ]
+                for name, section in sections[user_id].items():
+                    setattr(questionnaire, name, section)
+                if questionnaire.status != 'pending':
+                    questionnaire.status = 'pending'
+                    changed.append('status')
+                if changed:
+                    to_update.append(questionnaire)
+                    changed_fields.update(changed)
+                    dirty.add(user_id)
+            written[user_id] = (questionnaire, questionnaire.pk is None)
+        _bulk_create(HealthQuestionnaire, to_create, batch_size)
+        if to_update:
+            HealthQuestionnaire.objects.bulk_update(to_update, sorted(changed_fields), batch_size=batch_size)
+        refresh_snapshots([written[user_id][0] for user_id in written if user_id in dirty])
+        return written, rejected
+
+
+def review_questionnaires(ids, status, admin_feedback):
+    """
+    Apply one review decision to many questionnaires in a single UPDATE.
+
+    Snapshots are refreshed in the same transaction, from questionnaires
+    locked with their sections so a concurrent section write cannot be
+    overwritten by a stale snapshot. Returns the ids that exist; the rest
+    were not found.
+    """
+    with transaction.atomic():
+        questionnaires = list(HealthQuestionnaire.objects.with_sections().select_for_update().filter(pk__in=ids))
+        found = [questionnaire.pk for questionnaire in questionnaires]
+        if not found:
+            return []
+        HealthQuestionnaire.objects.filter(pk__in=found).update(status=status, admin_feedback=admin_feedback)
+        for questionnaire in questionnaires:
+            questionnaire.status = status
+            questionnaire.admin_feedback = admin_feedback
+        refresh_snapshots(questionnaires)
+        return found
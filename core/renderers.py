@@ -0,0 +1,109 @@
+"""
+Faster JSON rendering and parsing on orjson, and MessagePack as a binary
+alternative negotiated with ``Accept: application/msgpack``.
+
+Both libraries are optional. Without orjson the JSON classes behave exactly
+like DRF's own; MessagePack is only offered when msgpack is installed (see
+REST_FRAMEWORK in settings).
+"""
+from django.conf import settings
+from rest_framework.utils import encoders
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Everything orjson and msgpack cannot encode natively goes through DRF's
+# encoder, so dates, decimals, UUIDs and lazy strings come out as they did
+# with JSONRenderer
+_default = encoders.JSONEncoder().default
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+
+def dumps(data):
+    """``data`` as compact UTF-8 JSON bytes, the same as ``JSONRenderer`` writes it."""
+    if orjson is None:
+        return JSONRenderer().render(data)
+    content = orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+    # Keep the output a strict JavaScript subset, like JSONRenderer
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer on orjson. Indented output (``; indent=4``) is left to the stdlib."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read() if stream is not None else b'')
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read() if stream is not None else b'', raw=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
+
+
+class PDFRenderer(BaseRenderer):
+    """
+    Lets a view negotiate ``application/pdf``. Views answer with the file
+    itself; anything else that reaches the renderer (an error) is sent as JSON.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return dumps(data)
@@ -0,0 +1,164 @@
+"""
+Downloadable PDF health reports, rendered once per questionnaire version.
+
+A report is laid out from the questionnaire's snapshot payload, on the
+``REPORT_RENDER`` process pool so a burst of downloads cannot pin request
+workers on layout. Rendered files are kept in ``REPORT_CACHE_DIR`` under a
+name built from the questionnaire id and its snapshot version, so every
+change (an edited section, a review) makes the next download render a new
+file and repeat downloads are served straight from disk.
+"""
+import io
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import QUESTIONNAIRE_SECTIONS, QuestionnaireSnapshot
+from .pdf import Document
+from .process_pool import BoundedProcessPool
+from .questionnaire_cache import CacheStats
+
+# Bump when the layout changes, so files rendered by the old code are not served
+LAYOUT_VERSION = 1
+
+SECTION_TITLES = {
+    'personal_info': 'Personal information',
+    'lifestyle': 'Lifestyle',
+    'medical_history': 'Medical history',
+    'family_history': 'Family history',
+    'measurements': 'Measurements',
+    'symptoms': 'Symptoms',
+    'preventive_care': 'Preventive care',
+}
+FIELD_LABELS = {
+    'height_cm': 'Height (cm)',
+    'weight_kg': 'Weight (kg)',
+    'bmi': 'BMI',
+}
+STATUS_LABELS = {'pending': 'Pending review', 'approved': 'Approved'}
+# Payload keys that are bookkeeping rather than health details
+_HIDDEN_FIELDS = {'id', 'user', 'updated_at'}
+
+
+class ReportBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many reports are being prepared. Please retry shortly.'
+    default_code = 'report_busy'
+
+
+pool = BoundedProcessPool('REPORT_RENDER', ReportBusy, default_wait_seconds=10)
+stats = CacheStats()
+
+
+def _label(field):
+    return FIELD_LABELS.get(field, field.replace('_', ' ').capitalize())
+
+
+def _value(value):
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    if value is None or value == '':
+        return '—'
+    if isinstance(value, float):
+        return f'{value:g}'
+    return str(value)
+
+
+def render_report(payload):
+    """Lay out one questionnaire payload (as stored in its snapshot) and return the PDF bytes."""
+    doc = Document(title='Your Health Details')
+    doc.text('Your Health Details', size=20, style='bold', space_after=6)
+    doc.text(f'Questionnaire #{payload["id"]}', size=10)
+    doc.text(f'Submitted: {str(payload.get("submitted_at", ""))[:10]}', size=10)
+    doc.text(f'Status: {STATUS_LABELS.get(payload.get("status"), payload.get("status"))}', size=10)
+    doc.rule()
+    for section in QUESTIONNAIRE_SECTIONS:
+        values = payload.get(section) or {}
+        doc.text(SECTION_TITLES[section], size=13, style='bold', space_before=8, space_after=4)
+        for field, value in values.items():
+            if field not in _HIDDEN_FIELDS:
+                doc.text(f'{_label(field)}: {_value(value)}', indent=12)
+    doc.rule()
+    doc.text('Reviewer feedback', size=13, style='bold', space_before=8, space_after=4)
+    if payload.get('status') == 'approved' or payload.get('admin_feedback'):
+        doc.text(payload.get('admin_feedback') or 'No comments.', indent=12)
+    else:
+        doc.text('Not reviewed yet.', indent=12)
+    return doc.render()
+
+
+def cache_dir():
+    return Path(settings.REPORT_CACHE_DIR)
+
+
+def _cache_path(snapshot):
+    stamp = int(snapshot.updated_at.timestamp() * 1_000_000)
+    return cache_dir() / f'{snapshot.pk}-v{snapshot.version}-{stamp}-l{LAYOUT_VERSION}.pdf'
+
+
+def _store(path, content):
+    """Write ``content`` to ``path`` atomically and remove the questionnaire's older reports."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    for stale in path.parent.glob(f'{path.name.split("-", 1)[0]}-v*.pdf'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+
+def open_report(questionnaire):
+    """
+    Return the questionnaire's report as an open binary file, rendering it
+    if this version has none yet.
+
+    A questionnaire without a snapshot has no version to key a file by, so
+    its report is rendered on every call and not stored.
+    """
+    try:
+        snapshot = questionnaire.snapshot
+    except QuestionnaireSnapshot.DoesNotExist:
+        from .snapshots import build_payload
+        stats.record('misses')
+        return io.BytesIO(pool.run(render_report, build_payload(questionnaire)))
+    path = _cache_path(snapshot)
+    try:
+        # Opened rather than checked, so a newer version replacing it meanwhile cannot pull it away
+        handle = open(path, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        stats.record('hits')
+        return handle
+    stats.record('misses')
+    content = pool.run(render_report, snapshot.payload)
+    _store(path, content)
+    return io.BytesIO(content)
+
+
+def prerender(queryset, batch_size=100):
+    """
+    Render the reports of ``queryset`` that are not cached yet, a batch at a
+    time across the whole pool. Returns the number rendered.
+    """
+    rendered = 0
+    last_id = 0
+    queryset = queryset.filter(snapshot__isnull=False).select_related('snapshot').order_by('id')
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return rendered
+        last_id = batch[-1].pk
+        missing = [q.snapshot for q in batch if not _cache_path(q.snapshot).exists()]
+        for snapshot, content in zip(missing, pool.map(render_report, [s.payload for s in missing])):
+            _store(_cache_path(snapshot), content)
+        rendered += len(missing)
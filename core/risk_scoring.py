@@ -0,0 +1,205 @@
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import (
+    Lifestyle, MedicalHistory, FamilyHistory, Measurements, Symptoms, RiskScore, RiskScoreRun
+)
+
+CHUNK_SIZE = 20000
+# Rows saved just before a run started may commit after its snapshot was read;
+# rescoring is idempotent, so incremental runs look back a little further
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+# Scoring inputs and the sections they come from
+INPUT_MODELS = (Measurements, Symptoms, MedicalHistory, FamilyHistory, Lifestyle)
+
+# (feature name, lookup from Measurements); sections a user lacks come back as None
+COLUMNS = (
+    ('user_id', 'user_id'),
+    ('bmi', 'bmi'),
+    ('systolic', 'systolic'),
+    ('diastolic', 'diastolic'),
+    ('glucose', 'glucose'),
+    ('cholesterol', 'total_cholesterol'),
+    ('chest_pain', 'user__symptoms__chest_pain'),
+    ('breathlessness', 'user__symptoms__breathlessness'),
+    ('fatigue', 'user__symptoms__fatigue'),
+    ('diabetes', 'user__medicalhistory__diabetes'),
+    ('hypertension', 'user__medicalhistory__hypertension'),
+    ('heart_disease', 'user__medicalhistory__heart_disease'),
+    ('family_diabetes', 'user__familyhistory__diabetes'),
+    ('family_heart_disease', 'user__familyhistory__heart_disease'),
+    ('smoking_status', 'user__lifestyle__smoking_status'),
+)
+COLUMN_NAMES = tuple(name for name, _ in COLUMNS)
+LOOKUPS = tuple(lookup for _, lookup in COLUMNS)
+
+# Logistic screening heuristics, not validated clinical models. Each weight
+# multiplies a 0/1 flag or the excess of a measurement over its threshold;
+# missing measurements contribute nothing.
+CARDIOVASCULAR = {
+    'intercept': -4.0,
+    'systolic_excess': 0.03,       # mmHg over 120
+    'diastolic_excess': 0.02,      # mmHg over 80
+    'cholesterol_excess': 0.008,   # mg/dL over 200
+    'bmi_excess': 0.05,            # over 25
+    'current_smoker': 0.9,
+    'former_smoker': 0.3,
+    'hypertension': 0.8,
+    'heart_disease': 1.2,
+    'diabetes': 0.4,
+    'family_heart_disease': 0.6,
+    'chest_pain': 1.0,
+    'breathlessness': 0.6,
+    'fatigue': 0.2,
+}
+DIABETES = {
+    'intercept': -4.5,
+    'glucose_excess': 0.04,        # mg/dL over 100
+    'bmi_excess': 0.08,            # over 25
+    'family_diabetes': 0.9,
+    'hypertension': 0.4,
+    'current_smoker': 0.2,
+    'fatigue': 0.3,
+}
+THRESHOLDS = {'systolic': 120, 'diastolic': 80, 'cholesterol': 200, 'glucose': 100, 'bmi': 25}
+FLAGS = (
+    'chest_pain', 'breathlessness', 'fatigue', 'diabetes', 'hypertension',
+    'heart_disease', 'family_diabetes', 'family_heart_disease',
+)
+
+
+def _excess(values, threshold):
+    # fmax ignores NaN, so a missing measurement counts as no excess
+    return np.fmax(values - threshold, 0.0)
+
+
+def features(columns):
+    """Turn a dict of raw column sequences into a dict of float feature arrays."""
+    # None (a missing reading or section) becomes NaN
+    measured = {name: np.array(columns[name], dtype=float) for name in THRESHOLDS}
+    smoking = np.asarray(columns['smoking_status'], dtype=str)
+    result = {
+        f'{name}_excess': _excess(values, THRESHOLDS[name]) for name, values in measured.items()
+    }
+    result['current_smoker'] = (smoking == 'current').astype(float)
+    result['former_smoker'] = (smoking == 'former').astype(float)
+    for flag in FLAGS:
+        result[flag] = np.nan_to_num(np.array(columns[flag], dtype=float))
+    return result
+
+
+def _logistic(weights, feature_arrays):
+    z = np.full(len(next(iter(feature_arrays.values()))), weights['intercept'])
+    for name, weight in weights.items():
+        if name != 'intercept':
+            z += weight * feature_arrays[name]
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def score_columns(columns):
+    """Score whole columns at once. Returns ``(cardiovascular, diabetes)`` arrays."""
+    feature_arrays = features(columns)
+    cardiovascular = _logistic(CARDIOVASCULAR, feature_arrays)
+    # A diagnosed diabetic is certain to have diabetes
+    diabetes = np.where(feature_arrays['diabetes'] > 0, 1.0, _logistic(DIABETES, feature_arrays))
+    return cardiovascular, diabetes
+
+
+def score_rows(rows):
+    """Score ``values_list(*LOOKUPS)`` rows. Returns ``(user_ids, cardiovascular, diabetes)``."""
+    columns = dict(zip(COLUMN_NAMES, zip(*rows)))
+    cardiovascular, diabetes = score_columns(columns)
+    return list(columns['user_id']), cardiovascular, diabetes
+
+
+def score_row(row):
+    """Score one row in plain Python: the reference the vectorized path must agree with."""
+    values = dict(zip(COLUMN_NAMES, row))
+    feature_values = {
+        f'{name}_excess': 0.0 if values[name] is None else max(values[name] - threshold, 0.0)
+        for name, threshold in THRESHOLDS.items()
+    }
+    feature_values['current_smoker'] = float(values['smoking_status'] == 'current')
+    feature_values['former_smoker'] = float(values['smoking_status'] == 'former')
+    for flag in FLAGS:
+        feature_values[flag] = float(bool(values[flag]))
+
+    def logistic(weights):
+        z = weights['intercept'] + sum(
+            weight * feature_values[name] for name, weight in weights.items() if name != 'intercept'
+        )
+        return 1.0 / (1.0 + math.exp(-z))
+
+    diabetes = 1.0 if feature_values['diabetes'] else logistic(DIABETES)
+    return values['user_id'], logistic(CARDIOVASCULAR), diabetes
+
+
+def changed_user_ids(since):
+    """Users with a scoring input saved at or after ``since``, in id order."""
+    user_ids = set()
+    for model in INPUT_MODELS:
+        user_ids.update(model.objects.filter(updated_at__gte=since).values_list('user_id', flat=True))
+    return sorted(user_ids)
+
+
+def _row_chunks(user_ids, chunk_size):
+    """Yield lists of input rows, every user when ``user_ids`` is None."""
+    queryset = Measurements.objects.order_by('user_id').values_list(*LOOKUPS)
+    if user_ids is None:
+        last_id = 0
+        while True:
+            rows = list(queryset.filter(user_id__gt=last_id)[:chunk_size])
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+    for start in range(0, len(user_ids), chunk_size):
+        rows = list(queryset.filter(user_id__in=user_ids[start:start + chunk_size]))
+        if rows:
+            yield rows
+
+
+def _store(user_ids, cardiovascular, diabetes, scored_at):
+    RiskScore.objects.bulk_create(
+        [
+            RiskScore(user_id=user_id, cardiovascular=cardio, diabetes=diabetic, scored_at=scored_at)
+            for user_id, cardio, diabetic in zip(user_ids, cardiovascular.tolist(), diabetes.tolist())
+        ],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['cardiovascular', 'diabetes', 'scored_at'],
+        batch_size=1000,
+    )
+
+
+def score_population(full=False, chunk_size=CHUNK_SIZE):
+    """
+    Score every user with measurements, or only those whose inputs changed.
+
+    Without ``full``, only users whose scoring sections were saved since the
+    last finished run started are rescored; a first run is always full.
+    Deleted sections do not mark a user changed, so run ``full`` periodically.
+    Each chunk costs one SELECT, one vectorized pass and one bulk upsert.
+    Returns the finished :class:`RiskScoreRun`.
+    """
+    started_at = timezone.now()
+    last_started = RiskScoreRun.objects.filter(finished_at__isnull=False).aggregate(
+        last=Max('started_at'))['last']
+    user_ids = None
+    if not full and last_started is not None:
+        user_ids = changed_user_ids(last_started - WATERMARK_OVERLAP)
+    run = RiskScoreRun.objects.create(started_at=started_at, full=user_ids is None)
+
+    for rows in _row_chunks(user_ids, chunk_size):
+        scored_ids, cardiovascular, diabetes = score_rows(rows)
+        _store(scored_ids, cardiovascular, diabetes, timezone.now())
+        run.scored += len(scored_ids)
+
+    run.finished_at = timezone.now()
+    run.save(update_fields=['finished_at', 'scored'])
+    return run
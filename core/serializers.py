@@ -1,43 +1,54 @@
+from django.db import models, transaction
 from rest_framework import serializers
 from .models import (
     PersonalInfo, Lifestyle, MedicalHistory, FamilyHistory, Measurements,
-    Symptoms, PreventiveCare, HealthQuestionnaire
+    Symptoms, PreventiveCare, HealthQuestionnaire, QuestionnaireSnapshot
 )
+from .questionnaire_writer import write_questionnaire
+from . import flat_serializer, jobs, metrics
 
-class PersonalInfoSerializer(serializers.ModelSerializer):
+class TimedRepresentationMixin:
+    """Counts representing instances towards the request's serialize time (core.metrics)."""
+
+    def to_representation(self, instance):
+        with metrics.timer('serialize'):
+            return super().to_representation(instance)
+
+class PersonalInfoSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = PersonalInfo
-        exclude = ('user',)
+        exclude = ('user', 'updated_at')
 
-class LifestyleSerializer(serializers.ModelSerializer):
+class LifestyleSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = Lifestyle
-        exclude = ('user',)
+        exclude = ('user', 'updated_at')
 
-class MedicalHistorySerializer(serializers.ModelSerializer):
+class MedicalHistorySerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = MedicalHistory
-        exclude = ('user',)
+        exclude = ('user', 'updated_at')
 
-class FamilyHistorySerializer(serializers.ModelSerializer):
+class FamilyHistorySerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = FamilyHistory
-        exclude = ('user',)
+        exclude = ('user', 'updated_at')
 
-class MeasurementsSerializer(serializers.ModelSerializer):
+class MeasurementsSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = Measurements
-        exclude = ('user',)
+        exclude = ('user', 'updated_at')
+        read_only_fields = Measurements.DERIVED_FIELDS
 
-class SymptomsSerializer(serializers.ModelSerializer):
+class SymptomsSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = Symptoms
-        exclude = ('user',)
+        exclude = ('user', 'updated_at')
 
-class PreventiveCareSerializer(serializers.ModelSerializer):
+class PreventiveCareSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = PreventiveCare
-        exclude = ('user',)
+        exclude = ('user', 'updated_at')
 
 # NEW: Complete questionnaire serializer
 class CompleteQuestionnaireSerializer(serializers.Serializer):
@@ -69,6 +80,7 @@ class CompleteQuestionnaireSerializer(serializers.Serializer):
     # Measurements
     height_cm = serializers.FloatField(required=False)
     weight_kg = serializers.FloatField(required=False)
+    # Still accepted from older clients, but BMI is computed from height and weight
     bmi = serializers.FloatField(required=False)
     blood_pressure = serializers.CharField(max_length=20, required=False, allow_blank=True)
     blood_sugar = serializers.CharField(max_length=20, required=False, allow_blank=True)
@@ -86,140 +98,19 @@ class CompleteQuestionnaireSerializer(serializers.Serializer):
     vaccinations = serializers.CharField(max_length=500, required=False, allow_blank=True)
 
     def create(self, validated_data):
-        user = self.context['request'].user
-        
-        # Extract data for each model
-        personal_data = {
-            'age': validated_data.get('age'),
-            'gender': validated_data.get('gender', ''),
-            'contact': validated_data.get('contact', ''),
-        }
-        # Remove None values
-        personal_data = {k: v for k, v in personal_data.items() if v is not None}
-        
-        lifestyle_data = {
-            'smoking_status': validated_data.get('smoking_status', ''),
-            'alcohol_consumption': validated_data.get('alcohol_consumption', ''),
-            'physical_activity': validated_data.get('physical_activity', ''),
-            'diet': validated_data.get('diet', ''),
-        }
-        lifestyle_data = {k: v for k, v in lifestyle_data.items() if v is not None}
-        
-        medical_data = {
-            'diabetes': validated_data.get('diabetes_medical', False),
-            'hypertension': validated_data.get('hypertension', False),
-            'heart_disease': validated_data.get('heart_disease_medical', False),
-            'other_conditions': validated_data.get('other_conditions', ''),
-            'medications': validated_data.get('medications', ''),
-            'allergies': validated_data.get('allergies', ''),
-        }
-        medical_data = {k: v for k, v in medical_data.items() if v is not None}
-        
-        family_data = {
-            'diabetes': validated_data.get('diabetes_family', False),
-            'heart_disease': validated_data.get('heart_disease_family', False),
-            'cancer': validated_data.get('cancer_family', False),
-            'other': validated_data.get('other_family', ''),
-        }
-        family_data = {k: v for k, v in family_data.items() if v is not None}
-        
-        measurements_data = {
-            'height_cm': validated_data.get('height_cm'),
-            'weight_kg': validated_data.get('weight_kg'),
-            'bmi': validated_data.get('bmi'),
-            'blood_pressure': validated_data.get('blood_pressure', ''),
-            'blood_sugar': validated_data.get('blood_sugar', ''),
-            'cholesterol': validated_data.get('cholesterol', ''),
-        }
-        measurements_data = {k: v for k, v in measurements_data.items() if v is not None}
-        
-        symptoms_data = {
-            'chest_pain': validated_data.get('chest_pain', False),
-            'breathlessness': validated_data.get('breathlessness', False),
-            'fatigue': validated_data.get('fatigue', False),
-            'sleep_quality': validated_data.get('sleep_quality', ''),
-            'stress_level': validated_data.get('stress_level', ''),
-        }
-        symptoms_data = {k: v for k, v in symptoms_data.items() if v is not None}
-        
-        preventive_data = {
-            'last_checkup': validated_data.get('last_checkup'),
-            'vaccinations': validated_data.get('vaccinations', ''),
-        }
-        preventive_data = {k: v for k, v in preventive_data.items() if v is not None}
-        
-        # Create or update each model
-        personal_info, _ = PersonalInfo.objects.get_or_create(user=user, defaults=personal_data)
-        if not _:
-            for attr, value in personal_data.items():
-                setattr(personal_info, attr, value)
-            personal_info.save()
-        
-        lifestyle, _ = Lifestyle.objects.get_or_create(user=user, defaults=lifestyle_data)
-        if not _:
-            for attr, value in lifestyle_data.items():
-                setattr(lifestyle, attr, value)
-            lifestyle.save()
-        
-        medical_history, _ = MedicalHistory.objects.get_or_create(user=user, defaults=medical_data)
-        if not _:
-            for attr, value in medical_data.items():
-                setattr(medical_history, attr, value)
-            medical_history.save()
-        
-        family_history, _ = FamilyHistory.objects.get_or_create(user=user, defaults=family_data)
-        if not _:
-            for attr, value in family_data.items():
-                setattr(family_history, attr, value)
-            family_history.save()
-        
-        measurements, _ = Measurements.objects.get_or_create(user=user, defaults=measurements_data)
-        if not _:
-            for attr, value in measurements_data.items():
-                setattr(measurements, attr, value)
-            measurements.save()
-        
-        symptoms, _ = Symptoms.objects.get_or_create(user=user, defaults=symptoms_data)
-        if not _:
-            for attr, value in symptoms_data.items():
-                setattr(symptoms, attr, value)
-            symptoms.save()
-        
-        preventive_care, _ = PreventiveCare.objects.get_or_create(user=user, defaults=preventive_data)
-        if not _:
-            for attr, value in preventive_data.items():
-                setattr(preventive_care, attr, value)
-            preventive_care.save()
-        
-        # Create or update main questionnaire
-        questionnaire, created = HealthQuestionnaire.objects.get_or_create(
-            user=user,
-            defaults={
-                'personal_info': personal_info,
-                'lifestyle': lifestyle,
-                'medical_history': medical_history,
-                'family_history': family_history,
-                'measurements': measurements,
-                'symptoms': symptoms,
-                'preventive_care': preventive_care,
-                'status': 'pending'
-            }
-        )
-        
-        if not created:
-            questionnaire.personal_info = personal_info
-            questionnaire.lifestyle = lifestyle
-            questionnaire.medical_history = medical_history
-            questionnaire.family_history = family_history
-            questionnaire.measurements = measurements
-            questionnaire.symptoms = symptoms
-            questionnaire.preventive_care = preventive_care
-            questionnaire.status = 'pending'
-            questionnaire.save()
-        
+        # One transaction, so a committed submission always has its scoring queued
+        with transaction.atomic():
+            questionnaire = write_questionnaire(self.context['request'].user, validated_data)
+            # Coalesced: one queued run rescores every submission made before it starts
+            jobs.enqueue('score_risk', unique_key='incremental')
         return questionnaire
 
-class HealthQuestionnaireSerializer(serializers.ModelSerializer):
+class BulkReviewSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    status = serializers.ChoiceField(choices=HealthQuestionnaire._meta.get_field('status').choices, default='approved')
+    admin_feedback = serializers.CharField(required=False, allow_blank=True, default='')
+
+class HealthQuestionnaireSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     personal_info = PersonalInfoSerializer()
     lifestyle = LifestyleSerializer()
     medical_history = MedicalHistorySerializer()
@@ -230,4 +121,52 @@ class HealthQuestionnaireSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = HealthQuestionnaire
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+def _snapshot_payload(instance):
+    try:
+        return instance.snapshot.payload
+    except QuestionnaireSnapshot.DoesNotExist:
+        return None
+
+def _flat_payloads(instances):
+    """Serialize questionnaires from their section rows with one query, keyed by id."""
+    queryset = HealthQuestionnaire.objects.using(instances[0]._state.db).filter(pk__in=[q.pk for q in instances])
+    return {payload['id']: payload for payload in flat_serializer.questionnaire_serializer().payloads(queryset)}
+
+class QuestionnaireSnapshotListSerializer(TimedRepresentationMixin, serializers.ListSerializer):
+    """Fills in every row without a snapshot from one flat query, rather than seven queries per row."""
+
+    def to_representation(self, data):
+        instances = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        payloads = [_snapshot_payload(instance) for instance in instances]
+        missing = [instance for instance, payload in zip(instances, payloads) if payload is None]
+        if missing:
+            fallback = _flat_payloads(missing)
+            payloads = [
+                payload if payload is not None else fallback.get(instance.pk) or self.child.to_representation(instance)
+                for instance, payload in zip(instances, payloads)
+            ]
+        return payloads
+
+class QuestionnaireSnapshotSerializer(TimedRepresentationMixin, serializers.BaseSerializer):
+    """Read-only questionnaire output served from the stored snapshot row."""
+
+    class Meta:
+        list_serializer_class = QuestionnaireSnapshotListSerializer
+
+    def to_representation(self, instance):
+        payload = _snapshot_payload(instance)
+        if payload is None:
+            # Not built yet (e.g. rows older than snapshots): read the sections instead
+            payload = _flat_payloads([instance]).get(instance.pk)
+        if payload is None:
+            # Not saved, or deleted meanwhile
+            payload = HealthQuestionnaireSerializer(instance, context=self.context).data
+        return payload
+
+class SparseQuestionnaireSerializer(TimedRepresentationMixin, serializers.BaseSerializer):
+    """Read-only output of a ``?fields=`` / ``?sections=`` selection (core.fieldsets)."""
+
+    def to_representation(self, instance):
+        return self.context['flat_serializer'].from_instance(instance)
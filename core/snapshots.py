@@ -0,0 +1,99 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import apply_changes
+from .models import HealthQuestionnaire, QuestionnaireSnapshot
+from .questionnaire_cache import invalidate_on_commit
+
+REBUILD_BATCH_SIZE = 500
+
+
+def build_payload(questionnaire):
+    """Serialize a questionnaire (with its sections) into the snapshot's JSON payload."""
+    # Deferred: serializers imports the writer, which imports this module
+    from .serializers import HealthQuestionnaireSerializer
+    return json.loads(json.dumps(HealthQuestionnaireSerializer(questionnaire).data, cls=DjangoJSONEncoder))
+
+
+def refresh_snapshots(questionnaires):
+    """
+    Rewrite the snapshot of each questionnaire from its loaded sections.
+
+    Must run inside the transaction that changed the questionnaires, so the
+    snapshot never disagrees with the rows it was built from. Costs one locking
+    SELECT plus one bulk INSERT and one bulk UPDATE at most, and one UPDATE per
+    analytics counter the change moved. The owners' cached payloads are
+    invalidated when the transaction commits.
+    """
+    if not questionnaires:
+        return []
+    existing = QuestionnaireSnapshot.objects.select_for_update().in_bulk([q.pk for q in questionnaires])
+    now = timezone.now()
+    to_create, to_update, changes = [], [], []
+    for questionnaire in questionnaires:
+        payload = build_payload(questionnaire)
+        snapshot = existing.get(questionnaire.pk)
+        changes.append((snapshot.payload if snapshot else None, payload))
+        if snapshot is None:
+            snapshot = QuestionnaireSnapshot(questionnaire=questionnaire, payload=payload, updated_at=now)
+            to_create.append(snapshot)
+        else:
+            snapshot.payload = payload
+            snapshot.version += 1
+            snapshot.updated_at = now
+            to_update.append(snapshot)
+        questionnaire.snapshot = snapshot
+    QuestionnaireSnapshot.objects.bulk_create(to_create)
+    if to_update:
+        QuestionnaireSnapshot.objects.bulk_update(to_update, ['payload', 'version', 'updated_at'])
+    apply_changes(changes)
+    invalidate_on_commit(questionnaire.user_id for questionnaire in questionnaires)
+    return to_create + to_update
+
+
+def _batches(queryset, batch_size):
+    """Yield lists of questionnaires in id order, seeking past the last id each time."""
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].pk
+
+
+def rebuild_snapshots(queryset=None, batch_size=REBUILD_BATCH_SIZE):
+    """Rebuild snapshots from the section tables, one transaction per batch. Returns the count."""
+    if queryset is None:
+        queryset = HealthQuestionnaire.objects.all()
+    count = 0
+    for batch in _batches(queryset.with_sections(), batch_size):
+        with transaction.atomic():
+            refresh_snapshots(batch)
+        count += len(batch)
+    return count
+
+
+def find_drift(queryset=None, batch_size=REBUILD_BATCH_SIZE):
+    """Yield ``(questionnaire_id, reason)`` for every missing or stale snapshot."""
+    from .flat_serializer import questionnaire_serializer
+    if queryset is None:
+        queryset = HealthQuestionnaire.objects.all()
+    flat = questionnaire_serializer()
+    # Compared row tuple by row tuple, without building any model instances
+    rows = queryset.order_by('id').values_list(*flat.columns, 'id', 'snapshot__payload')
+    last_id = 0
+    while True:
+        batch = list(rows.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        last_id = batch[-1][-2]
+        for row in batch:
+            questionnaire_id, payload = row[-2:]
+            if payload is None:
+                yield questionnaire_id, 'missing'
+            elif payload != flat.to_representation(row):
+                yield questionnaire_id, 'stale'
@@ -0,0 +1,42 @@
+"""Handlers for background jobs (core.jobs); registered when the app is ready."""
+import logging
+
+from django.core.mail import send_mail
+
+from .jobs import task
+from .models import HealthQuestionnaire
+from .reports import prerender
+
+logger = logging.getLogger(__name__)
+
+
+@task('score_risk')
+def score_risk():
+    """An incremental scoring run: rescores everyone whose inputs changed since the last."""
+    try:
+        from .risk_scoring import score_population
+    except ImportError:
+        logger.warning('Risk scoring needs numpy; skipping.')
+        return
+    score_population()
+
+
+@task('notify_review')
+def notify_review(questionnaire_id):
+    """Tell the patient their questionnaire was reviewed. The feedback itself stays in the app."""
+    questionnaire = HealthQuestionnaire.objects.select_related('user').filter(pk=questionnaire_id).first()
+    if questionnaire is None or not questionnaire.user.email:
+        return
+    send_mail(
+        'Your health questionnaire has been reviewed',
+        f'Your questionnaire is now "{questionnaire.get_status_display()}". '
+        'Sign in to read your reviewer\'s feedback.',
+        None,
+        [questionnaire.user.email],
+    )
+
+
+@task('prerender_report')
+def prerender_report(questionnaire_id):
+    """Render an approved questionnaire's PDF report before the patient first asks for it."""
+    prerender(HealthQuestionnaire.objects.filter(pk=questionnaire_id))
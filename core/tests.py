@@ -1,3 +1,1639 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import unittest
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, IntegrityError, connection, connections, transaction
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import (
+    PersonalInfo, Lifestyle, MedicalHistory, FamilyHistory, Measurements,
+    Symptoms, PreventiveCare, HealthQuestionnaire, QuestionnaireSnapshot, RiskScore, RiskScoreRun,
+    AnalyticsCounter, Job, PrimaryPin
+)
+from .export import EXPORT_COLUMNS
+from . import authentication, cache_versions, frontend, jobs, metrics, password_hashing, questionnaire_cache, renderers, reports
+from .auth_serializers import ClaimsTokenObtainPairSerializer
+from .checks import check_cache_versions_are_shared
+from .questionnaire_writer import write_questionnaire
+from .snapshots import build_payload, find_drift, refresh_snapshots
+from .filters import _model_field
+from .flat_serializer import questionnaire_serializer
+from .views import HealthQuestionnaireViewSet
+from .db_router import PrimaryReplicaRouter
+from .analytics import dashboard
+from .reports import render_report
+from .risk_scoring import LOOKUPS, score_population, score_row, score_rows
+from .serializers import CompleteQuestionnaireSerializer
+
+
+COMPLETE_PAYLOAD = {
+    'age': 52, 'gender': 'male', 'contact': '555-0199',
+    'smoking_status': 'current', 'alcohol_consumption': 'weekly',
+    'physical_activity': 'none', 'diet': 'high salt',
+    'diabetes_medical': False, 'hypertension': True, 'heart_disease_medical': False,
+    'diabetes_family': True, 'heart_disease_family': True, 'cancer_family': False,
+    'height_cm': 180, 'weight_kg': 95, 'bmi': 29.3,
+    'blood_pressure': '150/95', 'blood_sugar': '110', 'cholesterol': '240',
+    'chest_pain': True, 'breathlessness': False, 'fatigue': True,
+    'sleep_quality': 'poor', 'stress_level': 'high',
+    'last_checkup': '2025-01-15', 'vaccinations': 'flu, covid',
+}
+
+
+def validated(payload):
+    serializer = CompleteQuestionnaireSerializer(data=payload)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+def make_questionnaire(username, status='pending'):
+    user = User.objects.create(username=username)
+    questionnaire = HealthQuestionnaire.objects.create(
+        user=user,
+        personal_info=PersonalInfo.objects.create(user=user, age=40, gender='female', contact='555-0100'),
+        lifestyle=Lifestyle.objects.create(
+            user=user, smoking_status='never', alcohol_consumption='none',
+            physical_activity='daily walks', diet='balanced',
+        ),
+        medical_history=MedicalHistory.objects.create(user=user, hypertension=True),
+        family_history=FamilyHistory.objects.create(user=user, diabetes=True),
+        measurements=Measurements.objects.create(
+            user=user, height_cm=170, weight_kg=70, bmi=24.2,
+            blood_pressure='120/80', blood_sugar='95', cholesterol='180',
+        ),
+        symptoms=Symptoms.objects.create(user=user, fatigue=True),
+        preventive_care=PreventiveCare.objects.create(user=user, vaccinations='flu'),
+        status=status,
+    )
+    with transaction.atomic():
+        refresh_snapshots([questionnaire])
+    return questionnaire
+
+
+def isolate_caches(test):
+    """
+    Start ``test`` with empty caches, the shared version counters in a
+    throwaway directory rather than the repository's ``cache/``.
+    """
+    versions = tempfile.TemporaryDirectory()
+    test.addCleanup(versions.cleanup)
+    test.enterContext(test.settings(CACHES={
+        **settings.CACHES,
+        cache_versions.CACHE_ALIAS: {**settings.CACHES[cache_versions.CACHE_ALIAS], 'LOCATION': versions.name},
+    }))
+    # Primary keys are reused between tests, so nothing cached by one may reach the next
+    caches[questionnaire_cache.CACHE_ALIAS].clear()
+    caches[authentication.CACHE_ALIAS].clear()
+
+
+class CoreAPITestCase(APITestCase):
+    def setUp(self):
+        isolate_caches(self)
+        questionnaire_cache.stats.reset()
+        report_cache = tempfile.TemporaryDirectory()
+        self.addCleanup(report_cache.cleanup)
+        self.enterContext(self.settings(REPORT_CACHE_DIR=report_cache.name))
+
+
+class QuestionnaireReadQueryCountTests(CoreAPITestCase):
+    """The questionnaire read path costs a fixed number of queries however many rows it returns."""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def assertConstantQueries(self, url, expected_rows):
+        make_questionnaire('patient-0')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for i in range(1, expected_rows):
+            make_questionnaire(f'patient-{i}')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), expected_rows)
+
+    def test_list_query_count_is_constant(self):
+        self.assertConstantQueries('/api/questionnaire/', 25)
+
+    def test_pending_query_count_is_constant(self):
+        self.assertConstantQueries('/api/questionnaire/pending/', 25)
+
+    def test_retrieve_uses_single_query(self):
+        questionnaire = make_questionnaire('patient')
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/questionnaire/{questionnaire.pk}/')
+        self.assertEqual(response.data['measurements']['blood_pressure'], '120/80')
+
+    def test_patient_only_sees_own_questionnaire(self):
+        own = make_questionnaire('patient')
+        make_questionnaire('someone-else')
+        self.client.force_authenticate(own.user)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/questionnaire/')
+        self.assertEqual([row['id'] for row in response.data['results']], [own.pk])
+
+
+class SubmitCompleteWriteTests(CoreAPITestCase):
+    url = '/api/questionnaire/submit_complete/'
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='patient')
+        self.client.force_authenticate(self.user)
+
+    def test_first_submission_creates_all_rows(self):
+        response = self.client.post(self.url, COMPLETE_PAYLOAD, format='json')
+        self.assertEqual(response.status_code, 201)
+        questionnaire = HealthQuestionnaire.objects.with_sections().get(user=self.user)
+        self.assertEqual(questionnaire.measurements.blood_pressure, '150/95')
+        self.assertTrue(questionnaire.symptoms.chest_pain)
+        self.assertTrue(questionnaire.family_history.heart_disease)
+
+    def test_identical_resubmission_only_reads(self):
+        write_questionnaire(self.user, validated(COMPLETE_PAYLOAD))
+        # SAVEPOINT, locking SELECT, RELEASE SAVEPOINT
+        with self.assertNumQueries(3):
+            write_questionnaire(self.user, validated(COMPLETE_PAYLOAD))
+
+    def test_resubmission_writes_only_changed_rows(self):
+        questionnaire = write_questionnaire(self.user, validated(COMPLETE_PAYLOAD))
+        HealthQuestionnaire.objects.filter(pk=questionnaire.pk).update(status='approved')
+        changed = dict(COMPLETE_PAYLOAD, blood_pressure='130/85', fatigue=False)
+        # SAVEPOINT, locking SELECT, 3 UPDATEs, snapshot SELECT + UPDATE,
+        # the fatigue counter UPDATE, RELEASE
+        with self.assertNumQueries(9) as ctx:
+            write_questionnaire(self.user, validated(changed))
+        updates = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('UPDATE')
+            and 'questionnairesnapshot' not in q['sql'] and 'analyticscounter' not in q['sql']
+        ]
+        self.assertEqual(len(updates), 3)
+        self.assertIn('"blood_pressure"', updates[0])
+        self.assertNotIn('"weight_kg"', updates[0])
+        questionnaire.refresh_from_db()
+        self.assertEqual(questionnaire.status, 'pending')
+
+    def test_failed_submission_leaves_no_partial_rows(self):
+        incomplete = dict(COMPLETE_PAYLOAD)
+        del incomplete['height_cm']
+        with self.assertRaises(IntegrityError):
+            write_questionnaire(self.user, validated(incomplete))
+        self.assertFalse(PersonalInfo.objects.filter(user=self.user).exists())
+        self.assertFalse(HealthQuestionnaire.objects.filter(user=self.user).exists())
+
+
+class SubmitCompleteConcurrencyTests(TransactionTestCase):
+    threads = 8
+
+    def test_parallel_resubmits_by_same_user(self):
+        user = User.objects.create(username='patient')
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def submit(i):
+            try:
+                barrier.wait()
+                write_questionnaire(user, validated(dict(COMPLETE_PAYLOAD, contact=f'555-01{i:02d}')))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=submit, args=(i,)) for i in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(HealthQuestionnaire.objects.filter(user=user).count(), 1)
+        self.assertEqual(PersonalInfo.objects.filter(user=user).count(), 1)
+        questionnaire = HealthQuestionnaire.objects.with_sections().get(user=user)
+        self.assertEqual(questionnaire.personal_info.user_id, user.pk)
+
+
+class BulkSubmitTests(CoreAPITestCase):
+    url = '/api/questionnaire/bulk_submit/'
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def post_ndjson(self, records, **params):
+        body = '\n'.join(json.dumps(record) for record in records) + '\n'
+        response = self.client.post(self.url, body, content_type='application/x-ndjson', QUERY_STRING=urlencode(params))
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        return sorted((json.loads(line) for line in lines), key=lambda result: result['line'])
+
+    def test_creates_and_updates_in_batches(self):
+        existing = make_questionnaire('existing', status='approved')
+        User.objects.create(username='new-patient')
+        results = self.post_ndjson([
+            dict(COMPLETE_PAYLOAD, username='new-patient'),
+            dict(COMPLETE_PAYLOAD, username='existing', blood_pressure='160/100'),
+        ])
+        self.assertEqual([r['status'] for r in results], ['created', 'updated'])
+        self.assertEqual(results[1]['id'], existing.pk)
+        existing.refresh_from_db()
+        self.assertEqual(existing.status, 'pending')
+        self.assertEqual(existing.measurements.blood_pressure, '160/100')
+        created = HealthQuestionnaire.objects.with_sections().get(user__username='new-patient')
+        self.assertEqual(created.personal_info.age, 52)
+        self.assertEqual(created.pk, results[0]['id'])
+
+    def test_reports_per_record_errors(self):
+        User.objects.create(username='patient')
+        body = [
+            dict(COMPLETE_PAYLOAD, username='nobody'),
+            dict(COMPLETE_PAYLOAD, username='patient', age='not a number'),
+            {key: value for key, value in COMPLETE_PAYLOAD.items() if key != 'height_cm'} | {'username': 'patient'},
+            {'age': 30},
+        ]
+        results = self.post_ndjson(body)
+        self.assertEqual([r['status'] for r in results], ['error'] * 4)
+        self.assertIn('username', results[0]['errors'])
+        self.assertIn('age', results[1]['errors'])
+        self.assertIn('height_cm', results[2]['errors'])
+        self.assertIn('username', results[3]['errors'])
+        self.assertFalse(HealthQuestionnaire.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+    def test_batches_queue_one_coalesced_scoring_run(self):
+        for username in ('first', 'second', 'third'):
+            User.objects.create(username=username)
+        self.post_ndjson([dict(COMPLETE_PAYLOAD, username=name) for name in ('first', 'second', 'third')], batch_size=1)
+        self.assertEqual(list(Job.objects.values_list('name', 'unique_key')), [('score_risk', 'incremental')])
+
+    def test_non_string_usernames_are_reported_per_record(self):
+        User.objects.create(username='patient')
+        results = self.post_ndjson([
+            dict(COMPLETE_PAYLOAD, username=['patient']),
+            dict(COMPLETE_PAYLOAD, username={'name': 'patient'}),
+            dict(COMPLETE_PAYLOAD, username='patient'),
+        ])
+        self.assertEqual([r['status'] for r in results], ['error', 'error', 'created'])
+        self.assertEqual(results[0]['errors'], {'username': ['Must be a string.']})
+
+    def test_duplicate_username_last_record_wins(self):
+        User.objects.create(username='patient')
+        results = self.post_ndjson([
+            dict(COMPLETE_PAYLOAD, username='patient', contact='first'),
+            dict(COMPLETE_PAYLOAD, username='patient', contact='second'),
+        ])
+        self.assertEqual([r['status'] for r in results], ['created', 'updated'])
+        self.assertEqual(PersonalInfo.objects.get(user__username='patient').contact, 'second')
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def run(prefix, count):
+            for i in range(count):
+                User.objects.create(username=f'{prefix}-{i}')
+            records = [dict(COMPLETE_PAYLOAD, username=f'{prefix}-{i}') for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual({r['status'] for r in self.post_ndjson(records)}, {'created'})
+            return len(ctx)
+
+        run('warm-up', 1)  # Creates the analytics counters the batches then update
+        self.assertEqual(run('small', 3), run('large', 30))
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(User.objects.create(username='patient'))
+        response = self.client.post(self.url, '{}', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 403)
+
+
+class CursorPaginationTests(CoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(self.admin)
+        self.questionnaires = [make_questionnaire(f'patient-{i}') for i in range(7)]
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            ids.extend(row['id'] for row in response.data['results'])
+            url, pages = response.data['next'], pages + 1
+        return ids, pages
+
+    def test_questionnaires_page_in_submission_order(self):
+        ids, pages = self.walk('/api/questionnaire/?page_size=3')
+        self.assertEqual(ids, [q.pk for q in self.questionnaires])
+        self.assertEqual(pages, 3)
+
+    def test_pending_is_paginated(self):
+        HealthQuestionnaire.objects.filter(pk=self.questionnaires[0].pk).update(status='approved')
+        ids, pages = self.walk('/api/questionnaire/pending/?page_size=2')
+        self.assertEqual(ids, [q.pk for q in self.questionnaires[1:]])
+        self.assertEqual(pages, 3)
+
+    def test_section_endpoints_are_paginated(self):
+        ids, _ = self.walk('/api/measurements/?page_size=4')
+        self.assertEqual(ids, [q.measurements_id for q in self.questionnaires])
+
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/symptoms/?page_size=100000')
+        self.assertEqual(len(response.data['results']), 7)
+        self.assertIsNone(response.data['next'])
+
+    def test_ordering_uses_keyset_index(self):
+        plan = HealthQuestionnaire.objects.order_by('submitted_at', 'id').explain()
+        self.assertIn('questionnaire_submitted_idx', plan)
+
+
+class ExportTests(CoreAPITestCase):
+    url = '/api/questionnaire/export/'
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(self.admin)
+        self.questionnaires = [make_questionnaire(f'patient-{i}') for i in range(5)]
+
+    def download(self, file_format):
+        response = self.client.get(self.url, {'file_format': file_format})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_has_flat_columns(self):
+        rows = list(csv.DictReader(io.StringIO(self.download('csv').decode())))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['id'], str(self.questionnaires[0].pk))
+        self.assertEqual(rows[0]['measurements__blood_pressure'], '120/80')
+        self.assertEqual(rows[0]['medical_history__hypertension'], 'True')
+
+    def test_ndjson(self):
+        rows = [json.loads(line) for line in self.download('ndjson').splitlines()]
+        self.assertEqual([row['id'] for row in rows], [q.pk for q in self.questionnaires])
+        self.assertEqual(set(rows[0]), set(EXPORT_COLUMNS))
+        self.assertEqual(rows[0]['personal_info__age'], 40)
+
+    def test_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise unittest.SkipTest('pyarrow is not installed')
+        table = pq.read_table(io.BytesIO(self.download('parquet')))
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.column('measurements__bmi').to_pylist(), [24.2] * 5)
+
+    def test_rows_are_read_in_chunks_with_one_join(self):
+        with CaptureQueriesContext(connection) as ctx:
+            content = self.download('ndjson')
+        self.assertEqual(len(content.splitlines()), 5)
+        self.assertEqual(len(ctx), 1)
+
+    def test_unknown_format(self):
+        response = self.client.get(self.url, {'file_format': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(self.questionnaires[0].user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as output:
+            call_command('export_questionnaires', '--format', 'csv', '--output', output.name, '--chunk-size', '2')
+            rows = list(csv.DictReader(io.StringIO(open(output.name).read())))
+        self.assertEqual(len(rows), 5)
+
+
+class SnapshotTests(CoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def test_submit_complete_writes_snapshot(self):
+        patient = User.objects.create(username='patient')
+        self.client.force_authenticate(patient)
+        self.client.post('/api/questionnaire/submit_complete/', COMPLETE_PAYLOAD, format='json')
+        questionnaire = HealthQuestionnaire.objects.get(user=patient)
+        self.assertEqual(questionnaire.snapshot.payload['measurements']['blood_pressure'], '150/95')
+        self.assertEqual(questionnaire.snapshot.version, 1)
+
+        self.client.post('/api/questionnaire/submit_complete/', dict(COMPLETE_PAYLOAD, age=53), format='json')
+        questionnaire.snapshot.refresh_from_db()
+        self.assertEqual(questionnaire.snapshot.payload['personal_info']['age'], 53)
+        self.assertEqual(questionnaire.snapshot.version, 2)
+
+    def test_reads_come_from_snapshot(self):
+        questionnaire = make_questionnaire('patient')
+        # Bypass every write path so only the snapshot still has the old value
+        Measurements.objects.filter(pk=questionnaire.measurements_id).update(blood_pressure='999/99')
+        response = self.client.get(f'/api/questionnaire/{questionnaire.pk}/')
+        self.assertEqual(response.data['measurements']['blood_pressure'], '120/80')
+        self.assertEqual(list(find_drift()), [(questionnaire.pk, 'stale')])
+
+    def test_missing_snapshot_falls_back_to_sections(self):
+        questionnaire = make_questionnaire('patient')
+        questionnaire.snapshot.delete()
+        response = self.client.get('/api/questionnaire/')
+        self.assertEqual(response.data['results'][0]['measurements']['blood_pressure'], '120/80')
+
+    def test_missing_snapshots_are_filled_in_with_one_query(self):
+        questionnaires = [make_questionnaire(f'patient-{i}') for i in range(5)]
+        expected = {q.pk: q.snapshot.payload for q in questionnaires}
+        QuestionnaireSnapshot.objects.filter(pk__in=[q.pk for q in questionnaires[1:]]).delete()
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/questionnaire/')
+        self.assertEqual({row['id']: row for row in response.data['results']}, expected)
+
+    def test_flat_serializer_matches_the_nested_serializer(self):
+        questionnaire = make_questionnaire('patient')
+        PreventiveCare.objects.filter(pk=questionnaire.preventive_care_id).update(last_checkup='2024-03-01')
+        questionnaire = HealthQuestionnaire.objects.with_sections().get()
+        flat = questionnaire_serializer()
+        payloads = flat.payloads(HealthQuestionnaire.objects.all())
+        self.assertEqual(json.dumps(payloads), json.dumps([build_payload(questionnaire)]))
+        self.assertEqual(payloads[0]['preventive_care']['last_checkup'], '2024-03-01')
+
+    def test_review_updates_snapshot(self):
+        questionnaire = make_questionnaire('patient')
+        self.client.post(
+            f'/api/questionnaire/{questionnaire.pk}/review/',
+            {'status': 'approved', 'admin_feedback': 'All clear'}, format='json',
+        )
+        questionnaire.snapshot.refresh_from_db()
+        self.assertEqual(questionnaire.snapshot.payload['status'], 'approved')
+        self.assertEqual(questionnaire.snapshot.payload['admin_feedback'], 'All clear')
+
+    def test_section_update_refreshes_snapshot(self):
+        questionnaire = make_questionnaire('patient')
+        self.client.patch(f'/api/symptoms/{questionnaire.symptoms_id}/', {'chest_pain': True}, format='json')
+        questionnaire.snapshot.refresh_from_db()
+        self.assertTrue(questionnaire.snapshot.payload['symptoms']['chest_pain'])
+
+    def test_check_and_rebuild_commands(self):
+        drifted = make_questionnaire('drifted')
+        missing = make_questionnaire('missing')
+        make_questionnaire('fine')
+        Symptoms.objects.filter(pk=drifted.symptoms_id).update(chest_pain=True)
+        missing.snapshot.delete()
+
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_snapshots', stdout=out)
+        self.assertIn(f'questionnaire {drifted.pk}: stale', out.getvalue())
+        self.assertIn(f'questionnaire {missing.pk}: missing', out.getvalue())
+
+        call_command('rebuild_snapshots', '--drifted-only', stdout=io.StringIO())
+        self.assertEqual(list(find_drift()), [])
+        call_command('check_snapshots', stdout=io.StringIO())
+
+
+class QuestionnaireCacheTests(CoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.questionnaire = make_questionnaire('patient')
+        self.client.force_authenticate(self.questionnaire.user)
+
+    def get_own(self):
+        return self.client.get('/api/questionnaire/').data['results'][0]
+
+    def test_repeat_reads_are_served_without_queries(self):
+        self.get_own()
+        with self.assertNumQueries(0):
+            payload = self.get_own()
+            response = self.client.get(f'/api/questionnaire/{self.questionnaire.pk}/')
+        self.assertEqual(payload, response.data)
+        self.assertEqual(questionnaire_cache.stats.as_dict()['hits'], 2)
+        self.assertEqual(questionnaire_cache.stats.as_dict()['misses'], 1)
+
+    def test_retrieve_of_other_id_is_not_served_from_cache(self):
+        other = make_questionnaire('other')
+        self.get_own()
+        self.assertEqual(self.client.get(f'/api/questionnaire/{other.pk}/').status_code, 404)
+
+    def test_submit_complete_invalidates(self):
+        self.get_own()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/questionnaire/submit_complete/', COMPLETE_PAYLOAD, format='json')
+        self.assertEqual(self.get_own()['measurements']['blood_pressure'], '150/95')
+
+    def test_review_invalidates(self):
+        self.get_own()
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/questionnaire/{self.questionnaire.pk}/review/', {'status': 'approved'})
+        self.client.force_authenticate(self.questionnaire.user)
+        self.assertEqual(self.get_own()['status'], 'approved')
+
+    def test_section_writes_invalidate(self):
+        self.get_own()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/lifestyle/{self.questionnaire.lifestyle_id}/', {'smoking_status': 'current'})
+        self.assertEqual(self.get_own()['lifestyle']['smoking_status'], 'current')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/lifestyle/{self.questionnaire.lifestyle_id}/')
+        self.assertEqual(self.client.get('/api/questionnaire/').data['results'], [])
+
+    def test_uncommitted_write_does_not_invalidate(self):
+        self.get_own()
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post('/api/questionnaire/submit_complete/', COMPLETE_PAYLOAD, format='json')
+        self.assertEqual(questionnaire_cache.stats.as_dict()['invalidations'], 0)
+
+    def test_cache_stats_endpoint(self):
+        self.get_own()
+        self.get_own()
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        response = self.client.get('/api/questionnaire/cache_stats/')
+        self.assertEqual(response.data, {'hits': 1, 'misses': 1, 'invalidations': 0, 'hit_rate': 0.5})
+
+    def test_per_process_versions_are_flagged(self):
+        self.assertEqual(check_cache_versions_are_shared(None), [])
+        with self.settings(CACHES={
+            **settings.CACHES,
+            cache_versions.CACHE_ALIAS: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }):
+            self.assertEqual([w.id for w in check_cache_versions_are_shared(None)], ['core.W001'])
+
+    def test_versions_are_shared_between_processes(self):
+        self.get_own()
+        # Another worker: its own entries, the same version counters
+        with self.settings(CACHES={
+            **settings.CACHES,
+            questionnaire_cache.CACHE_ALIAS: {**settings.CACHES[questionnaire_cache.CACHE_ALIAS], 'LOCATION': 'other-worker'},
+        }):
+            self.get_own()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(f'/api/lifestyle/{self.questionnaire.lifestyle_id}/', {'smoking_status': 'current'})
+        # The write in the other worker orphaned this one's entry
+        self.assertEqual(self.get_own()['lifestyle']['smoking_status'], 'current')
+
+    def test_evicts_least_recently_used(self):
+        # The configured backend, only smaller
+        configured = settings.CACHES[questionnaire_cache.CACHE_ALIAS]
+        with self.settings(CACHES={
+            **settings.CACHES,
+            questionnaire_cache.CACHE_ALIAS: {
+                **configured, 'LOCATION': 'lru-test', 'OPTIONS': {'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 4},
+            },
+        }):
+            for user_id in range(1, 5):
+                questionnaire_cache.get_payload(user_id, lambda: {'id': user_id})
+            questionnaire_cache.get_payload(1, lambda: self.fail('user 1 was cached'))
+            questionnaire_cache.get_payload(5, lambda: {'id': 5})
+            self.assertLessEqual(len(caches[questionnaire_cache.CACHE_ALIAS]._cache), 4)
+            # User 2 was least recently used; user 1, read again, was not
+            questionnaire_cache.get_payload(1, lambda: self.fail('user 1 was evicted'))
+            loaded = []
+            questionnaire_cache.get_payload(2, lambda: loaded.append(2))
+            self.assertEqual(loaded, [2])
+
+
+class ConditionalGetTests(CoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(self.admin)
+        self.questionnaire = make_questionnaire('patient')
+
+    def assertNotModified(self, url, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        # Only the narrow validator columns were read
+        self.assertEqual(len(ctx), 1)
+        self.assertNotIn('payload', ctx[0]['sql'])
+        return response
+
+    def test_list_etag_round_trip(self):
+        url = '/api/questionnaire/'
+        response = self.client.get(url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertNotModified(url, if_none_match=response['ETag'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/questionnaire/{self.questionnaire.pk}/review/', {'status': 'approved'})
+        changed = self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_pending_and_retrieve(self):
+        for url in ('/api/questionnaire/pending/', f'/api/questionnaire/{self.questionnaire.pk}/'):
+            etag = self.client.get(url)['ETag']
+            self.assertNotModified(url, if_none_match=etag)
+
+    def test_rows_past_a_full_page_change_its_etag(self):
+        url = '/api/questionnaire/pending/?page_size=1'
+        response = self.client.get(url)
+        self.assertIsNone(response.data['next'])
+        make_questionnaire('later')
+        # The same rows on the page, but it gains a next link
+        changed = self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertIsNotNone(changed.data['next'])
+        self.assertNotModified(url, if_none_match=changed['ETag'])
+
+    def test_missing_row_still_404s(self):
+        response = self.client.get('/api/questionnaire/999/', headers={'if-none-match': '"abc"'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_section_endpoints(self):
+        url = f'/api/measurements/{self.questionnaire.measurements_id}/'
+        first = self.client.get(url)
+        self.assertNotModified(url, if_modified_since=first['Last-Modified'])
+        self.assertNotModified('/api/measurements/', if_none_match=self.client.get('/api/measurements/')['ETag'])
+
+        self.client.patch(url, {'blood_sugar': '130'})
+        changed = self.client.get(url, headers={'if-none-match': first['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data['blood_sugar'], '130')
+
+    def test_patient_cached_path_sets_validators(self):
+        self.client.force_authenticate(self.questionnaire.user)
+        first = self.client.get('/api/questionnaire/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/questionnaire/')
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertNotModified('/api/questionnaire/', if_none_match=first['ETag'])
+
+    def test_etag_differs_per_user(self):
+        make_questionnaire('other')
+        staff_etag = self.client.get('/api/questionnaire/')['ETag']
+        self.client.force_authenticate(self.questionnaire.user)
+        patient = self.client.get('/api/questionnaire/', headers={'if-none-match': staff_etag})
+        self.assertEqual(patient.status_code, 200)
+        self.assertEqual(len(patient.data['results']), 1)
+
+
+class BulkReviewTests(CoreAPITestCase):
+    url = '/api/questionnaire/bulk_review/'
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def test_reviews_many_in_one_update(self):
+        questionnaires = [make_questionnaire(f'patient-{i}') for i in range(20)]
+        ids = [q.pk for q in questionnaires] + [999999]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {'ids': ids, 'status': 'approved', 'admin_feedback': 'OK'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 20)
+        self.assertEqual(response.data['results'][-1], {'id': 999999, 'result': 'not_found'})
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "core_healthquestionnaire"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(HealthQuestionnaire.objects.filter(status='approved', admin_feedback='OK').count(), 20)
+        self.assertEqual(QuestionnaireSnapshot.objects.filter(payload__status='approved').count(), 20)
+
+    def test_query_count_is_independent_of_batch_size(self):
+        def run(prefix, count):
+            ids = [make_questionnaire(f'{prefix}-{i}').pk for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(self.url, {'ids': ids}, format='json')
+            return len(ctx)
+        run('warm-up', 1)  # Creates the analytics counters the batches then update
+        self.assertEqual(run('small', 2), run('large', 40))
+
+    def test_rejects_unknown_status(self):
+        response = self.client.post(self.url, {'ids': [1], 'status': 'lost'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(User.objects.create(username='patient'))
+        self.assertEqual(self.client.post(self.url, {'ids': [1]}, format='json').status_code, 403)
+
+
+class RiskScoringTests(CoreAPITestCase):
+    def test_vectorized_scores_match_row_by_row(self):
+        make_questionnaire('healthy')
+        make_questionnaire('at-risk')
+        Measurements.objects.filter(user__username='at-risk').update(
+            bmi=31.5, systolic=165, diastolic=100, glucose=140, total_cholesterol=None,
+        )
+        Lifestyle.objects.filter(user__username='at-risk').update(smoking_status='current')
+        Symptoms.objects.filter(user__username='healthy').delete()
+        rows = list(Measurements.objects.order_by('user_id').values_list(*LOOKUPS))
+
+        user_ids, cardiovascular, diabetes = score_rows(rows)
+
+        for row, cardio, diabetic in zip(rows, cardiovascular, diabetes):
+            _, expected_cardio, expected_diabetic = score_row(row)
+            self.assertAlmostEqual(cardio, expected_cardio)
+            self.assertAlmostEqual(diabetic, expected_diabetic)
+        self.assertGreater(cardiovascular[1], cardiovascular[0])
+
+    def test_diagnosed_diabetes_scores_one(self):
+        questionnaire = make_questionnaire('diabetic')
+        MedicalHistory.objects.filter(user=questionnaire.user).update(diabetes=True)
+        score_population()
+        self.assertEqual(RiskScore.objects.get(user=questionnaire.user).diabetes, 1.0)
+
+    def test_incremental_run_rescores_only_changed_users(self):
+        users = [make_questionnaire(f'patient{i}').user for i in range(3)]
+        first = score_population()
+        self.assertEqual((first.full, first.scored), (True, 3))
+
+        # Move the first run and every save well outside the look-back window
+        long_ago = first.started_at - timedelta(hours=1)
+        RiskScoreRun.objects.filter(pk=first.pk).update(started_at=long_ago + timedelta(minutes=30))
+        for model in (Measurements, Symptoms, MedicalHistory, FamilyHistory, Lifestyle):
+            model.objects.update(updated_at=long_ago)
+        before = RiskScore.objects.get(user=users[1]).cardiovascular
+        symptoms = Symptoms.objects.get(user=users[1])
+        symptoms.chest_pain = True
+        symptoms.save()
+
+        with self.assertNumQueries(10):
+            second = score_population()
+
+        self.assertEqual((second.full, second.scored), (False, 1))
+        self.assertGreater(RiskScore.objects.get(user=users[1]).cardiovascular, before)
+        self.assertEqual(score_population(full=True).scored, 3)
+
+
+class MeasurementVitalsTests(CoreAPITestCase):
+    def test_readings_are_parsed_and_bmi_computed_on_save(self):
+        questionnaire = make_questionnaire('patient')
+        measurements = questionnaire.measurements
+        self.assertEqual(
+            (measurements.systolic, measurements.diastolic, measurements.glucose, measurements.total_cholesterol),
+            (120, 80, 95, 180),
+        )
+        measurements.blood_pressure = 'n/a'
+        measurements.weight_kg = 80
+        measurements.save(update_fields=['blood_pressure', 'weight_kg'])
+        measurements.refresh_from_db()
+        self.assertEqual((measurements.systolic, measurements.diastolic, measurements.bmi), (None, None, 27.7))
+
+    def test_submitted_bmi_is_ignored(self):
+        user = User.objects.create(username='patient')
+        write_questionnaire(user, validated(dict(COMPLETE_PAYLOAD, bmi=12.0)))
+        self.assertEqual(Measurements.objects.get(user=user).bmi, 29.3)
+
+    def test_bulk_submit_derives_vitals(self):
+        User.objects.create(username='bulk')
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        body = json.dumps(dict(COMPLETE_PAYLOAD, username='bulk', blood_sugar='126 mg/dL')) + '\n'
+        b''.join(self.client.post(
+            '/api/questionnaire/bulk_submit/', body, content_type='application/x-ndjson'
+        ).streaming_content)
+        measurements = Measurements.objects.get(user__username='bulk')
+        self.assertEqual((measurements.systolic, measurements.glucose, measurements.bmi), (150, 126, 29.3))
+
+    def test_range_filters(self):
+        for username, blood_pressure in (('normal', '118/76'), ('stage1', '135/85'), ('stage2', '150/95')):
+            questionnaire = make_questionnaire(username)
+            questionnaire.measurements.blood_pressure = blood_pressure
+            questionnaire.measurements.save()
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+
+        response = self.client.get('/api/measurements/', {'systolic__gte': 130, 'diastolic__lt': 95})
+
+        self.assertEqual([row['blood_pressure'] for row in response.data['results']], ['135/85'])
+        response = self.client.get('/api/measurements/', {'glucose__gt': 'high'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('glucose__gt', response.data)
+
+    def test_range_filter_uses_index(self):
+        plan = Measurements.objects.filter(systolic__gte=140).explain()
+        self.assertIn('USING INDEX', plan)
+        self.assertIn('systolic', plan)
+
+
+class AnalyticsTests(CoreAPITestCase):
+    url = '/api/questionnaire/analytics/'
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def get(self):
+        with self.assertNumQueries(1):
+            return self.client.get(self.url).data
+
+    def test_counters_follow_submissions_reviews_and_deletes(self):
+        first, second = make_questionnaire('first'), make_questionnaire('second')
+        patient = User.objects.create(username='patient')
+        self.client.force_authenticate(patient)
+        self.client.post('/api/questionnaire/submit_complete/', COMPLETE_PAYLOAD, format='json')
+        self.client.force_authenticate(self.admin)
+        self.client.post(f'/api/questionnaire/{first.pk}/review/', {'status': 'approved'}, format='json')
+
+        data = self.get()
+        self.assertEqual(data['questionnaires'], 3)
+        self.assertEqual(data['by_status'], {'approved': 1, 'pending': 2})
+        self.assertEqual(data['smoking_status'], {'current': 1, 'never': 2})
+        self.assertEqual(data['average_bmi'], round((24.2 * 2 + 29.3) / 3, 2))
+        self.assertEqual(data['medical']['hypertension'], {'count': 3, 'rate': 1.0})
+        self.assertEqual(data['family']['heart_disease']['count'], 1)
+        self.assertEqual(data['symptom']['chest_pain']['count'], 1)
+
+        second.measurements.delete()  # Cascades to the questionnaire and its snapshot
+        data = self.get()
+        self.assertEqual((data['questionnaires'], data['by_status']), (2, {'approved': 1, 'pending': 1}))
+
+    def test_patch_refreshes_snapshot_and_counters(self):
+        questionnaire = make_questionnaire('patient')
+        url = f'/api/questionnaire/{questionnaire.pk}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.patch(url, {'status': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['status'], 'approved')
+        self.assertNotEqual(response['ETag'], etag)
+        questionnaire.snapshot.refresh_from_db()
+        self.assertEqual((questionnaire.snapshot.version, questionnaire.snapshot.payload['status']), (2, 'approved'))
+        self.assertEqual(self.get()['by_status'], {'approved': 1})
+
+    def test_recompute_matches_incremental_counters(self):
+        for i in range(3):
+            make_questionnaire(f'patient-{i}')
+        review_ids = list(HealthQuestionnaire.objects.values_list('pk', flat=True)[:2])
+        self.client.post('/api/questionnaire/bulk_review/', {'ids': review_ids, 'status': 'approved'}, format='json')
+        incremental = dashboard()
+
+        AnalyticsCounter.objects.update(count=0, total=0)
+        call_command('recompute_analytics', stdout=io.StringIO())
+
+        self.assertEqual(dashboard(), incremental)
+        self.assertEqual(incremental['by_status'], {'approved': 2, 'pending': 1})
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(User.objects.create(username='patient'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class AdminQueueFilterTests(CoreAPITestCase):
+    url = '/api/questionnaire/'
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def ids(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['id'] for row in response.data['results']]
+
+    def test_filters_and_ordering(self):
+        calm, chest_pain, approved = (make_questionnaire(name) for name in ('calm', 'chest-pain', 'approved'))
+        Symptoms.objects.filter(pk=chest_pain.symptoms_id).update(chest_pain=True)
+        HealthQuestionnaire.objects.filter(pk=approved.pk).update(status='approved')
+        measurements = chest_pain.measurements
+        measurements.blood_pressure = '160/100'
+        measurements.save()
+
+        self.assertEqual(self.ids({'chest_pain': 'true'}), [chest_pain.pk])
+        self.assertEqual(self.ids({'status': 'pending', 'ordering': '-submitted_at'}), [chest_pain.pk, calm.pk])
+        self.assertEqual(self.ids({'systolic__gte': 140, 'smoking_status': 'never'}), [chest_pain.pk])
+        self.assertEqual(self.ids({'submitted_at__gte': '2000-01-01', 'submitted_at__lt': '2000-01-02'}), [])
+        pending = self.client.get('/api/questionnaire/pending/', {'chest_pain': 'false'}).data['results']
+        self.assertEqual([row['id'] for row in pending], [calm.pk])
+
+    def test_rejects_malformed_filters(self):
+        for params in ({'chest_pain': 'maybe'}, {'submitted_at__gte': 'yesterday'}, {'ordering': 'status'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'Reads SQLite query plans')
+    def test_every_filter_is_served_by_an_index(self):
+        questionnaires = [make_questionnaire(f'patient-{i}') for i in range(40)]
+        flagged = [q.pk for q in questionnaires[:2]]
+        Symptoms.objects.filter(healthquestionnaire__in=flagged).update(chest_pain=True, breathlessness=True, fatigue=True)
+        MedicalHistory.objects.filter(healthquestionnaire__in=flagged).update(diabetes=True, heart_disease=True)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        view = HealthQuestionnaireViewSet
+        paths = {**view.exact_filter_fields, **view.range_filter_fields}
+        fields = {name: _model_field(HealthQuestionnaire, path) for name, path in paths.items()}
+        flags = [name for name in view.exact_filter_fields if fields[name].get_internal_type() == 'BooleanField']
+        params = [(name, value) for name in flags for value in ('true', 'false')]
+        params += [('status', 'pending'), ('smoking_status', 'never'), ('submitted_at__gte', '2000-01-01')]
+        params += [(f'{name}__gte', 1) for name in view.range_filter_fields if name != 'submitted_at']
+        for param, value in params:
+            with self.subTest(param=param, value=value), CaptureQueriesContext(connection) as ctx:
+                self.ids({param: value})
+                sql = next(q['sql'] for q in ctx.captured_queries if 'core_questionnairesnapshot' in q['sql'])
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                    plan = [row[-1] for row in cursor.fetchall()]
+                self.assertFalse([step for step in plan if step.startswith('SCAN') and 'INDEX' not in step], plan)
+                # The filtered column's index is searched on its own, not probed (column=? AND rowid=?)
+                # for each row a scan of the questionnaires turns up
+                column = fields[param.removesuffix('__gte')].column
+                self.assertTrue([step for step in plan if re.match(rf'SEARCH .*\({column}[=>]\?\)$', step)], plan)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReadReplicaRoutingTests(APITransactionTestCase):
+    """Primary and replica are separate SQLite files, so a routed read sees only the replica's rows."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Configured here rather than in settings, so the test runner does not create it
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = dict(
+            connections.settings['default'], NAME=os.path.join(cls.replica_dir.name, 'replica.sqlite3'),
+        )
+        cls.databases = {'default', 'replica'}
+        call_command('migrate', database='replica', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.databases = {'default'}
+        cls.replica_dir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        isolate_caches(self)
+        self.questionnaire = make_questionnaire('patient')  # On the primary only
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def list_ids(self, url='/api/questionnaire/'):
+        return [row['id'] for row in self.client.get(url).data['results']]
+
+    def test_list_and_retrieve_read_the_replica(self):
+        self.assertEqual(self.list_ids(), [])
+        self.assertEqual(self.list_ids('/api/measurements/'), [])
+        self.assertEqual(self.client.get(f'/api/questionnaire/{self.questionnaire.pk}/').status_code, 404)
+
+    def test_writes_pin_the_users_later_reads_to_the_primary(self):
+        self.client.post(f'/api/questionnaire/{self.questionnaire.pk}/review/', {'status': 'approved'}, format='json')
+        self.assertEqual(self.list_ids(), [self.questionnaire.pk])
+        # Kept in the database, so a worker that did not serve the write sees the pin too
+        self.assertTrue(PrimaryPin.objects.filter(user_id=self.admin.pk).exists())
+        caches['default'].clear()
+        self.assertEqual(self.list_ids(), [self.questionnaire.pk])
+
+        # Other users are not pinned
+        self.client.force_authenticate(User.objects.create(username='other-admin', is_staff=True))
+        self.assertEqual(self.list_ids(), [])
+
+    def test_patient_cache_is_filled_from_the_primary(self):
+        # Unpinned, the patient would read the lagging replica; their cached payload must not
+        self.client.force_authenticate(self.questionnaire.user)
+        self.assertEqual(self.list_ids(), [self.questionnaire.pk])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_reads_the_primary(self):
+        self.assertEqual(self.list_ids(), [self.questionnaire.pk])
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertIsNone(PrimaryReplicaRouter().db_for_read(HealthQuestionnaire))
+        self.assertEqual(HealthQuestionnaire.objects.count(), 1)
+
+
+class AsyncReadEndpointTests(CoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.questionnaires = [make_questionnaire(f'patient-{i}') for i in range(5)]
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.async_client = AsyncClient()
+
+    async def get(self, user, path, data=None):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'} if user else {}
+        return await self.async_client.get(path, data, headers=headers)
+
+    async def walk(self, path, params):
+        results, pages = [], 0
+        while path:
+            response = await self.get(self.admin, path, params)
+            self.assertEqual(response.status_code, 200, response.content)
+            data = response.json()
+            results += data['results']
+            path, params, pages = data['next'], None, pages + 1
+        return results, pages
+
+    async def test_list_matches_the_sync_endpoint(self):
+        self.client.force_authenticate(self.admin)
+        for ordering in ('submitted_at', '-submitted_at'):
+            expected = (await sync_to_async(self.client.get)('/api/questionnaire/', {'ordering': ordering})).json()
+            results, pages = await self.walk('/api/async/questionnaire/', {'ordering': ordering, 'page_size': 2})
+            self.assertEqual((results, pages), (expected['results'], 3))
+
+    def test_list_page_costs_two_queries(self):
+        with self.assertNumQueries(2):  # The token's user, then the page with its snapshots
+            response = async_to_sync(self.get)(self.admin, '/api/async/questionnaire/pending/')
+        self.assertEqual(len(response.json()['results']), 5)
+
+    async def test_patients_see_only_their_own_questionnaire(self):
+        own, other = self.questionnaires[0], self.questionnaires[1]
+        results = (await self.get(own.user, '/api/async/questionnaire/')).json()['results']
+        self.assertEqual([row['id'] for row in results], [own.pk])
+        self.assertEqual((await self.get(own.user, f'/api/async/questionnaire/{own.pk}/')).status_code, 200)
+        self.assertEqual((await self.get(own.user, f'/api/async/questionnaire/{other.pk}/')).status_code, 404)
+        self.assertEqual((await self.get(own.user, '/api/async/questionnaire/pending/')).status_code, 403)
+        self.assertEqual((await self.get(None, '/api/async/questionnaire/')).status_code, 401)
+
+    async def test_section_reads_and_filters(self):
+        measurements = self.questionnaires[0].measurements
+        measurements.blood_pressure = '150/95'
+        await measurements.asave()
+
+        response = await self.get(self.admin, '/api/async/measurements/', {'systolic__gte': 140})
+        self.assertEqual([row['id'] for row in response.json()['results']], [measurements.pk])
+        response = await self.get(self.admin, f'/api/async/measurements/{measurements.pk}/')
+        self.assertEqual(response.json()['blood_pressure'], '150/95')
+        response = await self.get(self.admin, '/api/async/measurements/', {'systolic__gte': 'high'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_malformed_cursor_is_rejected(self):
+        # Not JSON, not a list, not scalars, not one value per ordering field
+        decoded = ('not json', '5', '{"a": 1}', '[[1], 2]', '[1]')
+        for cursor in [base64.urlsafe_b64encode(value.encode()).decode() for value in decoded]:
+            response = await self.get(self.admin, '/api/async/questionnaire/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, base64.urlsafe_b64decode(cursor))
+
+
+class CachedAuthenticationTests(CoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.questionnaire = make_questionnaire('patient')
+        self.user = self.questionnaire.user
+
+    def use_token(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def issued_earlier(self, user):
+        token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        token['iat'] = int(time.time()) - 10
+        token[authentication.ISSUED_AT_MS_CLAIM] = token['iat'] * 1000
+        return token
+
+    def user_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [query['sql'] for query in queries if 'FROM "auth_user"' in query['sql']]
+
+    def test_user_is_loaded_once_per_token_holder(self):
+        self.use_token(AccessToken.for_user(self.user))
+        self.assertEqual(len(self.user_queries('/api/questionnaire/')), 1)
+        self.assertEqual(self.user_queries('/api/questionnaire/'), [])
+        self.assertEqual(self.user_queries(f'/api/measurements/{self.questionnaire.measurements_id}/'), [])
+
+    def test_deactivation_and_password_change_reach_the_cache(self):
+        self.use_token(AccessToken.for_user(self.user))
+        self.assertEqual(self.client.get('/api/questionnaire/').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('a new password')
+            self.user.save()
+        self.assertEqual(len(self.user_queries('/api/questionnaire/')), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.client.get('/api/questionnaire/').status_code, 401)
+
+    def test_deactivation_in_another_process_reaches_the_cache(self):
+        self.use_token(AccessToken.for_user(self.user))
+        self.assertEqual(self.client.get('/api/questionnaire/').status_code, 200)
+        # Another worker: its own entries, the same version counters
+        with self.settings(CACHES={
+            **settings.CACHES,
+            authentication.CACHE_ALIAS: {**settings.CACHES[authentication.CACHE_ALIAS], 'LOCATION': 'other-worker'},
+        }):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.is_active = False
+                self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.client.get('/api/questionnaire/').status_code, 401)
+
+    @override_settings(JWT_CLAIMS_ONLY_READS=True)
+    def test_claims_only_reads_skip_the_user_row(self):
+        admin = User.objects.create(username='admin', is_staff=True)
+        self.use_token(self.issued_earlier(admin))
+        self.assertEqual(self.user_queries('/api/questionnaire/pending/'), [])
+
+        self.use_token(self.issued_earlier(self.user))
+        self.assertEqual(self.user_queries('/api/questionnaire/'), [])
+        self.assertEqual(self.client.get('/api/questionnaire/pending/').status_code, 403)
+        # Writes still authenticate against the user row
+        response = self.client.post('/api/questionnaire/submit_complete/', COMPLETE_PAYLOAD, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    @override_settings(JWT_CLAIMS_ONLY_READS=True)
+    def test_claims_only_tokens_are_revoked_by_account_changes(self):
+        token = self.issued_earlier(self.user)
+        self.use_token(token)
+        self.assertEqual(self.client.get('/api/questionnaire/').status_code, 200)
+
+        self.user.last_name = 'Renamed'
+        self.user.save(update_fields=['last_name'])
+        self.assertEqual(self.client.get('/api/questionnaire/').status_code, 200)
+
+        self.user.set_password('a new password')
+        self.user.save()
+        self.assertEqual(self.client.get('/api/questionnaire/').status_code, 401)
+        # Kept in the database: another worker's cache, or an evicted entry, does not let it through
+        caches[authentication.CACHE_ALIAS].clear()
+        self.assertEqual(self.client.get('/api/questionnaire/').status_code, 401)
+        # A token issued after the change is accepted
+        self.use_token(ClaimsTokenObtainPairSerializer.get_token(self.user).access_token)
+        self.assertEqual(self.client.get('/api/questionnaire/').status_code, 200)
+
+    @override_settings(JWT_CLAIMS_ONLY_READS=True)
+    def test_revocation_covers_tokens_of_the_same_second(self):
+        self.user.set_password('a new password')
+        self.user.save()
+        revoked = authentication.revoked_at(self.user.id)
+
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        token['iat'], token[authentication.ISSUED_AT_MS_CLAIM] = revoked // 1000, revoked - 1
+        self.use_token(token)
+        self.assertEqual(self.client.get('/api/questionnaire/').status_code, 401)
+        # Without milliseconds, a token of the revocation's second may predate it
+        token = AccessToken.for_user(self.user)
+        token['iat'] = revoked // 1000
+        self.use_token(token)
+        self.assertEqual(self.client.get('/api/questionnaire/').status_code, 401)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_MAX_PENDING=1, PASSWORD_HASHING_WAIT_SECONDS=0,
+)
+class PasswordHashingPoolTests(CoreAPITestCase):
+    REGISTRATION = {
+        'username': 'new-patient', 'email': 'new@example.com',
+        'password': 'a long passphrase', 'password2': 'a long passphrase',
+    }
+
+    def login(self, password):
+        return self.client.post('/api/auth/login/', {'username': 'new-patient', 'password': password}, format='json')
+
+    def test_register_and_login_hash_on_the_pool(self):
+        response = self.client.post('/api/auth/register/', self.REGISTRATION, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(User.objects.get(username='new-patient').password.startswith('md5$'))
+        self.assertTrue(password_hashing.pool.started)
+
+        self.assertEqual(self.login('a long passphrase').status_code, 200)
+        self.assertEqual(self.login('the wrong passphrase').status_code, 401)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.MD5PasswordHasher', 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    ])
+    def test_outdated_hashes_are_upgraded_at_login(self):
+        outdated = PBKDF2PasswordHasher().encode('a long passphrase', 'salt', iterations=1000)
+        User.objects.create(username='new-patient', password=outdated)
+        self.assertEqual(self.login('a long passphrase').status_code, 200)
+        self.assertTrue(User.objects.get(username='new-patient').password.startswith('md5$'))
+
+    def test_requests_beyond_the_pending_limit_are_turned_away(self):
+        _, slots = password_hashing.pool.start()
+        slots.acquire()
+        try:
+            response = self.client.post('/api/auth/register/', self.REGISTRATION, format='json')
+        finally:
+            slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertFalse(User.objects.filter(username='new-patient').exists())
+
+
+class JobQueueTests(CoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        jobs.registry['test_job'] = lambda **payload: self.calls.append(payload)
+        jobs.registry['failing_job'] = self.fail_job
+        self.addCleanup(jobs.registry.pop, 'test_job')
+        self.addCleanup(jobs.registry.pop, 'failing_job')
+
+    def fail_job(self):
+        raise RuntimeError('downstream unavailable')
+
+    def test_submissions_queue_one_coalesced_scoring_run(self):
+        for username in ('first', 'second'):
+            self.client.force_authenticate(User.objects.create(username=username))
+            response = self.client.post('/api/questionnaire/submit_complete/', COMPLETE_PAYLOAD, format='json')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(Job.objects.values_list('name', 'status')), [('score_risk', 'queued')])
+
+        call_command('run_jobs', '--once', stdout=io.StringIO())
+        self.assertEqual(Job.objects.get().status, 'done')
+        self.assertEqual(RiskScore.objects.count(), 2)
+
+    def test_submission_and_its_scoring_job_commit_together(self):
+        self.client.force_authenticate(User.objects.create(username='patient'))
+        with mock.patch.object(jobs, 'enqueue', side_effect=DatabaseError('queue unavailable')):
+            with self.assertRaises(DatabaseError):
+                self.client.post('/api/questionnaire/submit_complete/', COMPLETE_PAYLOAD, format='json')
+        self.assertFalse(HealthQuestionnaire.objects.exists())
+
+    def test_old_finished_jobs_are_pruned(self):
+        jobs.enqueue_many('test_job', [{} for _ in range(4)])
+        old = timezone.now() - settings.JOB_RETENTION - timedelta(minutes=1)
+        done, failed, recent, queued = Job.objects.order_by('id')
+        Job.objects.filter(pk=done.pk).update(status='done', finished_at=old)
+        Job.objects.filter(pk=failed.pk).update(status='failed', finished_at=old)
+        Job.objects.filter(pk=recent.pk).update(status='done', finished_at=timezone.now())
+        Job.objects.filter(pk=queued.pk).update(run_at=timezone.now() + timedelta(hours=1))
+
+        out = io.StringIO()
+        call_command('run_jobs', '--once', stdout=out)
+        self.assertIn('Deleted 2 old finished job(s)', out.getvalue())
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)), {recent.pk, queued.pk})
+
+    def test_reviews_notify_patients_from_the_worker(self):
+        questionnaires = [make_questionnaire(f'patient-{i}') for i in range(3)]
+        User.objects.filter(pk__in=[q.user_id for q in questionnaires]).update(email='patient@example.com')
+        self.client.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        self.client.post(f'/api/questionnaire/{questionnaires[0].pk}/review/', {'status': 'approved'}, format='json')
+        self.client.post('/api/questionnaire/bulk_review/', {
+            'ids': [questionnaires[1].pk, questionnaires[2].pk, 999], 'status': 'approved',
+        }, format='json')
+        self.assertEqual(Job.objects.filter(name='notify_review', status='queued').count(), 3)
+        self.assertEqual(mail.outbox, [])
+
+        call_command('run_jobs', '--once', stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertNotIn('feedback:', mail.outbox[0].body)
+
+    def test_workers_claim_disjoint_batches(self):
+        jobs.enqueue_many('test_job', [{} for _ in range(5)])
+        first, second = jobs.claim(3), jobs.claim(3)
+        self.assertEqual((len(first), len(second)), (3, 2))
+        self.assertFalse({job.pk for job in first} & {job.pk for job in second})
+        self.assertEqual(jobs.claim(3), [])
+
+    def test_unique_jobs_are_enqueued_once_while_queued(self):
+        jobs.enqueue('test_job', unique_key='all')
+        jobs.enqueue('test_job', unique_key='all')
+        self.assertEqual(Job.objects.count(), 1)
+        (job,) = jobs.claim()
+        # Running: changes made now need another run
+        jobs.enqueue('test_job', unique_key='all')
+        self.assertEqual(Job.objects.filter(status='queued').count(), 1)
+
+    def test_failures_back_off_then_fail(self):
+        job = jobs.enqueue('failing_job', max_attempts=2)
+        self.assertEqual(jobs.run_due(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('downstream unavailable', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(jobs.claim(), [])  # Not due yet
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual(jobs.run_due(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_expired_leases_are_claimed_again(self):
+        jobs.enqueue('test_job', {'x': 1})
+        (stalled,) = jobs.claim()
+        self.assertEqual(jobs.claim(), [])
+        Job.objects.filter(pk=stalled.pk).update(locked_at=timezone.now() - jobs.LEASE - timedelta(seconds=1))
+
+        (reclaimed,) = jobs.claim()
+        self.assertEqual(reclaimed.attempts, 2)
+        self.assertTrue(jobs.run(reclaimed))
+        self.assertEqual(self.calls, [{'x': 1}])
+        # The stalled worker finishing late does not overwrite the result
+        jobs.run(Job(pk=stalled.pk, name='failing_job', claim=stalled.claim, attempts=5, max_attempts=5))
+        self.assertEqual(Job.objects.get(pk=stalled.pk).status, 'done')
+
+
+class JobQueueConcurrencyTests(TransactionTestCase):
+    threads = 4
+
+    def test_parallel_workers_run_each_job_once(self):
+        ran = []
+        jobs.registry['test_job'] = lambda n: ran.append(n)
+        self.addCleanup(jobs.registry.pop, 'test_job')
+        jobs.enqueue_many('test_job', [{'n': n} for n in range(40)])
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def work():
+            try:
+                barrier.wait()
+                while jobs.run_due(batch_size=3) != (0, 0):
+                    pass
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=work) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(ran), list(range(40)))
+        self.assertEqual(Job.objects.filter(status='done').count(), 40)
+
+
+class HealthReportTests(CoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.questionnaire = make_questionnaire('patient')
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        reports.stats.reset()
+
+    def download(self, user, **headers):
+        self.client.force_authenticate(user)
+        return self.client.get(f'/api/questionnaire/{self.questionnaire.pk}/report/', headers=headers)
+
+    def test_report_is_rendered_once_per_version(self):
+        response = self.download(self.questionnaire.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('attachment', response['Content-Disposition'])
+        first = b''.join(response.streaming_content)
+        self.assertTrue(first.startswith(b'%PDF-'))
+        self.assertTrue(first.rstrip().endswith(b'%%EOF'))
+
+        self.assertEqual(b''.join(self.download(self.admin).streaming_content), first)
+        self.assertEqual(reports.stats.as_dict()['misses'], 1)
+        self.assertEqual(reports.stats.as_dict()['hits'], 1)
+        self.assertEqual(self.download(self.admin, if_none_match=response['ETag']).status_code, 304)
+
+        self.client.post(
+            f'/api/questionnaire/{self.questionnaire.pk}/review/',
+            {'status': 'approved', 'admin_feedback': 'Keep it up'}, format='json',
+        )
+        reviewed = self.download(self.questionnaire.user)
+        self.assertNotEqual(reviewed['ETag'], response['ETag'])
+        self.assertNotEqual(b''.join(reviewed.streaming_content), first)
+        self.assertEqual(reports.stats.as_dict()['misses'], 2)
+        # The old version's file is gone
+        self.assertEqual(len(list(reports.cache_dir().glob('*.pdf'))), 1)
+
+    def test_feedback_and_answers_are_laid_out(self):
+        payload = self.questionnaire.snapshot.payload | {'status': 'approved', 'admin_feedback': 'See (a) GP soon'}
+        content = render_report(payload)
+        pages = re.findall(rb'stream\n(.*?)\nendstream', content, re.S)
+        text = b''.join(zlib.decompress(page) for page in pages)
+        for expected in (rb'Reviewer feedback', rb'See \(a\) GP soon', rb'Blood pressure: 120/80', rb'Hypertension: Yes'):
+            self.assertIn(expected, text)
+        self.assertEqual(content.count(b'/Type /Page '), len(pages))
+
+    def test_other_patients_cannot_download(self):
+        self.assertEqual(self.download(User.objects.create(username='other')).status_code, 404)
+
+    def test_prerender_renders_approved_reports_ahead(self):
+        approved = make_questionnaire('approved', status='approved')
+        call_command('prerender_reports', stdout=io.StringIO())
+        self.assertEqual([p.name.split('-')[0] for p in reports.cache_dir().glob('*.pdf')], [str(approved.pk)])
+        call_command('prerender_reports', '--include-pending', stdout=io.StringIO())
+        self.assertEqual(len(list(reports.cache_dir().glob('*.pdf'))), 2)
+
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/questionnaire/{self.questionnaire.pk}/review/', {'status': 'approved'}, format='json')
+        self.assertTrue(Job.objects.filter(name='prerender_report', status='queued').exists())
+        call_command('run_jobs', '--once', stdout=io.StringIO())
+        reports.stats.reset()
+        self.assertEqual(self.download(self.questionnaire.user).status_code, 200)
+        self.assertEqual(reports.stats.as_dict()['hits'], 1)
+
+    def test_bulk_reapproval_queues_one_render_per_questionnaire(self):
+        other = make_questionnaire('other')
+        self.client.force_authenticate(self.admin)
+        ids = [self.questionnaire.pk, other.pk]
+        self.client.post(f'/api/questionnaire/{other.pk}/review/', {'status': 'approved'}, format='json')
+        for _ in range(2):
+            self.client.post('/api/questionnaire/bulk_review/', {'ids': ids, 'status': 'approved'}, format='json')
+        queued = Job.objects.filter(name='prerender_report', status='queued')
+        self.assertEqual(sorted(queued.values_list('unique_key', flat=True)), sorted(str(pk) for pk in ids))
+
+
+class RequestMetricsTests(CoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+        self.questionnaire = make_questionnaire('patient')
+        self.admin = User.objects.create(username='admin', is_staff=True)
+
+    def timings(self, response):
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def test_server_timing_reports_each_phase(self):
+        token = AccessToken.for_user(self.admin)
+        response = self.client.get('/api/questionnaire/pending/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        timings = self.timings(response)
+        self.assertEqual(list(timings), ['db', 'auth', 'serialize', 'render', 'total'])
+        # The admin's user row, then the page
+        self.assertEqual(timings['db']['desc'], '"2 queries"')
+        self.assertGreater(float(timings['auth']['dur']), 0)
+        self.assertGreater(float(timings['render']['dur']), 0)
+        self.assertGreaterEqual(float(timings['total']['dur']), float(timings['render']['dur']))
+
+    async def test_async_views_count_queries_run_in_threads(self):
+        token = await sync_to_async(AccessToken.for_user)(self.admin)
+        response = await AsyncClient().get('/api/async/questionnaire/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.timings(response)['db']['desc'], '"2 queries"')
+
+    def test_metrics_endpoint_exposes_per_endpoint_histograms(self):
+        self.client.force_authenticate(self.questionnaire.user)
+        for _ in range(3):
+            self.client.get(f'/api/questionnaire/{self.questionnaire.pk}/')
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        with self.settings(SERVER_TIMING=False):
+            response = self.client.get('/api/metrics/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        lines = response.content.decode().splitlines()
+        labels = 'endpoint="healthquestionnaire-detail",method="GET"'
+        self.assertIn(f'http_requests_total{{{labels},status="200"}} 3', lines)
+        self.assertIn(f'http_requests_total{{endpoint="metrics",method="GET",status="403"}} 1', lines)
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 3', lines)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3', lines)
+        buckets = [int(line.rsplit(' ', 1)[1]) for line in lines if line.startswith(f'http_request_db_queries_bucket{{{labels}')]
+        self.assertEqual(buckets, sorted(buckets))
+
+
+class SparseFieldsetTests(CoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.questionnaires = [make_questionnaire(f'patient-{i}') for i in range(3)]
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def test_admin_queue_selection_loads_only_what_it_returns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/questionnaire/pending/', {
+                'fields': 'status,submitted_at,personal_info.age,symptoms',
+            })
+        self.assertEqual(response.status_code, 200)
+        (sql,) = [query['sql'] for query in queries]
+        self.assertIn('core_symptoms', sql)
+        self.assertNotIn('core_measurements', sql)
+        self.assertNotIn('payload', sql)
+        full = self.questionnaires[0].snapshot.payload
+        row = response.data['results'][0]
+        self.assertEqual(list(row), ['id', 'personal_info', 'symptoms', 'submitted_at', 'status'])
+        self.assertEqual(row['personal_info'], {'age': 40})
+        self.assertEqual(row['symptoms'], full['symptoms'])
+        self.assertEqual(row['submitted_at'], full['submitted_at'])
+
+    def test_sections_keep_questionnaire_fields(self):
+        questionnaire = self.questionnaires[1]
+        self.client.force_authenticate(questionnaire.user)
+        response = self.client.get(f'/api/questionnaire/{questionnaire.pk}/', {'sections': 'measurements'})
+        full = questionnaire.snapshot.payload
+        sections = {'personal_info', 'lifestyle', 'medical_history', 'family_history', 'symptoms', 'preventive_care'}
+        self.assertEqual(response.data, {key: value for key, value in full.items() if key not in sections})
+
+    def test_selections_have_their_own_etags(self):
+        url = f'/api/questionnaire/{self.questionnaires[0].pk}/'
+        full = self.client.get(url)
+        sparse = self.client.get(url, {'fields': 'status'})
+        self.assertEqual(sparse.data, {'id': self.questionnaires[0].pk, 'status': 'pending'})
+        self.assertNotEqual(full['ETag'], sparse['ETag'])
+        self.assertEqual(self.client.get(url, {'fields': 'status'}, headers={'If-None-Match': sparse['ETag']}).status_code, 304)
+        self.assertEqual(self.client.get(url, {'fields': 'status'}, headers={'If-None-Match': full['ETag']}).status_code, 200)
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get('/api/questionnaire/', {'fields': 'status,password,symptoms.mood', 'sections': 'diet'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password, symptoms.mood', response.data['fields'])
+        self.assertIn('diet', response.data['sections'])
+
+
+class RendererTests(CoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.questionnaire = make_questionnaire('patient')
+        self.client.force_authenticate(self.questionnaire.user)
+
+    def test_orjson_renders_what_json_renderer_renders(self):
+        if renderers.orjson is None:
+            raise unittest.SkipTest('orjson is not installed')
+        data = {
+            'submitted_at': timezone.now(), 'weight': Decimal('72.50'), 1: 'int key',
+            'notes': 'line\u2028separator, café', 'nested': [{'on': timezone.now().date()}],
+        }
+        self.assertEqual(renderers.ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+        response = self.client.get(f'/api/questionnaire/{self.questionnaire.pk}/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+        # Indented output is still available
+        response = self.client.get(f'/api/questionnaire/{self.questionnaire.pk}/', headers={'Accept': 'application/json; indent=2'})
+        self.assertIn(b'\n  "id"', response.content)
+
+    def test_parser_rejects_malformed_json(self):
+        self.client.force_authenticate(User.objects.create(username='other'))
+        url = '/api/questionnaire/submit_complete/'
+        response = self.client.post(url, '{"personal_info": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['detail'].startswith('JSON parse error'))
+        response = self.client.post(url, json.dumps(COMPLETE_PAYLOAD), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_messagepack_is_negotiated_by_accept(self):
+        if renderers.msgpack is None:
+            raise unittest.SkipTest('msgpack is not installed')
+        url = f'/api/questionnaire/{self.questionnaire.pk}/'
+        response = self.client.get(url, headers={'Accept': 'application/msgpack'})
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(renderers.msgpack.unpackb(response.content), self.client.get(url).json())
+
+
+class FrontendServingTests(CoreAPITestCase):
+    script = b'console.log("health");\n' * 100
+
+    def setUp(self):
+        super().setUp()
+        self.dist = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        (self.dist / 'assets').mkdir()
+        (self.dist / 'assets' / 'index-D8odpAwn.js').write_bytes(self.script)
+        (self.dist / 'vite.svg').write_bytes(b'<svg/>')
+        (self.dist / 'index.html').write_bytes(
+            b'<!doctype html><script type="module" src="/assets/index-D8odpAwn.js"></script>' + b' ' * 400
+        )
+        self.enterContext(self.settings(FRONTEND_DIST_DIR=self.dist))
+        call_command('compress_assets', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_fingerprinted_assets_are_precompressed_and_immutable(self):
+        url = '/assets/index-D8odpAwn.js'
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={'Accept-Encoding': 'gzip, deflate, br;q=0'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertNotIn('Content-Disposition', response)
+        self.assertEqual(gzip.decompress(response.getvalue()), self.script)
+
+        plain = self.client.get(url, headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(plain.getvalue(), self.script)
+        self.assertNotEqual(plain['ETag'], response['ETag'])
+        revalidated = self.client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': response['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+        # Unfingerprinted files are revalidated; a missing asset is not answered with the shell
+        self.assertEqual(self.client.get('/vite.svg')['Cache-Control'], 'no-cache')
+        self.assertEqual(self.client.get('/assets/index-missing1.js').status_code, 404)
+
+    def test_shell_is_served_from_memory_for_client_routes(self):
+        shell = (self.dist / 'index.html').read_bytes()
+        response = self.client.get('/dashboard/questionnaire', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(gzip.decompress(response.content), shell)
+
+        # Later edits to the file are not read until the build is reloaded
+        (self.dist / 'index.html').write_bytes(b'<!doctype html>')
+        response = self.client.get('/', headers={'If-None-Match': self.client.get('/')['ETag']})
+        self.assertEqual(response.status_code, 304)
+        frontend.reset()
+        self.assertEqual(self.client.get('/').content, b'<!doctype html>')
+
+    def test_compress_assets_skips_up_to_date_and_tiny_files(self):
+        self.assertTrue((self.dist / 'index.html.gz').exists())
+        self.assertFalse((self.dist / 'vite.svg.gz').exists())
+        out = io.StringIO()
+        call_command('compress_assets', stdout=out, stderr=io.StringIO())
+        self.assertIn('Compressed 0 file(s)', out.getvalue())
@@ -2,9 +2,10 @@ from rest_framework import routers
 from .views import (
     PersonalInfoViewSet, LifestyleViewSet, MedicalHistoryViewSet, FamilyHistoryViewSet,
     MeasurementsViewSet, SymptomsViewSet, PreventiveCareViewSet, HealthQuestionnaireViewSet,
-    RegisterView, CustomTokenObtainPairView
+    RegisterView, CustomTokenObtainPairView, MetricsView
 )
 from django.urls import path
+from . import async_views
 
 router = routers.DefaultRouter()
 router.register(r'personal-info', PersonalInfoViewSet)
@@ -19,5 +20,17 @@ router.register(r'questionnaire', HealthQuestionnaireViewSet)
 urlpatterns = [
     path('auth/register/', RegisterView.as_view(), name='auth_register'),
     path('auth/login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
+# ASGI-native versions of the hot GETs (core.async_views)
+urlpatterns += [
+    path('async/questionnaire/', async_views.questionnaire_list),
+    path('async/questionnaire/pending/', async_views.questionnaire_pending),
+    path('async/questionnaire/<int:pk>/', async_views.questionnaire_detail),
+]
+for prefix in async_views.SECTIONS:
+    urlpatterns += [
+        path(f'async/{prefix}/', async_views.section_list, {'section': prefix}),
+        path(f'async/{prefix}/<int:pk>/', async_views.section_detail, {'section': prefix}),
+    ]
 urlpatterns += router.urls
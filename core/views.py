@@ -1,3 +1,9 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.functional import cached_property
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .user_profile import UserProfile
@@ -5,8 +11,9 @@ from rest_framework import status
 
 from rest_framework import generics
 from rest_framework_simplejwt.views import TokenObtainPairView
-from .auth_serializers import RegisterSerializer
-from rest_framework.permissions import AllowAny
+from .auth_serializers import ClaimsTokenObtainPairSerializer, RegisterSerializer
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.views import APIView
 from django.contrib.auth.models import User
 
 class RegisterView(generics.CreateAPIView):
@@ -16,6 +23,14 @@ class RegisterView(generics.CreateAPIView):
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     permission_classes = (AllowAny,)
+    serializer_class = ClaimsTokenObtainPairSerializer
+
+class MetricsView(APIView):
+    """This process's per-endpoint request histograms, in the Prometheus text format."""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(metrics.registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 from rest_framework import viewsets, permissions
 from .models import (
@@ -25,48 +40,128 @@ from .models import (
 from .serializers import (
     PersonalInfoSerializer, LifestyleSerializer, MedicalHistorySerializer, FamilyHistorySerializer,
     MeasurementsSerializer, SymptomsSerializer, PreventiveCareSerializer, HealthQuestionnaireSerializer,
-    CompleteQuestionnaireSerializer
+    CompleteQuestionnaireSerializer, QuestionnaireSnapshotSerializer, BulkReviewSerializer,
+    SparseQuestionnaireSerializer
 )
+from .bulk_ingest import BATCH_SIZE, MAX_BATCH_SIZE, ingest_ndjson
+from .questionnaire_writer import review_questionnaires
+from .pagination import QuestionnaireCursorPagination
+from .snapshots import refresh_snapshots
+from . import questionnaire_cache
+from .conditional import ConditionalGetMixin, page_links_validator
+from .filters import FieldFilterBackend
+from .db_router import ReplicaReadMixin, read_alias
+from .authentication import ClaimsAuthenticatedReadsMixin
+from . import export as questionnaire_export
+from . import analytics as questionnaire_analytics
+from . import fieldsets, jobs, metrics, reports
+from .renderers import ORJSONRenderer, PDFRenderer
+
+class SectionViewSet(ClaimsAuthenticatedReadsMixin, ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    """Section CRUD that keeps the owning questionnaire's snapshot in step."""
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [FieldFilterBackend]
+    # HealthQuestionnaire field pointing at this section, e.g. 'personal_info'
+    section = None
+    # Indexed numeric fields accepted as ?<field>__gte= / __gt= / __lte= / __lt=
+    range_filter_fields = ()
+    validator_fields = ('id', 'updated_at')
+
+    def row_validators(self, obj):
+        return f'{obj.pk}:{obj.updated_at.isoformat()}', obj.updated_at
 
-class PersonalInfoViewSet(viewsets.ModelViewSet):
+    def perform_create(self, serializer):
+        instance = serializer.save()
+        questionnaire_cache.invalidate_on_commit([instance.user_id])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            instance = serializer.save()
+            questionnaire = HealthQuestionnaire.objects.with_sections().filter(**{self.section: instance}).first()
+            if questionnaire is not None:
+                refresh_snapshots([questionnaire])
+
+    def perform_destroy(self, instance):
+        # Deleting a section cascades to the questionnaire that points at it
+        questionnaire_cache.invalidate_on_commit([instance.user_id])
+        instance.delete()
+
+class PersonalInfoViewSet(SectionViewSet):
     queryset = PersonalInfo.objects.all()
     serializer_class = PersonalInfoSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    section = 'personal_info'
 
-class LifestyleViewSet(viewsets.ModelViewSet):
+class LifestyleViewSet(SectionViewSet):
     queryset = Lifestyle.objects.all()
     serializer_class = LifestyleSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    section = 'lifestyle'
 
-class MedicalHistoryViewSet(viewsets.ModelViewSet):
+class MedicalHistoryViewSet(SectionViewSet):
     queryset = MedicalHistory.objects.all()
     serializer_class = MedicalHistorySerializer
-    permission_classes = [permissions.IsAuthenticated]
+    section = 'medical_history'
 
-class FamilyHistoryViewSet(viewsets.ModelViewSet):
+class FamilyHistoryViewSet(SectionViewSet):
     queryset = FamilyHistory.objects.all()
     serializer_class = FamilyHistorySerializer
-    permission_classes = [permissions.IsAuthenticated]
+    section = 'family_history'
 
-class MeasurementsViewSet(viewsets.ModelViewSet):
+class MeasurementsViewSet(SectionViewSet):
     queryset = Measurements.objects.all()
     serializer_class = MeasurementsSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    section = 'measurements'
+    range_filter_fields = ('bmi', 'systolic', 'diastolic', 'glucose', 'total_cholesterol')
 
-class SymptomsViewSet(viewsets.ModelViewSet):
+class SymptomsViewSet(SectionViewSet):
     queryset = Symptoms.objects.all()
     serializer_class = SymptomsSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    section = 'symptoms'
 
-class PreventiveCareViewSet(viewsets.ModelViewSet):
+class PreventiveCareViewSet(SectionViewSet):
     queryset = PreventiveCare.objects.all()
     serializer_class = PreventiveCareSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    section = 'preventive_care'
 
-class HealthQuestionnaireViewSet(viewsets.ModelViewSet):
+class HealthQuestionnaireViewSet(ClaimsAuthenticatedReadsMixin, ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = HealthQuestionnaire.objects.all()
     serializer_class = HealthQuestionnaireSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = QuestionnaireCursorPagination
+    filter_backends = [FieldFilterBackend]
+    # Admin queue filters; each is backed by an index (see the model Meta classes)
+    exact_filter_fields = {
+        'status': 'status',
+        'smoking_status': 'lifestyle__smoking_status',
+        'chest_pain': 'symptoms__chest_pain',
+        'breathlessness': 'symptoms__breathlessness',
+        'fatigue': 'symptoms__fatigue',
+        'diabetes': 'medical_history__diabetes',
+        'hypertension': 'medical_history__hypertension',
+        'heart_disease': 'medical_history__heart_disease',
+    }
+    range_filter_fields = {
+        'submitted_at': 'submitted_at',
+        'bmi': 'measurements__bmi',
+        'systolic': 'measurements__systolic',
+        'diastolic': 'measurements__diastolic',
+        'glucose': 'measurements__glucose',
+        'total_cholesterol': 'measurements__total_cholesterol',
+    }
+    # Read actions served from the one-row snapshot instead of joining every section
+    snapshot_actions = ('list', 'retrieve', 'pending', 'report')
+    # The heavy admin reads go to a replica too
+    replica_actions = ('list', 'retrieve', 'pending', 'report', 'export', 'analytics')
+    validator_fields = ('id', 'status', 'submitted_at', 'snapshot__version', 'snapshot__updated_at')
+    # Read actions accepting ?fields= / ?sections= (core.fieldsets)
+    sparse_actions = ('list', 'retrieve', 'pending')
+
+    @cached_property
+    def sparse_serializer(self):
+        """The compiled serializer of the request's field selection, or None for full payloads."""
+        if self.action not in self.sparse_actions:
+            return None
+        selection = fieldsets.parse(self.request.query_params)
+        return fieldsets.compiled(selection) if selection is not None else None
 
     def get_queryset(self):
         """
@@ -74,25 +169,152 @@ class HealthQuestionnaireViewSet(viewsets.ModelViewSet):
         and only the questionnaire for the currently authenticated user for non-admins.
         """
         user = self.request.user
+        sparse = self.sparse_serializer
+        if sparse is not None:
+            # Join only the selected sections and load only the selected columns (plus validators)
+            queryset = HealthQuestionnaire.objects.select_related('snapshot', *sparse.relations).only(
+                *sparse.columns, *self.validator_fields,
+            )
+        elif self.action in self.snapshot_actions:
+            queryset = HealthQuestionnaire.objects.select_related('snapshot')
+        else:
+            queryset = HealthQuestionnaire.objects.with_sections()
+        if self.action == 'review':
+            # Locked with its sections, so a section written meanwhile waits rather
+            # than being overwritten by a snapshot built from the rows read here
+            queryset = queryset.select_for_update()
         if user.is_staff: # Use is_staff for admin check
-            return HealthQuestionnaire.objects.all()
-        return HealthQuestionnaire.objects.filter(user=user)
+            return queryset
+        # By id: under claims-only reads the user is a TokenUser, not a model instance
+        return queryset.filter(user_id=user.pk)
+
+    def get_serializer_class(self):
+        if self.sparse_serializer is not None:
+            return SparseQuestionnaireSerializer
+        if self.action in self.snapshot_actions:
+            return QuestionnaireSnapshotSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'flat_serializer': self.sparse_serializer}
+
+    def validator_variant(self):
+        # A selection is a different representation of the same rows
+        sparse = self.sparse_serializer
+        return super().validator_variant() + (f':{",".join(sparse.columns)}' if sparse is not None else '')
+
+    def row_validators(self, obj):
+        snapshot = getattr(obj, 'snapshot', None)
+        version = snapshot.version if snapshot else 0
+        token = f'{obj.pk}:{obj.status}:{obj.submitted_at.isoformat()}:{version}'
+        return token, snapshot.updated_at if snapshot else obj.submitted_at
+
+    def _own_entry(self):
+        # From the primary: a replica that has not caught up with a write (say, an admin's review)
+        # would otherwise be cached under the version that write started, until TIMEOUT
+        questionnaire = self.get_queryset().using(DEFAULT_DB_ALIAS).first()
+        if questionnaire is None:
+            return None
+        return {
+            'payload': self.get_serializer(questionnaire).data,
+            'validators': [self.row_validators(questionnaire)],
+        }
+
+    def _cached_own_entry(self):
+        entry = questionnaire_cache.get_payload(self.request.user.pk, self._own_entry)
+        self.loaded_validators = entry['validators'] if entry else []
+        return entry
+
+    def list_response(self, request, *args, **kwargs):
+        if request.user.is_staff or request.query_params:
+            return super().list_response(request, *args, **kwargs)
+        # A patient's list is their one questionnaire: serve it from the per-user cache
+        entry = self._cached_own_entry()
+        # The one page a paginator would produce: no links either way
+        self.loaded_validators = self.loaded_validators + [page_links_validator(False, False)]
+        return Response({'next': None, 'previous': None, 'results': [entry['payload']] if entry else []})
+
+    def retrieve_response(self, request, *args, **kwargs):
+        if not request.user.is_staff and self.sparse_serializer is None:
+            entry = self._cached_own_entry()
+            if entry is not None and str(entry['payload']['id']) == str(kwargs[self.lookup_field]):
+                return Response(entry['payload'])
+        return super().retrieve_response(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        # Snapshot reads, ETags and the analytics counters follow the snapshot, so it changes with the row
+        with transaction.atomic():
+            questionnaire = serializer.save()
+            refresh_snapshots([questionnaire])
+
+    def perform_destroy(self, instance):
+        questionnaire_cache.invalidate_on_commit([instance.user_id])
+        instance.delete()
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def review(self, request, pk=None):
-        questionnaire = self.get_object()
         feedback = request.data.get('admin_feedback', '')
         status_val = request.data.get('status', 'approved') # Renamed variable to avoid conflict
-        questionnaire.admin_feedback = feedback
-        questionnaire.status = status_val
-        questionnaire.save()
+        with transaction.atomic():
+            questionnaire = self.get_object()
+            questionnaire.admin_feedback = feedback
+            questionnaire.status = status_val
+            questionnaire.save(update_fields=['admin_feedback', 'status'])
+            refresh_snapshots([questionnaire])
+            jobs.enqueue('notify_review', {'questionnaire_id': questionnaire.pk})
+            if status_val == 'approved':
+                jobs.enqueue('prerender_report', {'questionnaire_id': questionnaire.pk}, unique_key=str(questionnaire.pk))
         return Response({'status': 'updated', 'admin_feedback': feedback})
 
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def bulk_review(self, request):
+        """Apply one status and feedback to a list of questionnaire ids in a single batched update."""
+        serializer = BulkReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        with transaction.atomic():
+            updated = set(review_questionnaires(data['ids'], data['status'], data['admin_feedback']))
+            jobs.enqueue_many('notify_review', [{'questionnaire_id': pk} for pk in sorted(updated)])
+            if data['status'] == 'approved':
+                jobs.enqueue_many(
+                    'prerender_report', [{'questionnaire_id': pk} for pk in sorted(updated)],
+                    unique_key=lambda payload: str(payload['questionnaire_id']),
+                )
+        results = [
+            {'id': pk, 'result': 'updated' if pk in updated else 'not_found'}
+            for pk in dict.fromkeys(data['ids'])
+        ]
+        return Response({
+            'status': 'updated',
+            'admin_feedback': data['admin_feedback'],
+            'updated': len(updated),
+            'results': results,
+        })
+
+    @action(detail=True, methods=['get'], renderer_classes=[PDFRenderer, ORJSONRenderer])
+    def report(self, request, pk=None):
+        """The questionnaire and its feedback as a PDF download, rendered once per version."""
+        def respond():
+            questionnaire = self.get_object()
+            return FileResponse(
+                reports.open_report(questionnaire), as_attachment=True,
+                filename=f'health-report-{questionnaire.pk}.pdf', content_type=PDFRenderer.media_type,
+            )
+        try:
+            queryset = self._lookup_queryset()
+        except (TypeError, ValueError, ValidationError):
+            return respond()
+        return self.conditional_response(request, queryset, respond, many=False)
+
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
     def pending(self, request):
-        pending_qs = HealthQuestionnaire.objects.filter(status='pending')
-        serializer = self.get_serializer(pending_qs, many=True)
-        return Response(serializer.data)
+        pending_qs = self.filter_queryset(self.get_queryset()).filter(status='pending')
+
+        def respond():
+            page = self.paginate_queryset(pending_qs)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        return self.conditional_response(request, pending_qs, respond)
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def submit_complete(self, request):
@@ -104,4 +326,49 @@ class HealthQuestionnaireViewSet(viewsets.ModelViewSet):
                 'id': questionnaire.id,
                 'status': questionnaire.status
             }, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def bulk_submit(self, request):
+        """
+        Ingest an NDJSON stream of submit_complete payloads, each with a ``username``.
+
+        The body is parsed line by line and written in batched bulk statements;
+        the response streams one NDJSON result per record.
+        """
+        try:
+            batch_size = int(request.query_params.get('batch_size', BATCH_SIZE))
+        except ValueError:
+            return Response({'batch_size': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        batch_size = min(max(batch_size, 1), MAX_BATCH_SIZE)
+        results = ingest_ndjson(request.stream or [], batch_size=batch_size)
+        return StreamingHttpResponse(
+            (json.dumps(result) + '\n' for result in results),
+            content_type='application/x-ndjson',
+        )
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """Stream every questionnaire as flat rows; ?file_format=csv|ndjson|parquet."""
+        file_format = request.query_params.get('file_format', 'csv')
+        error = questionnaire_export.format_error(file_format)
+        if error:
+            return Response({'file_format': error}, status=status.HTTP_400_BAD_REQUEST)
+        # Rows are read while streaming, after the request's routing state is gone
+        queryset = HealthQuestionnaire.objects.using(read_alias())
+        response = StreamingHttpResponse(
+            questionnaire_export.export(file_format, queryset),
+            content_type=questionnaire_export.CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="questionnaires.{file_format}"'
+        return response
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        """Hit/miss counters of this process's questionnaire cache."""
+        return Response(questionnaire_cache.stats.as_dict())
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def analytics(self, request):
+        """Population statistics, read from incrementally maintained counters."""
+        return Response(questionnaire_analytics.dashboard())
@@ -1,10 +1,11 @@
-from django.views.generic import TemplateView
-from django.views.decorators.cache import never_cache
-from django.utils.decorators import method_decorator
+from django.views import View
 
-@method_decorator(never_cache, name='dispatch')
-class FrontendAppView(TemplateView):
-    template_name = "frontend/index.html"
+from . import frontend
+
+
+class FrontendAppView(View):
+    """The React app's shell for every client-side route, from memory (see core.frontend)."""
+    http_method_names = ['get', 'head', 'options']
 
     def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
+        return frontend.serve(request, frontend.shell())
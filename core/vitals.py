@@ -0,0 +1,34 @@
+import re
+
+_BLOOD_PRESSURE = re.compile(r'\s*(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)')
+_NUMBER = re.compile(r'\s*(\d+(?:\.\d+)?)')
+
+
+def parse_blood_pressure(text):
+    """``'120/80'`` -> ``(120.0, 80.0)``; ``(None, None)`` when unreadable."""
+    match = _BLOOD_PRESSURE.match(text or '')
+    return (float(match[1]), float(match[2])) if match else (None, None)
+
+
+def parse_number(text):
+    """The leading number of a reading such as ``'110 mg/dL'``, or None."""
+    match = _NUMBER.match(text or '')
+    return float(match[1]) if match else None
+
+
+def compute_bmi(height_cm, weight_kg):
+    if not height_cm or not weight_kg or height_cm <= 0 or weight_kg <= 0:
+        return None
+    return round(weight_kg / (height_cm / 100) ** 2, 1)
+
+
+def derived_measurements(height_cm, weight_kg, blood_pressure, blood_sugar, cholesterol):
+    """The server-computed Measurements columns for one set of submitted values."""
+    systolic, diastolic = parse_blood_pressure(blood_pressure)
+    return {
+        'bmi': compute_bmi(height_cm, weight_kg),
+        'systolic': systolic,
+        'diastolic': diastolic,
+        'glucose': parse_number(blood_sugar),
+        'total_cholesterol': parse_number(cholesterol),
+    }
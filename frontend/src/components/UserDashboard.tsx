@@ -154,9 +154,9 @@ export const UserDashboard: React.FC = () => {
       setLoading(true);
       setError(null);
       try {
-        // Your API returns an array, we get the first (and only) item for the user
+        // The list is paginated; a patient only ever has one questionnaire on the first page
         const res = await api.getQuestionnaire(); 
-        setQuestionnaire(res.data[0] || null);
+        setQuestionnaire(res.data.results[0] || null);
       } catch (err) {
         setError('Failed to load your questionnaire. Please try again later.');
         console.error(err);